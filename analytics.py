@@ -0,0 +1,404 @@
+"""
+Estatísticas de Turma
+Registro opcional dos resultados para painéis de escolas: nota média,
+distribuição de notas, riqueza de vocabulário e erros mais frequentes
+por turma e período, sobre milhares de redações.
+
+Cada redação registrada vira uma linha em `essays` (só números e
+contagens por regra, nunca o texto) e é somada, na mesma transação, ao
+agregado da sua turma/período. O agregado é guardado em colunas de
+tamanho fixo (array): somas, histograma de notas e uma contagem por
+regra, com os ids de regra codificados num dicionário (`rules`). Um
+relatório lê e soma só esses agregados, sem reanalisar nem percorrer
+as redações.
+
+O registro não fica no caminho da requisição: record() enfileira e uma
+thread grava em lotes (uma transação por lote). O SQLite é
+compartilhado entre os workers; cada lote relê o agregado dentro de
+BEGIN IMMEDIATE, então processos diferentes não se sobrescrevem.
+
+Ligado com CORRIGEAI_ANALYTICS_DB; só são registradas as análises que
+informam a turma.
+
+    python analytics.py report [--turma 3A] [--periodo 2026.2]
+"""
+
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+
+import metrics
+
+ANALYTICS_DB = os.environ.get("CORRIGEAI_ANALYTICS_DB", "")
+ANALYTICS_QUEUE = int(os.environ.get("CORRIGEAI_ANALYTICS_QUEUE", 10000))
+ANALYTICS_BATCH = int(os.environ.get("CORRIGEAI_ANALYTICS_BATCH", 200))
+
+# Colunas somadas de cada redação (o desvio padrão da nota vem de grade_sq)
+SCALARS = ("grade", "grade_sq", "words", "richness", "grammar_errors", "style_errors")
+
+# Histograma de notas: um bucket a cada 0,5 ponto (0,0 a 10,0)
+GRADE_BUCKETS = 21
+
+
+def current_period() -> str:
+    """Período padrão: ano e semestre, ex.: 2026.2."""
+    now = time.localtime()
+    return f"{now.tm_year}.{1 if now.tm_mon <= 6 else 2}"
+
+
+def essay_summary(result: dict) -> dict:
+    """O que é guardado de uma redação (resultado de analyze())."""
+    stats = result["stats"]
+    return {
+        "grade": result["grade"],
+        "words": stats["word_count"],
+        "richness": stats["vocabulary_richness"],
+        "grammar_errors": stats["grammar_errors"],
+        "style_errors": stats["style_errors"],
+        "rules": stats.get("rule_hits", {}),
+    }
+
+
+# ============================================================
+# AGREGADO DE UMA TURMA/PERÍODO
+# ============================================================
+class CohortAggregate:
+    """
+    Somas de uma turma/período em arrays. rule_counts[i] e rule_essays[i]
+    (ocorrências e redações com ao menos uma) usam o índice i da regra
+    no dicionário `rules`; os arrays crescem quando surgem regras novas.
+    """
+
+    __slots__ = ("essays", "sums", "grades", "rule_counts", "rule_essays")
+
+    def __init__(self):
+        self.essays = 0
+        self.sums = array("d", bytes(8 * len(SCALARS)))
+        self.grades = array("I", bytes(4 * GRADE_BUCKETS))
+        self.rule_counts = array("I")
+        self.rule_essays = array("I")
+
+    def _grow(self, size: int):
+        missing = size - len(self.rule_counts)
+        if missing > 0:
+            self.rule_counts.frombytes(bytes(4 * missing))
+            self.rule_essays.frombytes(bytes(4 * missing))
+
+    def add(self, essay: dict, rule_index: dict, sign: int = 1):
+        """Soma (sign=1) ou retira (sign=-1) uma redação, já com os ids de regra em rule_index."""
+        self.essays += sign
+        grade = essay["grade"]
+        for i, value in enumerate((grade, grade * grade, essay["words"], essay["richness"],
+                                   essay["grammar_errors"], essay["style_errors"])):
+            self.sums[i] += sign * value
+        self.grades[min(GRADE_BUCKETS - 1, max(0, round(grade * 2)))] += sign
+        if essay["rules"]:
+            self._grow(max(rule_index[rule] for rule in essay["rules"]) + 1)
+            for rule, count in essay["rules"].items():
+                i = rule_index[rule]
+                self.rule_counts[i] += sign * count
+                self.rule_essays[i] += sign
+
+    def merge(self, other: "CohortAggregate"):
+        self.essays += other.essays
+        for i, value in enumerate(other.sums):
+            self.sums[i] += value
+        for i, value in enumerate(other.grades):
+            self.grades[i] += value
+        self._grow(len(other.rule_counts))
+        for i, value in enumerate(other.rule_counts):
+            self.rule_counts[i] += value
+        for i, value in enumerate(other.rule_essays):
+            self.rule_essays[i] += value
+
+    # Serialização: cada array vira um BLOB (bytes nativos do array)
+    def to_row(self) -> tuple:
+        return (self.essays, self.sums.tobytes(), self.grades.tobytes(),
+                self.rule_counts.tobytes(), self.rule_essays.tobytes())
+
+    @classmethod
+    def from_row(cls, row) -> "CohortAggregate":
+        aggregate = cls()
+        if row is not None:
+            essays, sums, grades, rule_counts, rule_essays = row
+            aggregate.essays = essays
+            aggregate.sums = array("d", sums)
+            aggregate.grades = array("I", grades)
+            aggregate.rule_counts.frombytes(rule_counts)
+            aggregate.rule_essays.frombytes(rule_essays)
+        return aggregate
+
+    def report(self, rule_names: list, top: int = 10) -> dict:
+        n = self.essays
+        if not n:
+            return {"essays": 0}
+        grade, grade_sq, words, richness, grammar, style = self.sums
+        mean = grade / n
+        ranked = sorted((i for i, count in enumerate(self.rule_counts) if count),
+                        key=lambda i: -self.rule_counts[i])[:top]
+        return {
+            "essays": n,
+            "grade": {
+                "mean": round(mean, 2),
+                "stddev": round(max(0.0, grade_sq / n - mean * mean) ** 0.5, 2),
+                "median": self._grade_percentile(0.5),
+                "distribution": {f"{i / 2:.1f}": count for i, count in enumerate(self.grades) if count},
+            },
+            "avg_words": round(words / n, 1),
+            "avg_vocabulary_richness": round(richness / n, 1),
+            "errors_per_essay": {"grammar": round(grammar / n, 2), "style": round(style / n, 2)},
+            "top_rules": [{
+                "rule": rule_names[i],
+                "occurrences": self.rule_counts[i],
+                "essays": self.rule_essays[i],
+                "essay_share": round(self.rule_essays[i] / n, 3),
+            } for i in ranked],
+        }
+
+    def _grade_percentile(self, q: float) -> float:
+        target = q * self.essays
+        seen = 0
+        for i, count in enumerate(self.grades):
+            seen += count
+            if seen >= target:
+                return i / 2
+        return 10.0
+
+
+# ============================================================
+# REGISTRO (SQLite + thread de gravação)
+# ============================================================
+class AnalyticsStore:
+    """
+    Registro das redações e dos agregados por turma/período. db_path
+    vazio desliga tudo (record() não faz nada e report() devolve None).
+    """
+
+    def __init__(self, db_path: str = ANALYTICS_DB, queue_size: int = ANALYTICS_QUEUE,
+                 batch: int = ANALYTICS_BATCH):
+        self.db_path = db_path
+        self.batch = batch
+        self.recorded = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writer = None
+        self._writer_pid = None
+        self._rule_index = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.db_path)
+
+    def _db(self):
+        # Chamado com o lock adquirido; uma conexão por processo, como no cache
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rules (rule TEXT UNIQUE NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS essays ("
+                " turma TEXT, periodo TEXT, essay TEXT, summary TEXT, created REAL,"
+                " PRIMARY KEY (turma, periodo, essay))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cohorts ("
+                " turma TEXT, periodo TEXT, essays INTEGER, sums BLOB, grades BLOB,"
+                " rule_counts BLOB, rule_essays BLOB, updated REAL, PRIMARY KEY (turma, periodo))"
+            )
+            self._conn, self._pid = conn, os.getpid()
+            self._rule_index = {}
+        return self._conn
+
+    # --------------------------------------------------------
+    # Gravação
+    # --------------------------------------------------------
+    def record(self, result: dict, turma: str, periodo: str = None, essay: str = None):
+        """
+        Enfileira uma redação analisada. `essay` identifica a redação na
+        turma (ex.: id do aluno ou hash do texto): registrá-la de novo
+        substitui a versão anterior em vez de contá-la duas vezes.
+        """
+        if not self.enabled:
+            return
+        if self._writer_pid != os.getpid() or not self._writer.is_alive():
+            self._start()
+        item = (str(turma), str(periodo or current_period()), essay or "", essay_summary(result))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            if self._writer_pid is not None and self._writer_pid != os.getpid():
+                # Processo filho (fork): a fila do pai não vale aqui
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._run, name="analytics", daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(items)
+                self.recorded += len(items)
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"[AVISO analytics] gravação de {len(items)} redação(ões) falhou: {e}")
+            except Exception as e:
+                # Um lote com problema não pode derrubar a thread (os seguintes se perderiam)
+                self.errors += 1
+                print(f"[ERRO analytics] gravação de {len(items)} redação(ões) falhou: {e!r}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _indices(self, db, rules: set) -> dict:
+        """Índice (posição nos arrays) de cada regra, criando as novas."""
+        missing = [rule for rule in rules if rule not in self._rule_index]
+        if missing:
+            db.executemany("INSERT OR IGNORE INTO rules (rule) VALUES (?)", [(rule,) for rule in missing])
+            for rowid, rule in db.execute("SELECT rowid, rule FROM rules"):
+                self._rule_index[rule] = rowid - 1
+        return self._rule_index
+
+    def _write(self, items: list):
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                index = self._indices(db, {rule for *_, summary in items for rule in summary["rules"]})
+                cohorts = {}
+                now = time.time()
+                for turma, periodo, essay, summary in items:
+                    key = (turma, periodo)
+                    aggregate = cohorts.get(key)
+                    if aggregate is None:
+                        row = db.execute(
+                            "SELECT essays, sums, grades, rule_counts, rule_essays FROM cohorts"
+                            " WHERE turma = ? AND periodo = ?", key).fetchone()
+                        aggregate = cohorts[key] = CohortAggregate.from_row(row)
+                    if essay:
+                        old = db.execute("SELECT summary FROM essays WHERE turma = ? AND periodo = ? AND essay = ?",
+                                         (turma, periodo, essay)).fetchone()
+                        if old is not None:
+                            previous = json.loads(old[0])
+                            # A versão anterior pode ter regras que outro processo cadastrou
+                            index = self._indices(db, previous["rules"].keys())
+                            aggregate.add(previous, index, sign=-1)
+                    else:
+                        essay = uuid.uuid4().hex
+                    aggregate.add(summary, index)
+                    db.execute("INSERT OR REPLACE INTO essays (turma, periodo, essay, summary, created)"
+                               " VALUES (?, ?, ?, ?, ?)",
+                               (turma, periodo, essay, json.dumps(summary, separators=(",", ":")), now))
+                db.executemany(
+                    "INSERT OR REPLACE INTO cohorts (turma, periodo, essays, sums, grades, rule_counts,"
+                    " rule_essays, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(turma, periodo, *aggregate.to_row(), now) for (turma, periodo), aggregate in cohorts.items()],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                # Regras cadastradas nesta transação sumiram com ela: o índice
+                # em memória é refeito do banco na próxima gravação
+                self._rule_index = {}
+                raise
+
+    def flush(self):
+        """Espera a gravação de tudo o que já foi enfileirado."""
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            self._queue.join()
+
+    # --------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------
+    def report(self, turma: str = None, periodo: str = None, top: int = 10):
+        """
+        Relatório de uma turma e/ou período (sem filtro: tudo), somando os
+        agregados das turmas/períodos que casarem. None se desligado.
+        """
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        with self._lock:
+            db = self._db()
+            rows = db.execute(
+                "SELECT turma, periodo, essays, sums, grades, rule_counts, rule_essays FROM cohorts"
+                " WHERE (?1 IS NULL OR turma = ?1) AND (?2 IS NULL OR periodo = ?2)"
+                " ORDER BY periodo, turma", (turma, periodo)).fetchall()
+            names = [rule for rule, in db.execute("SELECT rule FROM rules ORDER BY rowid")]
+
+        total = CohortAggregate()
+        for row in rows:
+            total.merge(CohortAggregate.from_row(row[2:]))
+        report = total.report(names, top)
+        report["filters"] = {"turma": turma, "periodo": periodo}
+        report["cohorts"] = [{"turma": t, "periodo": p, "essays": n} for t, p, n, *_ in rows]
+        report["query_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def prometheus(self) -> list:
+        """Linhas de /metrics do registro de estatísticas."""
+        if not self.enabled:
+            return []
+        return (
+            metrics.gauge("corrigeai_analytics_recorded_total", "Redações gravadas nas estatísticas de turma.",
+                          self.recorded, "counter")
+            + metrics.gauge("corrigeai_analytics_dropped_total", "Redações descartadas com a fila cheia.",
+                            self.dropped, "counter")
+            + metrics.gauge("corrigeai_analytics_queued", "Redações aguardando gravação.", self._queue.qsize())
+        )
+
+
+analytics_store = AnalyticsStore()
+metrics.register_collector(analytics_store.prometheus)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estatísticas de turma do CorrigeAI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_report = sub.add_parser("report", help="relatório de uma turma e/ou período")
+    p_report.add_argument("--turma")
+    p_report.add_argument("--periodo")
+    p_report.add_argument("--top", type=int, default=10, help="regras mais frequentes listadas")
+    p_report.add_argument("--db", default=ANALYTICS_DB, help="arquivo SQLite (padrão: CORRIGEAI_ANALYTICS_DB)")
+
+    args = parser.parse_args(argv)
+    if not args.db:
+        print("[AVISO] Informe --db ou CORRIGEAI_ANALYTICS_DB")
+        raise SystemExit(1)
+    report = AnalyticsStore(args.db).report(args.turma, args.periodo, args.top)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
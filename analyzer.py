@@ -5,261 +5,877 @@ Usa language_tool_python (LanguageTool) para gramática
 + regras customizadas para estilo, estrutura e nota.
 """
 
+import os
 import re
 import math
+import time
+import bisect
+import hashlib
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from grammar import GrammarBackend
+from lexicon import AccentLexicon
+from metrics import marker
+from profiles import Profile, get_profile
+from similarity import combine as combine_signatures, paragraph_signature
+from rules import RuleSet, RuleStore
 
 # ============================================================
-# Tentar importar LanguageTool (precisa de Java instalado)
-# Se não tiver, usa apenas regras customizadas
+# Backend de gramática: pool de servidores LanguageTool
+# (precisa de Java instalado). Sobe em segundo plano na primeira
+# análise (ou no boot do servidor); até ficar pronto, ou se não
+# houver Java, usa apenas regras customizadas.
 # ============================================================
-try:
-    import language_tool_python
-    _lt = language_tool_python.LanguageTool('pt-BR')
-    HAS_LANGUAGE_TOOL = True
-    print("[OK] LanguageTool carregado com sucesso (pt-BR)")
-except Exception as e:
-    _lt = None
-    HAS_LANGUAGE_TOOL = False
-    print(f"[AVISO] LanguageTool não disponível: {e}")
-    print("[INFO] Usando apenas regras customizadas.")
+grammar_backend = GrammarBackend()
+
+# ============================================================
+# Léxico de acentuação (índice em disco, mmap). Se o arquivo não
+# existir, valem só as correções de accent_fixes dos pacotes de regras.
+# ============================================================
+accent_lexicon = AccentLexicon()
 
 
 # ============================================================
-# DICIONÁRIO DE PALAVRAS SEM ACENTO → COM ACENTO
+# Regras customizadas: pacotes JSON em regras/, compilados e
+# recarregados a quente quando os arquivos mudam (rules.py). Cada
+# análise pega um RuleSet no início e o usa até o fim.
 # ============================================================
-ACCENT_FIXES = {
-    "educacao": "educação", "situacao": "situação", "populacao": "população",
-    "nacao": "nação", "informacao": "informação", "comunicacao": "comunicação",
-    "organizacao": "organização", "preocupacao": "preocupação", "solucao": "solução",
-    "açao": "ação", "relaçao": "relação", "condiçao": "condição",
-    "produçao": "produção", "construçao": "construção", "destruiçao": "destruição",
-    "transformacoes": "transformações", "condicoes": "condições",
-    "situacoes": "situações", "informacoes": "informações",
-    "politicas": "políticas", "publicas": "públicas", "publico": "público",
-    "tambem": "também", "porem": "porém", "entao": "então",
-    "nao": "não", "sao": "são", "estao": "estão", "serao": "serão",
-    "necessario": "necessário", "necessaria": "necessária",
-    "possivel": "possível", "impossivel": "impossível",
-    "responsavel": "responsável", "vulneravel": "vulnerável",
-    "acessivel": "acessível", "disponivel": "disponível",
-    "ultimos": "últimos", "ultimo": "último", "ultima": "última",
-    "indice": "índice", "indices": "índices",
-    "familia": "família", "familias": "famílias",
-    "saude": "saúde", "conteudo": "conteúdo", "conteudos": "conteúdos",
-    "sera": "será", "tambem": "também", "voce": "você",
-    "ate": "até", "alem": "além", "ja": "já",
-    "alguem": "alguém", "ninguem": "ninguém",
-    "historia": "história", "historico": "histórico",
-    "economica": "econômica", "economico": "econômico",
-    "tecnologica": "tecnológica", "tecnologico": "tecnológico",
-    "psiquico": "psíquico", "fisico": "físico",
-    "obrigatorio": "obrigatório", "contrario": "contrário",
-    "salario": "salário", "varios": "vários", "varias": "várias",
-    "frustracao": "frustração", "violencia": "violência",
-    "experiencia": "experiência", "consequencia": "consequência",
-    "ausencia": "ausência", "frequencia": "frequência",
-    "crianca": "criança", "criancas": "crianças",
-    "funçao": "função", "regiao": "região", "regioes": "regiões",
-}
+rule_store = RuleStore()
+
 
 # ============================================================
-# GÍRIAS / INTERNETÊS
+# ORÇAMENTO DE TEMPO POR REGRA
+# Cada regra tem um limite de tempo por requisição; a que estourar é
+# desligada pelo resto da requisição e aparece em
+# stats["rules_aborted"] (o resultado, incompleto, não vai para o cache).
 # ============================================================
-INFORMAL_TERMS = {
-    r"\bvc\b": ('"vc"', '"você"'),
-    r"\bpq\b": ('"pq"', '"porque"'),
-    r"\btbm\b": ('"tbm"', '"também"'),
-    r"\btb\b": ('"tb"', '"também"'),
-    r"\bmt\b": ('"mt"', '"muito"'),
-    r"\bblz\b": ('"blz"', '"beleza"'),
-    r"\bflw\b": ('"flw"', '"falou"'),
-    r"\bpfv\b|\bpfvr\b": ('"pfv"', '"por favor"'),
-    r"\bobg\b|\bobgd\b": ('"obg"', '"obrigado(a)"'),
-    r"\bmds\b": ('"mds"', '"meu Deus"'),
-    r"\btd\b": ('"td"', '"tudo"'),
-    r"\bqnd\b|\bqdo\b": ('"qnd/qdo"', '"quando"'),
-    r"\bcmg\b": ('"cmg"', '"comigo"'),
-    r"\bctg\b": ('"ctg"', '"contigo"'),
-    r"\bdps\b": ('"dps"', '"depois"'),
-    r"\bhj\b": ('"hj"', '"hoje"'),
-    r"\bmsm\b": ('"msm"', '"mesmo"'),
-    r"\bnd\b": ('"nd"', '"nada"'),
-    r"\bngm\b": ('"ngm"', '"ninguém"'),
-    r"\bslk\b": ('"slk"', '(gíria)'),
-    r"\bmano\b": ('"mano"', '(coloquial)'),
-    r"\bgalera\b": ('"galera"', '(coloquial)'),
-    r"\bkk+\b": ('"kkk"', '(risada informal)'),
-    r"\brs+\b": ('"rs"', '(risada informal)'),
-    r"\bhaha+\b": ('"haha"', '(risada informal)'),
-    r"\btipo assim\b": ('"tipo assim"', '(informal)'),
-    r"\bne\b": ('"ne"', '"não é"'),
-    r"\bent\b": ('"ent"', '"então"'),
-    r"\bdai\b": ('"dai"', '"daí"'),
-    r"\bpra\b": ('"pra"', '"para"'),
-    r"\bpro\b": ('"pro"', '"para o"'),
-}
+RULE_BUDGET = float(os.environ.get("CORRIGEAI_RULE_BUDGET_MS", 50)) / 1000
+
+
+class RuleBudget:
+    """Tempo gasto por regra numa requisição (limit em segundos)."""
+
+    __slots__ = ("limit", "spent", "aborted")
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.spent = {}
+        self.aborted = set()
+
+    def charge(self, rule_id: str, seconds: float):
+        spent = self.spent.get(rule_id, 0.0) + seconds
+        self.spent[rule_id] = spent
+        if spent > self.limit and rule_id not in self.aborted:
+            self.aborted.add(rule_id)
+            print(f"[AVISO regras] {rule_id} desligada: {spent * 1000:.1f} ms "
+                  f"(orçamento {self.limit * 1000:.0f} ms)")
+
+
+def new_budget(chars: int):
+    """
+    RuleBudget para um texto de `chars` caracteres (RULE_BUDGET a cada
+    10.000, já que as regras são lineares), ou None se
+    CORRIGEAI_RULE_BUDGET_MS=0.
+    """
+    if RULE_BUDGET <= 0:
+        return None
+    return RuleBudget(RULE_BUDGET * max(1.0, chars / 10000))
+
 
 # ============================================================
-# CLICHÊS E EXPRESSÕES DESGASTADAS
+# MOTOR LÉXICO COMPILADO (gírias, clichês e expressões vagas)
+# As regras são indexadas pelo prefixo (até 2 letras) da primeira
+# palavra (RuleSet.lexical_index). A varredura passa uma vez pelas
+# palavras do texto e só testa, em cada início de palavra, as regras
+# daquele prefixo: o custo cresce com o tamanho do texto, não com o
+# número de regras. Regras que não começam com letras fixas varrem o
+# texto uma a uma, todas as ocorrências de cada uma.
 # ============================================================
-CLICHES = [
-    (r"nos dias de hoje", '"nos dias de hoje"'),
-    (r"desde os prim[oó]rdios", '"desde os primórdios"'),
-    (r"desde que o mundo [eé] mundo", '"desde que o mundo é mundo"'),
-    (r"muito se (discute|debate|fala)", '"muito se discute/debate"'),
-    (r"nesse sentido", '"nesse sentido"'),
-    (r"diante disso", '"diante disso"'),
-    (r"dessa forma", '"dessa forma"'),
-    (r"sendo assim", '"sendo assim"'),
-    (r"conclui-se que", '"conclui-se que"'),
-    (r"em pleno s[eé]culo (xxi|21)", '"em pleno século XXI"'),
-    (r"ser algu[eé]m na vida", '"ser alguém na vida"'),
-    (r"[eé] sabido que", '"é sabido que"'),
-    (r"ao longo da hist[oó]ria", '"ao longo da história"'),
-    (r"um grande desafio", '"um grande desafio"'),
-    (r"cabe ressaltar que", '"cabe ressaltar que"'),
-    (r"vale lembrar que", '"vale lembrar que"'),
-]
+_WORD = re.compile(r'\w+')
+
+
+def scan_lexical(lowered: str, pos: int = 0, endpos: int = None, budget: RuleBudget = None,
+                 ruleset: RuleSet = None, kinds: frozenset = None) -> list:
+    """
+    Varre lowered[pos:endpos] (texto já em minúsculas) uma única vez.
+    Retorna [(rule_id, offset, trecho), ...] em ordem de ocorrência,
+    com offsets relativos ao texto inteiro. Com budget, cada tentativa
+    é cronometrada e regras desligadas são puladas. ruleset: None usa
+    o conjunto de regras ativo. kinds: só as regras desses tipos.
+    """
+    if endpos is None:
+        endpos = len(lowered)
+    if ruleset is None:
+        ruleset = rule_store.current()
+
+    hits = []
+    if kinds is None:
+        index, unindexed = ruleset.lexical_index, ruleset.unindexed_rules
+    else:
+        index, unindexed = ruleset.lexical_matchers(kinds)
+    if budget is None:
+        for word in _WORD.finditer(lowered, pos, endpos):
+            start = word.start()
+            candidates = index.get(lowered[start:min(start + 2, word.end())])
+            if candidates:
+                for rule_id, regex in candidates:
+                    m = regex.match(lowered, start, endpos)
+                    if m:
+                        hits.append((rule_id, start, m.group()))
+    else:
+        clock = time.perf_counter
+        aborted = budget.aborted
+        for word in _WORD.finditer(lowered, pos, endpos):
+            start = word.start()
+            candidates = index.get(lowered[start:min(start + 2, word.end())])
+            if candidates:
+                for rule_id, regex in candidates:
+                    if rule_id in aborted:
+                        continue
+                    t0 = clock()
+                    m = regex.match(lowered, start, endpos)
+                    budget.charge(rule_id, clock() - t0)
+                    if m:
+                        hits.append((rule_id, start, m.group()))
+
+    if unindexed:
+        for rule_id, regex in unindexed:
+            if budget is not None and rule_id in budget.aborted:
+                continue
+            t0 = time.perf_counter()
+            m = regex.search(lowered, pos, endpos)
+            while m:
+                hits.append((rule_id, m.start(), m.group()))
+                # Recomeça logo após o início para não perder ocorrências sobrepostas
+                m = regex.search(lowered, m.start() + 1, endpos)
+            if budget is not None:
+                budget.charge(rule_id, time.perf_counter() - t0)
+        hits.sort(key=lambda h: h[1])
+
+    return hits
+
+
+def ruleset_version(ruleset: RuleSet = None) -> str:
+    """
+    Impressão digital das regras em uso (pacotes + léxico de acentuação):
+    muda sempre que algum pacote muda. Vai nas respostas e nas chaves
+    de cache.
+    """
+    if ruleset is None:
+        ruleset = rule_store.current()
+    return hashlib.sha1(f"{ruleset.digest}:{accent_lexicon.version}".encode("utf-8")).hexdigest()[:12]
+
+
+def restore_accent(word: str, ruleset: RuleSet):
+    """Forma acentuada de uma palavra sem acento, ou None. accent_fixes tem prioridade."""
+    return ruleset.accent_fixes.get(word) or accent_lexicon.restore(word)
+
+
+# ============================================================
+# PARÁGRAFOS E RESULTADOS PARCIAIS
+# Cada parágrafo gera um resultado parcial (achados do
+# LanguageTool, regras por frase e agregados de palavras) que
+# não depende do resto do texto. O documento é montado a partir
+# dos parciais, então um parágrafo inalterado pode ser reaproveitado
+# de um cache (modo incremental) sem passar de novo pelo LanguageTool.
+# ============================================================
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_GRAMMAR_SEPARATOR = "\n\n"
+
+
+def split_paragraphs(text: str) -> list:
+    """Retorna [(offset, parágrafo), ...] com cada parágrafo já sem espaços nas pontas."""
+    spans = []
+    pos = 0
+    for m in [*_PARAGRAPH_BREAK.finditer(text), None]:
+        end = m.start() if m else len(text)
+        segment = text[pos:end]
+        stripped = segment.strip()
+        if stripped:
+            spans.append((pos + len(segment) - len(segment.lstrip()), stripped))
+        if m:
+            pos = m.end()
+    return spans
+
+
+def _check_grammar(paragraphs: list, timeout: float, profile: Profile):
+    """
+    Uma única chamada ao LanguageTool para vários parágrafos (unidos por
+    linha em branco), com as opções do perfil. Retorna os matches de cada
+    parágrafo com offsets relativos a ele, ou None se a verificação foi
+    pulada.
+    """
+    starts = []
+    pos = 0
+    for paragraph in paragraphs:
+        starts.append(pos)
+        pos += len(paragraph) + len(_GRAMMAR_SEPARATOR)
+
+    matches = grammar_backend.check(_GRAMMAR_SEPARATOR.join(paragraphs), timeout, **profile.grammar_options())
+    if matches is None:
+        return None
+
+    per_paragraph = [[] for _ in paragraphs]
+    for match in matches:
+        i = bisect.bisect_right(starts, match["offset"]) - 1
+        per_paragraph[i].append(dict(match, offset=match["offset"] - starts[i]))
+    return per_paragraph
+
 
 # ============================================================
-# EXPRESSÕES VAGAS
+# DOCUMENTO TOKENIZADO
+# O texto é tokenizado uma única vez por requisição; todas as
+# regras e métricas consomem estas tabelas em vez de refazer
+# split/lower/re.sub a cada etapa.
 # ============================================================
-VAGUE_EXPRESSIONS = [
-    r"\balguma coisa\b",
-    r"\bfazer algo\b",
-    r"\bde algum modo\b",
-    r"\bde alguma forma\b",
-    r"\bmuita coisa\b",
-    r"\bv[aá]rias coisas\b",
-    r"\besse problema\b(?!.*\b(de|da|do|que)\b)",
-]
+_TOKEN = re.compile(r'\S+')
+_SENTENCE_SPLIT = re.compile(r'([.!?]+)')
+_NON_LETTER = re.compile(r'[^a-záàâãéèêíïóôõúüç]')
+_LOWER_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyzáàâãéèêíïóôõúüç")
+_EDGE_PUNCT = ".,;:!?()\"'"
+
+
+class Document:
+    """
+    Texto tokenizado. Cada token (trecho sem espaços) ocupa a mesma
+    posição em tabelas paralelas:
+      tokens, lower   texto original e em minúsculas
+      norm            minúsculas sem pontuação nas pontas (acentuação)
+      clean           só letras (contagem de repetição)
+      offsets         posição do token no texto
+      paragraph       índice do parágrafo
+      sentence        índice da frase em `sentences`
+    sentences: [palavras, começa com minúscula, início, fim] de cada
+    frase, com a mesma divisão de re.split(r'[.!?]+'). Aqui as frases
+    não atravessam parágrafos; a junção de um parágrafo sem pontuação
+    final com o seguinte é feita na montagem do resultado.
+    """
+
+    __slots__ = ("text", "lowered", "paragraphs", "tokens", "lower", "norm", "clean",
+                 "offsets", "paragraph", "sentence", "sentences", "_bounds")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lowered = text.lower()
+        self.paragraphs = split_paragraphs(text)
+        self.tokens, self.lower, self.norm, self.clean = [], [], [], []
+        self.offsets, self.paragraph, self.sentence = array("l"), array("l"), array("l")
+        self.sentences = []
+        self._bounds = []
+
+        tokens, lower, norm, clean = self.tokens, self.lower, self.norm, self.clean
+        offsets, paragraph_of, sentence_of = self.offsets, self.paragraph, self.sentence
+        sentences = self.sentences
+
+        for p, (start, paragraph) in enumerate(self.paragraphs):
+            self._bounds.append((len(tokens), len(sentences)))
+            in_sentence = False
+
+            for m in _TOKEN.finditer(text, start, start + len(paragraph)):
+                token = m.group()
+                pos = m.start()
+                low = token.lower()
+                tokens.append(token)
+                lower.append(low)
+                norm.append(low.strip(_EDGE_PUNCT))
+                clean.append(_NON_LETTER.sub('', low))
+                offsets.append(pos)
+                paragraph_of.append(p)
+
+                # Pontuação de fim de frase pode aparecer no meio do token
+                # ("fim.Começo"): cada pedaço conta como palavra da sua frase
+                parts = _SENTENCE_SPLIT.split(token) if ('.' in token or '!' in token or '?' in token) else (token,)
+                first = -1
+                rel = 0
+                for k, part in enumerate(parts):
+                    if k % 2:
+                        in_sentence = False
+                    elif part:
+                        end = pos + rel + len(part)
+                        if in_sentence:
+                            sentences[-1][0] += 1
+                            sentences[-1][3] = end
+                        else:
+                            sentences.append([1, part[0] in _LOWER_LETTERS, pos + rel, end])
+                            in_sentence = True
+                        if first < 0:
+                            first = len(sentences) - 1
+                    rel += len(part)
+                sentence_of.append(first if first >= 0 else len(sentences) - 1)
+
+        self._bounds.append((len(tokens), len(sentences)))
+
+    @classmethod
+    def outline(cls, text: str) -> "Document":
+        """Só texto e parágrafos, sem tokenizar (basta para _assemble)."""
+        doc = cls.__new__(cls)
+        doc.text = text
+        doc.lowered = text.lower()
+        doc.paragraphs = split_paragraphs(text)
+        return doc
+
+    def paragraph_bounds(self, p: int) -> tuple:
+        """(1º token, fim dos tokens, 1ª frase, fim das frases) do parágrafo p."""
+        (ta, sa), (tb, sb) = self._bounds[p], self._bounds[p + 1]
+        return ta, tb, sa, sb
+
+
+def _sentence_windows(doc: Document, start: int, end: int, sa: int, sb: int) -> list:
+    """
+    Trechos [início, fim) de cada frase do parágrafo, cada um indo até o
+    início da frase seguinte (inclui a pontuação final). As regras rodam
+    dentro de um trecho, então nenhuma atravessa o fim de uma frase.
+    """
+    bounds = [s for _, _, s, _ in doc.sentences[sa:sb]]
+    if not bounds:
+        return [(start, end)]
+    bounds[0] = start
+    return list(zip(bounds, bounds[1:] + [end]))
+
+
+def analyze_paragraph(doc: Document, p: int, ruleset: RuleSet, profile: Profile,
+                      grammar: list = None, budget: RuleBudget = None) -> dict:
+    """
+    Resultado parcial do parágrafo p com as regras de `ruleset`, só nas
+    etapas do perfil. Serializável em JSON, para poder ser guardado em
+    cache; offsets relativos ao início do parágrafo.
+    grammar: matches do LanguageTool já relativos ao parágrafo (None se
+    não houve verificação).
+    budget: orçamento de tempo por regra da requisição (None: sem limite).
+    """
+    start, paragraph = doc.paragraphs[p]
+    end = start + len(paragraph)
+    ta, tb, sa, sb = doc.paragraph_bounds(p)
+    windows = _sentence_windows(doc, start, end, sa, sb)
+    lowered = doc.lowered
+    clock = time.perf_counter
+    stages = profile.stages
+
+    # Ocorrências de cada regra léxica (passos 4, 5 e 6)
+    lexical = {}
+    if profile.lexical_kinds:
+        kinds = profile.lexical_kinds if len(profile.lexical_kinds) < 3 else None
+        for s, e in windows:
+            for rule_id, offset, snippet in scan_lexical(lowered, s, e, budget, ruleset, kinds):
+                lexical.setdefault(rule_id, []).append([offset - start, len(snippet)])
+
+    # Candidatas a acento ausente, na ordem em que aparecem
+    accent_candidates = {}
+    if "acentuacao" in stages and (budget is None or "ACCENTS" not in budget.aborted):
+        t0 = clock()
+        for i in range(ta, tb):
+            word = doc.norm[i]
+            if restore_accent(word, ruleset):
+                lead = len(doc.lower[i]) - len(doc.lower[i].lstrip(_EDGE_PUNCT))
+                accent_candidates.setdefault(word, []).append([doc.offsets[i] + lead - start, len(word)])
+        if budget is not None:
+            budget.charge("ACCENTS", clock() - t0)
+
+    # Primeira ocorrência de cada padrão no parágrafo, frase a frase
+    concordance = []
+    for i, regex in enumerate(ruleset.concordance_regexes):
+        rule_id = ruleset.concordance_ids[i]
+        if "concordancia" not in stages or (budget is not None and rule_id in budget.aborted):
+            continue
+        t0 = clock()
+        for s, e in windows:
+            m = regex.search(lowered, s, e)
+            if m:
+                concordance.append([i, m.start() - start, m.end() - m.start()])
+                break
+        if budget is not None:
+            budget.charge(rule_id, clock() - t0)
+
+    word_freq = {}
+    if "repeticao" in stages:
+        stop_words = ruleset.stop_words
+        for clean in doc.clean[ta:tb]:
+            if len(clean) > 3 and clean not in stop_words:
+                word_freq[clean] = word_freq.get(clean, 0) + 1
+
+    return {
+        "grammar": grammar,
+        "word_count": tb - ta,
+        "word_chars": sum(map(len, doc.tokens[ta:tb])),
+        "commas": paragraph.count(','),
+        # [nº de palavras, começa com minúscula, início, fim] de cada frase
+        "sentences": [[count, lower, s - start, e - start]
+                      for count, lower, s, e in doc.sentences[sa:sb]],
+        # Sem pontuação final, a última frase continua no próximo parágrafo
+        "open_end": not paragraph.endswith(('.', '!', '?')),
+        "accent_candidates": accent_candidates,
+        "concordance": concordance,
+        "lexical": lexical,
+        "word_freq": word_freq,
+        "vocabulary": sorted(set(doc.lower[ta:tb])),
+        # Assinatura MinHash dos shingles do parágrafo (detecção de cópias)
+        "minhash": paragraph_signature(doc.clean[ta:tb]) if "similaridade" in stages else None,
+        # Regras desligadas pelo orçamento de tempo (parcial incompleto)
+        "rules_aborted": sorted(budget.aborted) if budget is not None else [],
+    }
+
+
+# ============================================================
+# ACHADOS DO LANGUAGETOOL
+# Regras genéricas demais (WHITESPACE_RULE etc.) já vão desligadas na
+# requisição (profiles.BASE_DISABLED_RULES): nada é descartado aqui.
+# ============================================================
+def grammar_error(match: dict) -> dict:
+    """Converte um match do LanguageTool em erro da resposta."""
+    # Categorizar o tipo de erro
+    category = match["category"]
+
+    # Determinar tipo
+    if any(k in category.upper() for k in ["GRAMM", "AGREEMENT", "SYNTAX", "TYPO", "SPELL"]):
+        err_type = "grammar"
+    elif any(k in category.upper() for k in ["STYLE", "REDUNDANCY", "TYPOGRAPHY"]):
+        err_type = "style"
+    else:
+        err_type = "grammar"
+
+    # Trecho do erro
+    ctx = match["context"]
+    offset = match["context_offset"]
+    length = match["length"]
+    highlighted = ctx[offset:offset+length] if offset + length <= len(ctx) else ""
+
+    suggestion_text = ""
+    if match["replacements"]:
+        top = match["replacements"][:3]
+        suggestion_text = f'Sugestão: {", ".join(top)}'
+
+    error_msg = match["message"] or "Erro detectado"
+    if highlighted:
+        error_msg = f'"{highlighted}" — {error_msg}'
+
+    return {
+        "type": err_type,
+        "text": error_msg,
+        "suggestion": suggestion_text if suggestion_text else "Revise este trecho.",
+        "source": "languagetool",
+        "offset": match["offset"],
+        "length": match["length"],
+    }
 
 
 # ============================================================
 # ANÁLISE PRINCIPAL
 # ============================================================
-def analyze(text: str) -> dict:
-    """Analisa um texto e retorna erros, nota e estatísticas."""
+def analyze(text: str, grammar_timeout: float = None, paragraph_cache=None, timings=None,
+            ruleset: RuleSet = None, profile: Profile = None, signature: bool = False) -> dict:
+    """
+    Analisa um texto e retorna erros, nota e estatísticas.
+    grammar_timeout: prazo (s) para o LanguageTool; None usa o do perfil
+    (ou o padrão do backend). Se estourar, ou se o LanguageTool ainda
+    estiver aquecendo, o resultado traz só as regras customizadas e
+    stats["grammar_skipped"] = True.
+    paragraph_cache: objeto com lookup(parágrafo, ruleset, perfil) /
+    store(parágrafo, parcial, ruleset, perfil). Parágrafos encontrados
+    nele não são reanalisados.
+    timings: metrics.StageTimer que recebe o tempo de cada etapa.
+    ruleset: regras a usar; None usa o conjunto ativo de rule_store.
+    profile: perfil de análise (profiles.py); None usa o padrão.
+    signature: inclui em result["minhash"] a assinatura do texto para o
+    índice de cópias (similarity.py), de uso interno; fora isso o
+    resultado não a traz.
+    """
+
+    mark = marker(timings)
+    if ruleset is None:
+        ruleset = rule_store.current()
+    if profile is None:
+        profile = get_profile()
+    doc = Document(text)
+    paragraphs = doc.paragraphs
+    mark("documento")
+
+    grammar_backend.start_background()
+    grammar_state = grammar_backend.state
+
+    partials, pending = _load_partials(paragraphs, paragraph_cache, ruleset, profile)
+    mark("cache_paragrafos")
+
+    if pending:
+        grammar = None
+        if profile.grammar and grammar_state == "ready":
+            timeout = profile.grammar_timeout if grammar_timeout is None else grammar_timeout
+            grammar = _check_grammar([paragraphs[i][1] for i in pending], timeout, profile)
+            mark("languagetool")
+
+        budget = new_budget(len(text))
+        for n, i in enumerate(pending):
+            partial = analyze_paragraph(doc, i, ruleset, profile, grammar[n] if grammar is not None else None, budget)
+            partial["grammar_skipped"] = profile.grammar and grammar_state != "unavailable" and grammar is None
+            partials[i] = partial
+            if paragraph_cache is not None and not partial["grammar_skipped"] and not partial["rules_aborted"]:
+                paragraph_cache.store(paragraphs[i][1], partial, ruleset, profile)
+        mark("paragrafos")
+
+    return _assemble(doc, partials, grammar_state, ruleset, profile, mark, signature)
+
+
+def analyze_stream(text: str, grammar_timeout: float = None, paragraph_cache=None, timings=None,
+                   ruleset: RuleSet = None, profile: Profile = None, signature: bool = False):
+    """
+    Versão em etapas de analyze(), para respostas em streaming. Gera pares
+    (evento, dados), na ordem:
+      ("custom", resultado)   estatísticas e regras customizadas, imediato;
+      ("grammar", {...})      achados do LanguageTool de um parágrafo, à
+                              medida que cada verificação termina;
+      ("final", resultado)    resultado completo, igual ao de analyze().
+    Os parágrafos são verificados em paralelo, um por servidor do pool.
+    O tempo em que o gerador fica suspenso (envio ao cliente) não entra
+    em timings.
+    """
+
+    mark = marker(timings)
+    if ruleset is None:
+        ruleset = rule_store.current()
+    if profile is None:
+        profile = get_profile()
+    doc = Document(text)
+    paragraphs = doc.paragraphs
+    mark("documento")
+
+    grammar_backend.start_background()
+    grammar_state = grammar_backend.state
+
+    partials, pending = _load_partials(paragraphs, paragraph_cache, ruleset, profile)
+    mark("cache_paragrafos")
+    budget = new_budget(len(text))
+    for i in pending:
+        partials[i] = analyze_paragraph(doc, i, ruleset, profile, budget=budget)
+        partials[i]["grammar_skipped"] = profile.grammar and grammar_state != "unavailable"
+    mark("paragrafos")
+
+    custom = _assemble(doc, partials, grammar_state, ruleset, profile, mark)
+    yield "custom", custom
+    if timings is not None:
+        timings.restart()
+
+    if pending and profile.grammar and grammar_state == "ready":
+        timeout = grammar_timeout if grammar_timeout is not None else profile.grammar_timeout
+        if timeout is None:
+            timeout = grammar_backend.budget
+        options = profile.grammar_options()
+        pool = ThreadPoolExecutor(max_workers=min(len(pending), grammar_backend.size))
+        try:
+            futures = {
+                pool.submit(grammar_backend.check, paragraphs[i][1], timeout, **options): i
+                for i in pending
+            }
+            for future in as_completed(futures, timeout=timeout):
+                i = futures[future]
+                matches = future.result()
+                if matches is None:
+                    continue
+                partials[i]["grammar"] = matches
+                partials[i]["grammar_skipped"] = False
+
+                start = paragraphs[i][0]
+                errors = [grammar_error(dict(m, offset=start + m["offset"])) for m in matches]
+                mark("languagetool")
+                yield "grammar", {"paragraph": i, "errors": errors}
+                if timings is not None:
+                    timings.restart()
+        except FuturesTimeout:
+            pass
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        mark("languagetool")
+
+    if paragraph_cache is not None:
+        for i in pending:
+            if not partials[i]["grammar_skipped"] and not partials[i]["rules_aborted"]:
+                paragraph_cache.store(paragraphs[i][1], partials[i], ruleset, profile)
+        mark("cache_paragrafos")
+
+    yield "final", _assemble(doc, partials, grammar_state, ruleset, profile, mark, signature)
+
+
+# ============================================================
+# DOCUMENTOS LONGOS
+# O texto é dividido em trechos de parágrafos inteiros, analisados
+# em paralelo (um Document e uma chamada ao LanguageTool por trecho).
+# Os parciais já têm offsets relativos ao parágrafo, então a montagem
+# é a mesma de analyze() e o resultado é idêntico.
+# ============================================================
+CHUNK_CHARS = int(os.environ.get("CORRIGEAI_CHUNK_CHARS", 8000))
+
+
+def chunk_paragraphs(paragraphs: list, chunk_chars: int = CHUNK_CHARS) -> list:
+    """Agrupa parágrafos consecutivos em trechos de até chunk_chars. Retorna listas de índices."""
+    groups = []
+    size = 0
+    for i, (_, paragraph) in enumerate(paragraphs):
+        if not groups or size + len(paragraph) > chunk_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append(i)
+        size += len(paragraph) + len(_GRAMMAR_SEPARATOR)
+    return groups
+
+
+def analyze_chunk(paragraphs: list, grammar_timeout: float = None, ruleset: RuleSet = None,
+                  profile: Profile = None) -> tuple:
+    """
+    Parciais de um trecho (lista de parágrafos), como em analyze().
+    Roda nos workers do modo documento longo, com o ruleset e o perfil
+    do processo que dividiu o documento (todos os trechos usam as mesmas
+    regras). Retorna (estado do LanguageTool, parciais).
+    """
+    if ruleset is None:
+        ruleset = rule_store.current()
+    if profile is None:
+        profile = get_profile()
+    doc = Document(_GRAMMAR_SEPARATOR.join(paragraphs))
+
+    grammar_backend.start_background()
+    grammar_state = grammar_backend.state
+    grammar = None
+    if profile.grammar and grammar_state == "ready":
+        timeout = profile.grammar_timeout if grammar_timeout is None else grammar_timeout
+        grammar = _check_grammar(paragraphs, timeout, profile)
+
+    partials = []
+    budget = new_budget(len(doc.text))
+    for i in range(len(paragraphs)):
+        partial = analyze_paragraph(doc, i, ruleset, profile, grammar[i] if grammar is not None else None, budget)
+        partial["grammar_skipped"] = profile.grammar and grammar_state != "unavailable" and grammar is None
+        partials.append(partial)
+    return grammar_state, partials
+
+
+def _bounded_map(executor, fn, jobs, limit: int):
+    """executor.map com no máximo `limit` trechos em andamento (memória limitada)."""
+    pending = deque()
+    for args in jobs:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def analyze_long(text: str, executor=None, max_in_flight: int = 8,
+                 grammar_timeout: float = None, timings=None, ruleset: RuleSet = None,
+                 profile: Profile = None, signature: bool = False) -> dict:
+    """
+    analyze() para documentos longos (monografias, TCCs). Os trechos vão
+    para `executor` (ex.: ProcessPoolExecutor), no máximo max_in_flight
+    por vez; sem executor, são analisados em sequência. Achados,
+    estatísticas e nota são montados a partir dos parciais, com offsets
+    no texto original.
+    """
+    mark = marker(timings)
+    if ruleset is None:
+        ruleset = rule_store.current()
+    if profile is None:
+        profile = get_profile()
+    outline = Document.outline(text)
+    paragraphs = outline.paragraphs
+    jobs = [([paragraphs[i][1] for i in group], grammar_timeout, ruleset, profile)
+            for group in chunk_paragraphs(paragraphs)]
+    mark("divisao")
+
+    if executor is None:
+        results = (analyze_chunk(*job) for job in jobs)
+    else:
+        results = _bounded_map(executor, analyze_chunk, jobs, max_in_flight)
+
+    partials = []
+    states = set()
+    for state, chunk_partials in results:
+        states.add(state)
+        partials.extend(chunk_partials)
+    mark("trechos")
+
+    if len(states) == 1:
+        grammar_state = states.pop()
+    elif states:
+        grammar_state = "warming"          # workers em estados diferentes
+    else:
+        grammar_state = grammar_backend.state
+    return _assemble(outline, partials, grammar_state, ruleset, profile, mark, signature)
+
+
+def _load_partials(paragraphs: list, paragraph_cache, ruleset: RuleSet, profile: Profile):
+    """Busca os parciais já em cache. Retorna (parciais, índices pendentes)."""
+    partials = [paragraph_cache.lookup(p, ruleset, profile) if paragraph_cache is not None else None
+                for _, p in paragraphs]
+    pending = [i for i, partial in enumerate(partials) if partial is None]
+    return partials, pending
+
+
+def _located(spans: list) -> dict:
+    """Campos de posição de um achado: primeira ocorrência e todas as ocorrências."""
+    spans = sorted(spans)
+    return {"offset": spans[0][0], "length": spans[0][1], "spans": spans}
+
+
+# ============================================================
+# MENSAGENS FIXAS
+# Textos dos achados que não dependem do texto analisado. Também
+# formam o catálogo do formato compacto da API (encoding.py).
+# ============================================================
+MESSAGES = {
+    "acentuacao.sugestao": "Essas palavras exigem acentuação gráfica conforme as regras do português.",
+    "cliches.sugestao": "Clichês enfraquecem a argumentação. Substitua por conectivos e expressões mais originais e específicas.",
+    "vagas.sugestao": "Seja mais específico. Ao invés de 'alguma coisa', descreva exatamente o que propõe.",
+    "pontuacao_final.texto": "Texto não termina com pontuação final",
+    "pontuacao_final.sugestao": "Finalize com ponto final, interrogação ou exclamação.",
+    "virgulas.texto": "Poucas vírgulas para o tamanho do texto",
+    "virgulas.sugestao": "Use vírgulas para separar orações, adjuntos deslocados e enumerações. Isso melhora a leitura.",
+    "paragrafos.texto": "Texto sem divisão em parágrafos",
+    "paragrafos.sugestao": "Divida em parágrafos: introdução, desenvolvimento (2-3 parágrafos) e conclusão. Cada parágrafo deve ter uma ideia central.",
+    "frases_longas.sugestao": "Frases longas demais dificultam a compreensão. Divida em períodos menores.",
+    "minusculas.sugestao": "Toda frase deve começar com letra maiúscula após pontuação final.",
+    "repeticao.sugestao": "Use sinônimos ou reformule frases para evitar repetição e enriquecer o vocabulário.",
+    "texto_muito_curto.sugestao": "Uma redação deve ter no mínimo 7 linhas (~100 palavras). Desenvolva argumentos com exemplos e dados.",
+    "texto_curto.sugestao": "Tente expandir para 200+ palavras. Adicione argumentos, exemplos concretos e dados para fortalecer o texto.",
+    "bom_volume.sugestao": "O tamanho está adequado. Verifique se todos os argumentos estão bem desenvolvidos.",
+    "boa_estrutura.sugestao": "A divisão em parágrafos demonstra organização e facilita a leitura.",
+    "vocabulario.sugestao": "Bom uso de vocabulário variado, o que enriquece o texto.",
+    "sem_erros.texto": "Nenhum erro significativo encontrado",
+    "sem_erros.sugestao": "Texto muito bem escrito! Continue praticando para manter esse nível de qualidade.",
+    "continue.texto": "Continue praticando!",
+    "continue.sugestao": "Cada erro corrigido é um aprendizado. Revise seus textos anteriores e observe sua evolução.",
+    "nota.alta": "Bom trabalho! Texto com boa qualidade.",
+    "nota.media": "Razoável. Corrija os erros apontados.",
+    "nota.baixa": "Precisa de revisão. Analise cada erro com atenção.",
+}
+
+
+def _assemble(doc: Document, partials: list, grammar_state: str, ruleset: RuleSet,
+              profile: Profile, mark=marker(None), signature: bool = False) -> dict:
+    """
+    Monta o resultado do documento a partir dos parciais de cada parágrafo
+    (analisados com `ruleset` e `profile`). mark(etapa) é chamado ao fim
+    de cada passo numerado. signature: inclui "minhash" (ver analyze()).
+    """
 
     errors = []
-    lt = text.lower()
-    words = text.split()
-    word_count = len(words)
-    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
-    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    text = doc.text
+    lt = doc.lowered
+    paragraphs = doc.paragraphs
+    starts = [start for start, _ in paragraphs]
+    word_count = sum(p["word_count"] for p in partials)
+    grammar_skipped = any(p["grammar_skipped"] for p in partials)
+    rules_aborted = sorted({rule for p in partials for rule in p["rules_aborted"]})
+    # Ocorrências por id de regra (LanguageTool e regras dos pacotes), para as estatísticas de turma
+    rule_hits = {}
+
+    # Frases do documento, reconstruídas a partir dos parciais
+    sentences = []
+    open_end = False
+    for start, partial in zip(starts, partials):
+        for n, (count, lower, s, e) in enumerate(partial["sentences"]):
+            if n == 0 and open_end and sentences:
+                sentences[-1][0] += count
+                sentences[-1][3] = start + e
+            else:
+                sentences.append([count, lower, start + s, start + e])
+        open_end = partial["open_end"]
+    sentence_count = len(sentences)
+
+    mark("frases")
 
     # ========================================================
     # 1) LANGUAGETOOL (se disponível)
     # ========================================================
     lt_error_count = 0
-    if HAS_LANGUAGE_TOOL:
-        try:
-            matches = _lt.check(text)
-            for match in matches:
-                # Categorizar o tipo de erro
-                category = match.category or ""
-                rule_id = match.ruleId or ""
-
-                # Ignorar regras muito genéricas ou falsos positivos comuns
-                skip_rules = [
-                    "WHITESPACE_RULE", "COMMA_PARENTHESIS_WHITESPACE",
-                    "UNPAIRED_BRACKETS"
-                ]
-                if rule_id in skip_rules:
-                    continue
 
-                # Determinar tipo
-                if any(k in category.upper() for k in ["GRAMM", "AGREEMENT", "SYNTAX", "TYPO", "SPELL"]):
-                    err_type = "grammar"
-                elif any(k in category.upper() for k in ["STYLE", "REDUNDANCY", "TYPOGRAPHY"]):
-                    err_type = "style"
-                else:
-                    err_type = "grammar"
-
-                # Trecho do erro
-                ctx = match.context or ""
-                offset = match.offsetInContext or 0
-                length = match.errorLength or 0
-                highlighted = ctx[offset:offset+length] if offset + length <= len(ctx) else ""
-
-                suggestion_text = ""
-                if match.replacements:
-                    top = match.replacements[:3]
-                    suggestion_text = f'Sugestão: {", ".join(top)}'
-
-                error_msg = match.message or "Erro detectado"
-                if highlighted:
-                    error_msg = f'"{highlighted}" — {error_msg}'
+    matches = [
+        dict(match, offset=start + match["offset"])
+        for start, partial in zip(starts, partials)
+        for match in partial["grammar"] or []
+    ]
 
-                errors.append({
-                    "type": err_type,
-                    "text": error_msg,
-                    "suggestion": suggestion_text if suggestion_text else "Revise este trecho.",
-                    "source": "languagetool",
-                    "offset": match.offset,
-                    "length": match.errorLength,
-                })
-                lt_error_count += 1
+    for match in matches:
+        errors.append(grammar_error(match))
+        lt_error_count += 1
+        rule_hits[match["rule_id"]] = rule_hits.get(match["rule_id"], 0) + 1
 
-                # Limitar para não poluir
-                if lt_error_count >= 20:
-                    break
+        # Limitar para não poluir (o perfil full aceita mais)
+        if lt_error_count >= profile.max_grammar_errors:
+            break
 
-        except Exception as e:
-            print(f"[ERRO LanguageTool] {e}")
+    mark("achados_lt")
 
     # ========================================================
     # 2) REGRAS CUSTOMIZADAS - ACENTUAÇÃO
     # ========================================================
     missing_accents = []
-    words_lower = [w.lower().strip(".,;:!?()\"'") for w in words]
+    candidates = {}
+    for start, partial in zip(starts, partials):
+        for word, spans in partial["accent_candidates"].items():
+            candidates.setdefault(word, []).extend([start + o, n] for o, n in spans)
 
-    for word_clean in set(words_lower):
-        if word_clean in ACCENT_FIXES:
-            correct = ACCENT_FIXES[word_clean]
-            # Verificar se a versão correta já existe no texto
-            if correct.lower() not in lt:
-                missing_accents.append(f'"{word_clean}" → "{correct}"')
+    for word_clean, spans in candidates.items():
+        correct = restore_accent(word_clean, ruleset)
+        # Verificar se a versão correta já existe no texto
+        if correct.lower() not in lt:
+            missing_accents.append((f'"{word_clean}" → "{correct}"', spans))
 
     if missing_accents:
+        rule_hits["ACENTUACAO"] = len(missing_accents)
         # Agrupar em chunks de 5 para não ficar gigante
         for i in range(0, len(missing_accents), 5):
             chunk = missing_accents[i:i+5]
             errors.append({
                 "type": "grammar",
-                "text": f"Palavras sem acentuação: {', '.join(chunk)}",
-                "suggestion": "Essas palavras exigem acentuação gráfica conforme as regras do português.",
+                "text": f"Palavras sem acentuação: {', '.join(label for label, _ in chunk)}",
+                "suggestion": MESSAGES["acentuacao.sugestao"],
                 "source": "custom",
+                **_located([span for _, spans in chunk for span in spans]),
             })
 
+    mark("acentuacao")
+
     # ========================================================
     # 3) REGRAS CUSTOMIZADAS - CONCORDÂNCIA VERBAL
     # ========================================================
-    # Sujeito plural + verbo singular
-    concordance_patterns = [
-        (r"\b(os|as|esses?|essas?|muitos|muitas|diversos|diversas|vários|várias|alguns|algumas|todos|todas|professores|alunos|estudantes|jovens|crianças|criancas|pessoas|escolas|cidades|políticas|politicas|mudanças|mudancas|problemas|tecnologias)\b[^.!?]{0,30}\b(precisa|conta|recebe|apresenta|encontra|sofre|ganha|tem|vem|afeta|representa|contribui|gera|causa|existe|faz|alerta|desempenha|funciona)\b",
-         "Possível erro de concordância: verbo no singular com sujeito no plural",
-         "Quando o sujeito está no plural, o verbo deve concordar. Ex: 'Os alunos precisam' (não 'precisa'), 'As escolas contam' (não 'conta')."),
-    ]
+    concordance_hits = {}
+    for start, partial in zip(starts, partials):
+        for i, offset, length in partial["concordance"]:
+            concordance_hits.setdefault(i, [start + offset, length])
 
-    for pattern, msg, suggestion in concordance_patterns:
-        if re.search(pattern, lt):
+    for i, (pattern, msg, suggestion) in enumerate(ruleset.concordance):
+        if i in concordance_hits:
             # Evitar duplicatas com LanguageTool
             if not any(e.get("source") == "languagetool" and "concord" in e["text"].lower() for e in errors):
+                rule_hits[ruleset.concordance_ids[i]] = 1
                 errors.append({
                     "type": "grammar",
                     "text": msg,
                     "suggestion": suggestion,
                     "source": "custom",
+                    **_located([concordance_hits[i]]),
                 })
 
+    mark("concordancia")
+
     # ========================================================
     # 4) REGRAS CUSTOMIZADAS - LINGUAGEM INFORMAL
     # ========================================================
+    # Ocorrências de cada regra léxica no documento (passos 4, 5 e 6)
+    lexical_hits = {}
+    for start, partial in zip(starts, partials):
+        for rule_id, spans in partial["lexical"].items():
+            lexical_hits.setdefault(rule_id, []).extend([start + o, n] for o, n in spans)
+    for rule_id, spans in lexical_hits.items():
+        rule_hits[rule_id] = len(spans)
+
     found_informal = []
-    for pattern, (term, replacement) in INFORMAL_TERMS.items():
-        if re.search(pattern, lt):
+    informal_spans = []
+    for rule_id, (kind, _, payload) in ruleset.lexical_rules.items():
+        if kind == "informal" and rule_id in lexical_hits:
+            term, replacement = payload
             found_informal.append(f'{term} → {replacement}')
+            informal_spans.extend(lexical_hits[rule_id])
 
     if found_informal:
         errors.append({
@@ -267,41 +883,54 @@ def analyze(text: str) -> dict:
             "text": f"Linguagem informal / internetês detectada ({len(found_informal)} ocorrências)",
             "suggestion": f"Em textos formais, evite: {', '.join(found_informal[:8])}{'...' if len(found_informal) > 8 else ''}.",
             "source": "custom",
+            **_located(informal_spans),
         })
 
+    mark("informal")
+
     # ========================================================
     # 5) REGRAS CUSTOMIZADAS - CLICHÊS
     # ========================================================
     found_cliches = []
-    for pattern, label in CLICHES:
-        if re.search(pattern, lt):
+    cliche_spans = []
+    for rule_id, (kind, _, label) in ruleset.lexical_rules.items():
+        if kind == "cliche" and rule_id in lexical_hits:
             found_cliches.append(label)
+            cliche_spans.extend(lexical_hits[rule_id])
 
     if found_cliches:
         errors.append({
             "type": "style",
             "text": f"Expressões clichê encontradas: {', '.join(found_cliches)}",
-            "suggestion": "Clichês enfraquecem a argumentação. Substitua por conectivos e expressões mais originais e específicas.",
+            "suggestion": MESSAGES["cliches.sugestao"],
             "source": "custom",
+            **_located(cliche_spans),
         })
 
+    mark("cliches")
+
     # ========================================================
     # 6) REGRAS CUSTOMIZADAS - EXPRESSÕES VAGAS
     # ========================================================
     found_vague = []
-    for pattern in VAGUE_EXPRESSIONS:
-        match = re.search(pattern, lt)
-        if match:
-            found_vague.append(f'"{match.group()}"')
+    vague_spans = []
+    for rule_id, (kind, _, _) in ruleset.lexical_rules.items():
+        if kind == "vague" and rule_id in lexical_hits:
+            offset, length = lexical_hits[rule_id][0]
+            found_vague.append(f'"{lt[offset:offset + length]}"')
+            vague_spans.extend(lexical_hits[rule_id])
 
     if found_vague:
         errors.append({
             "type": "style",
             "text": f"Expressões vagas detectadas: {', '.join(found_vague)}",
-            "suggestion": "Seja mais específico. Ao invés de 'alguma coisa', descreva exatamente o que propõe.",
+            "suggestion": MESSAGES["vagas.sugestao"],
             "source": "custom",
+            **_located(vague_spans),
         })
 
+    mark("vagas")
+
     # ========================================================
     # 7) REGRAS CUSTOMIZADAS - ESTRUTURA
     # ========================================================
@@ -310,17 +939,17 @@ def analyze(text: str) -> dict:
     if text.strip() and not re.search(r'[.!?]\s*$', text.strip()):
         errors.append({
             "type": "style",
-            "text": "Texto não termina com pontuação final",
-            "suggestion": "Finalize com ponto final, interrogação ou exclamação.",
+            "text": MESSAGES["pontuacao_final.texto"],
+            "suggestion": MESSAGES["pontuacao_final.sugestao"],
             "source": "custom",
         })
 
     # Ausência de vírgulas em texto longo
-    if word_count > 40 and text.count(',') < 2:
+    if word_count > 40 and sum(p["commas"] for p in partials) < 2:
         errors.append({
             "type": "style",
-            "text": "Poucas vírgulas para o tamanho do texto",
-            "suggestion": "Use vírgulas para separar orações, adjuntos deslocados e enumerações. Isso melhora a leitura.",
+            "text": MESSAGES["virgulas.texto"],
+            "suggestion": MESSAGES["virgulas.sugestao"],
             "source": "custom",
         })
 
@@ -328,67 +957,59 @@ def analyze(text: str) -> dict:
     if paragraphs and len(paragraphs) == 1 and word_count > 80:
         errors.append({
             "type": "style",
-            "text": "Texto sem divisão em parágrafos",
-            "suggestion": "Divida em parágrafos: introdução, desenvolvimento (2-3 parágrafos) e conclusão. Cada parágrafo deve ter uma ideia central.",
+            "text": MESSAGES["paragrafos.texto"],
+            "suggestion": MESSAGES["paragrafos.sugestao"],
             "source": "custom",
         })
 
     # Frases muito longas
-    long_sentences = [s for s in sentences if len(s.split()) > 45]
+    long_sentences = [[s, e - s] for count, _, s, e in sentences if count > 45]
     if long_sentences:
         errors.append({
             "type": "style",
             "text": f"{len(long_sentences)} frase(s) com mais de 45 palavras",
-            "suggestion": "Frases longas demais dificultam a compreensão. Divida em períodos menores.",
+            "suggestion": MESSAGES["frases_longas.sugestao"],
             "source": "custom",
+            **_located(long_sentences),
         })
 
     # Frases iniciando com minúscula
-    lower_starts = 0
-    for i, s in enumerate(sentences):
-        if i > 0 and s and re.match(r'^[a-záàâãéèêíïóôõúüç]', s):
-            lower_starts += 1
-    if lower_starts > 0:
+    lower_starts = [[s, e - s] for _, lower, s, e in sentences[1:] if lower]
+    if lower_starts:
         errors.append({
             "type": "grammar",
-            "text": f"{lower_starts} frase(s) iniciando com letra minúscula",
-            "suggestion": "Toda frase deve começar com letra maiúscula após pontuação final.",
+            "text": f"{len(lower_starts)} frase(s) iniciando com letra minúscula",
+            "suggestion": MESSAGES["minusculas.sugestao"],
             "source": "custom",
+            **_located(lower_starts),
         })
 
     # Repetição excessiva de palavras
-    stop_words = {
-        'a', 'o', 'e', 'é', 'de', 'do', 'da', 'em', 'no', 'na', 'os', 'as',
-        'dos', 'das', 'um', 'uma', 'que', 'se', 'por', 'com', 'para', 'não',
-        'ao', 'aos', 'pelo', 'pela', 'mais', 'muito', 'como', 'mas', 'ou',
-        'nos', 'nas', 'seu', 'sua', 'esse', 'essa', 'este', 'esta', 'isso',
-        'isto', 'são', 'foi', 'ser', 'ter', 'há', 'já', 'das', 'dos', 'nem',
-        'uns', 'umas', 'seus', 'suas', 'num', 'numa', 'nesse', 'nessa',
-        'desse', 'dessa', 'deste', 'desta', 'neste', 'nesta', 'entre',
-        'sobre', 'sob', 'até', 'sem', 'pois', 'após', 'quando', 'onde',
-        'ainda', 'mesmo', 'também', 'cada', 'toda', 'todo', 'à', 'às',
-    }
     word_freq = {}
-    for w in words:
-        clean = re.sub(r'[^a-záàâãéèêíïóôõúüç]', '', w.lower())
-        if len(clean) > 3 and clean not in stop_words:
-            word_freq[clean] = word_freq.get(clean, 0) + 1
+    for partial in partials:
+        for w, c in partial["word_freq"].items():
+            word_freq[w] = word_freq.get(w, 0) + c
 
     repeated = [f'"{w}" ({c}x)' for w, c in word_freq.items() if c >= 4]
     if repeated:
         errors.append({
             "type": "style",
             "text": f"Repetição excessiva: {', '.join(repeated[:5])}",
-            "suggestion": "Use sinônimos ou reformule frases para evitar repetição e enriquecer o vocabulário.",
+            "suggestion": MESSAGES["repeticao.sugestao"],
             "source": "custom",
         })
 
+    mark("estrutura")
+
     # ========================================================
     # 8) MÉTRICAS DE LEGIBILIDADE
     # ========================================================
-    avg_word_len = sum(len(w) for w in words) / max(word_count, 1)
-    avg_sentence_len = word_count / max(len(sentences), 1)
-    vocabulary_richness = len(set(w.lower() for w in words)) / max(word_count, 1)
+    avg_word_len = sum(p["word_chars"] for p in partials) / max(word_count, 1)
+    avg_sentence_len = word_count / max(sentence_count, 1)
+    vocabulary = set(w for p in partials for w in p["vocabulary"])
+    vocabulary_richness = len(vocabulary) / max(word_count, 1)
+
+    mark("legibilidade")
 
     # ========================================================
     # 9) DICAS POSITIVAS
@@ -400,21 +1021,21 @@ def analyze(text: str) -> dict:
         errors.append({
             "type": "tip",
             "text": f"Texto muito curto ({word_count} palavras)",
-            "suggestion": "Uma redação deve ter no mínimo 7 linhas (~100 palavras). Desenvolva argumentos com exemplos e dados.",
+            "suggestion": MESSAGES["texto_muito_curto.sugestao"],
             "source": "custom",
         })
     elif word_count < 100:
         errors.append({
             "type": "tip",
             "text": f"Texto curto ({word_count} palavras)",
-            "suggestion": "Tente expandir para 200+ palavras. Adicione argumentos, exemplos concretos e dados para fortalecer o texto.",
+            "suggestion": MESSAGES["texto_curto.sugestao"],
             "source": "custom",
         })
     elif word_count >= 200:
         errors.append({
             "type": "tip",
             "text": f"Bom volume de texto ({word_count} palavras)",
-            "suggestion": "O tamanho está adequado. Verifique se todos os argumentos estão bem desenvolvidos.",
+            "suggestion": MESSAGES["bom_volume.sugestao"],
             "source": "custom",
         })
 
@@ -422,7 +1043,7 @@ def analyze(text: str) -> dict:
         errors.append({
             "type": "tip",
             "text": f"Boa estrutura de parágrafos ({len(paragraphs)} parágrafos)",
-            "suggestion": "A divisão em parágrafos demonstra organização e facilita a leitura.",
+            "suggestion": MESSAGES["boa_estrutura.sugestao"],
             "source": "custom",
         })
 
@@ -430,25 +1051,27 @@ def analyze(text: str) -> dict:
         errors.append({
             "type": "tip",
             "text": f"Vocabulário diversificado ({vocabulary_richness:.0%} de palavras únicas)",
-            "suggestion": "Bom uso de vocabulário variado, o que enriquece o texto.",
+            "suggestion": MESSAGES["vocabulario.sugestao"],
             "source": "custom",
         })
 
     if grammar_count == 0 and style_count == 0:
         errors.append({
             "type": "tip",
-            "text": "Nenhum erro significativo encontrado",
-            "suggestion": "Texto muito bem escrito! Continue praticando para manter esse nível de qualidade.",
+            "text": MESSAGES["sem_erros.texto"],
+            "suggestion": MESSAGES["sem_erros.sugestao"],
             "source": "custom",
         })
     else:
         errors.append({
             "type": "tip",
-            "text": "Continue praticando!",
-            "suggestion": "Cada erro corrigido é um aprendizado. Revise seus textos anteriores e observe sua evolução.",
+            "text": MESSAGES["continue.texto"],
+            "suggestion": MESSAGES["continue.sugestao"],
             "source": "custom",
         })
 
+    mark("dicas")
+
     # ========================================================
     # 10) CALCULAR NOTA
     # ========================================================
@@ -485,19 +1108,20 @@ def analyze(text: str) -> dict:
 
     # Classificação
     if grade >= 7:
-        grade_label = "Bom trabalho! Texto com boa qualidade."
+        grade_label = MESSAGES["nota.alta"]
         grade_class = "high"
     elif grade >= 5:
-        grade_label = "Razoável. Corrija os erros apontados."
+        grade_label = MESSAGES["nota.media"]
         grade_class = "medium"
     else:
-        grade_label = "Precisa de revisão. Analise cada erro com atenção."
+        grade_label = MESSAGES["nota.baixa"]
         grade_class = "low"
+    mark("nota")
 
     # ========================================================
     # RESULTADO
     # ========================================================
-    return {
+    result = {
         "errors": errors,
         "grade": grade,
         "grade_label": grade_label,
@@ -505,13 +1129,25 @@ def analyze(text: str) -> dict:
         "stats": {
             "word_count": word_count,
             "char_count": len(text),
-            "sentence_count": len(sentences),
+            "sentence_count": sentence_count,
             "paragraph_count": len(paragraphs),
             "avg_word_length": round(avg_word_len, 1),
             "avg_sentence_length": round(avg_sentence_len, 1),
             "vocabulary_richness": round(vocabulary_richness * 100, 1),
             "grammar_errors": grammar_count,
             "style_errors": style_count,
-            "has_language_tool": HAS_LANGUAGE_TOOL,
+            "has_language_tool": profile.grammar and grammar_state == "ready" and not grammar_skipped,
+            "grammar_skipped": grammar_skipped,
+            "grammar_state": grammar_state,
+            "rules_aborted": rules_aborted,
+            "rules_version": ruleset_version(ruleset),
+            "rule_packs": ruleset.packs,
+            "profile": profile.name,
+            "rule_hits": rule_hits,
         },
     }
+    if signature:
+        # Assinatura do texto para o índice de cópias (app.py a retira da resposta)
+        result["minhash"] = combine_signatures(p["minhash"] for p in partials) \
+            if "similaridade" in profile.stages else None
+    return result
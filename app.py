@@ -3,14 +3,154 @@ CorrigeAI - Servidor Flask
 API de correção de textos em português.
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from analyzer import analyze
+from analyzer import accent_lexicon, grammar_backend, rule_store
+from analytics import analytics_store
+from cache import (analyze_cached, analyze_long_cached, analyze_stream_cached, is_complete, paragraph_cache,
+                   result_cache, result_etag)
+import bundle
+from encoding import FastJSONProvider, catalog, compact, compress_response, dumps
+from jobs import PRIORITIES, job_queue
+from similarity import similarity_index
+from profiles import DEFAULT_PROFILE, PROFILES
+import metrics
+import hashlib
 import os
+import threading
 
 app = Flask(__name__, static_folder=".", static_url_path="")
+app.json = FastJSONProvider(app)
 CORS(app)
 
+MAX_CHARS = 10000
+MAX_CHARS_DOCUMENTO = int(os.environ.get("CORRIGEAI_MAX_DOCUMENTO", 300000))
+MAX_LOTE = int(os.environ.get("CORRIGEAI_MAX_LOTE", 100))
+
+# ============================================================
+# POOL DE PROCESSOS PARA ANÁLISE EM LOTE
+# Criado sob demanda; tamanho via CORRIGEAI_WORKERS
+# (padrão: número de CPUs).
+# ============================================================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.environ.get("CORRIGEAI_WORKERS", 0)) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def _reset_pool():
+    """Descarta um pool quebrado (worker morto) para o próximo lote recriar."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _analisar_item(texto, perfil=None, assinatura=False):
+    """Análise de um item do lote (roda no worker). Retorna (resultado, etapas)."""
+    timer = metrics.new_timer()
+    resultado = analyze_cached(texto, timer, perfil, signature=assinatura)
+    return resultado, timer.stages if timer is not None else None
+
+
+def _validar_texto(texto, limite=MAX_CHARS):
+    """Retorna a mensagem de erro de validação, ou None se o texto for válido."""
+    if not isinstance(texto, str):
+        return "Campo 'texto' deve ser uma string."
+    if not texto.strip():
+        return "O texto não pode estar vazio."
+    if len(texto.strip()) > limite:
+        return f"Texto muito longo. Máximo: {limite:,} caracteres.".replace(",", ".")
+    return None
+
+
+def _validar_perfil(perfil):
+    """Retorna a mensagem de erro se o perfil pedido não existir, ou None."""
+    if perfil is not None and (not isinstance(perfil, str) or perfil not in PROFILES):
+        return f"Perfil inválido. Use: {', '.join(PROFILES)}."
+    return None
+
+
+def _validar_formato(data):
+    """Formato da resposta: "completo" (padrão) ou "compacto"."""
+    if data.get("formato") not in (None, "completo", "compacto"):
+        return "Formato inválido. Use: completo, compacto."
+    return None
+
+
+def _corpo(resultado, data):
+    """Resultado no formato pedido."""
+    if data.get("formato") == "compacto" and "stats" in resultado:
+        return compact(resultado, catalog())
+    return resultado
+
+
+def _etag(data):
+    """
+    ETag do resultado pedido (texto, perfil e formato), calculado sem
+    analisar. None quando a resposta depende de outras redações (cópias
+    na turma): aí sempre se analisa e registra.
+    """
+    if data.get("turma") and similarity_index.enabled:
+        return None
+    sufixo = "-c" if data.get("formato") == "compacto" else ""
+    return result_etag(data["texto"], data.get("perfil")) + sufixo
+
+
+def _nao_modificado(etag, endpoint, timer):
+    """304 se o cliente já tem o resultado (If-None-Match), ou None."""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    if timer is not None:
+        metrics.registry.observe(endpoint, timer)
+    return response
+
+
+def _validar_turma(data):
+    """Campos opcionais das estatísticas de turma (turma, periodo, aluno)."""
+    for campo in ("turma", "periodo", "aluno"):
+        valor = data.get(campo)
+        if valor is not None and (not isinstance(valor, str) or not valor.strip() or len(valor) > 100):
+            return f"Campo '{campo}' deve ser um texto de até 100 caracteres."
+    return None
+
+
+def _assinar(data):
+    """A análise precisa da assinatura MinHash (índice de cópias da turma)?"""
+    return bool(data.get("turma")) and similarity_index.enabled
+
+
+def _registrar(data, texto, resultado, aluno=None):
+    """
+    Registra a redação quando a turma foi informada: estatísticas de
+    turma e índice de cópias (as redações parecidas da turma entram na
+    resposta). Sempre retira do resultado a assinatura MinHash, pedida
+    à análise com _assinar().
+    """
+    assinatura = resultado.pop("minhash", None)
+    if not data.get("turma") or "stats" not in resultado:
+        return
+    turma = data["turma"].strip()
+    # Sem aluno, a redação é identificada pelo texto: reenviar o mesmo texto não conta duas vezes
+    envio = aluno or hashlib.sha1(texto.encode("utf-8")).hexdigest()
+    if analytics_store.enabled:
+        analytics_store.record(resultado, turma, (data.get("periodo") or "").strip() or None, envio)
+    if similarity_index.enabled and assinatura:
+        resultado["submission_id"] = envio
+        resultado["similar_submissions"] = similarity_index.check(assinatura, turma, envio)
+
 
 @app.route("/")
 def index():
@@ -22,37 +162,379 @@ def index():
 def analisar():
     """
     Endpoint principal de análise de texto.
-    Recebe JSON: { "texto": "..." }
+    Recebe JSON: { "texto": "...", "perfil": "quick|standard|full|grammar" (opcional),
+                   "formato": "completo|compacto" (opcional),
+                   "turma", "periodo", "aluno" (opcionais, estatísticas de turma) }
     Retorna: { errors, grade, grade_label, grade_class, stats }
+    Com If-None-Match igual ao ETag de uma resposta anterior para o
+    mesmo texto, responde 304 sem analisar.
+    """
+    data = request.get_json()
+
+    if not data or "texto" not in data:
+        return jsonify({"error": "Campo 'texto' é obrigatório."}), 400
+
+    erro = (_validar_texto(data["texto"]) or _validar_perfil(data.get("perfil")) or _validar_formato(data)
+            or _validar_turma(data))
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    timer = metrics.new_timer()
+    etag = _etag(data)
+    response = _nao_modificado(etag, "analisar", timer)
+    if response is not None:
+        return response
+
+    resultado = analyze_cached(data["texto"], timer, data.get("perfil"), signature=_assinar(data))
+    _registrar(data, data["texto"], resultado, data.get("aluno"))
+    response = jsonify(_corpo(resultado, data))
+    if etag is not None and is_complete(resultado):
+        response.set_etag(etag, weak=True)
+    if timer is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+        metrics.registry.observe("analisar", timer)
+    return response
+
+
+@app.route("/api/analisar/stream", methods=["POST"])
+def analisar_stream():
+    """
+    Variante em streaming de /api/analisar.
+    Recebe o mesmo JSON: { "texto": "...", "perfil": "...", "turma": "..." }
+    Responde NDJSON (uma linha { "event", "data" } por evento) ou, com
+    Accept: text/event-stream, Server-Sent Events. Eventos, em ordem:
+      custom  → estatísticas e regras customizadas (imediato)
+      grammar → achados do LanguageTool de um parágrafo (0..N)
+      final   → resultado completo, igual ao de /api/analisar
     """
     data = request.get_json()
 
     if not data or "texto" not in data:
         return jsonify({"error": "Campo 'texto' é obrigatório."}), 400
 
-    texto = data["texto"].strip()
+    erro = _validar_texto(data["texto"]) or _validar_perfil(data.get("perfil")) or _validar_turma(data)
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    texto = data["texto"]
+    perfil = data.get("perfil")
+    sse = "text/event-stream" in request.headers.get("Accept", "")
+    timer = metrics.new_timer()
+
+    def formatar(event, payload):
+        body = dumps(payload)
+        if sse:
+            return f"event: {event}\ndata: {body}\n\n"
+        return f'{{"event":"{event}","data":{body}}}\n'
 
-    if not texto:
-        return jsonify({"error": "O texto não pode estar vazio."}), 400
+    def gerar():
+        try:
+            for event, payload in analyze_stream_cached(texto, timer, perfil, signature=_assinar(data)):
+                if event == "final":
+                    _registrar(data, texto, payload, data.get("aluno"))
+                yield formatar(event, payload)
+        except Exception as e:
+            print(f"[ERRO stream] {e}")
+            yield formatar("error", {"error": "Erro ao analisar o texto."})
+        finally:
+            metrics.registry.observe("analisar_stream", timer)
 
-    if len(texto) > 10000:
-        return jsonify({"error": "Texto muito longo. Máximo: 10.000 caracteres."}), 400
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    resultado = analyze(texto)
-    return jsonify(resultado)
+
+@app.route("/api/analisar/lote", methods=["POST"])
+def analisar_lote():
+    """
+    Análise em lote (ex.: redações de uma turma inteira).
+    Recebe JSON: { "textos": ["...", "...", ...], "perfil": "..." (opcional),
+                   "turma", "periodo" (opcionais), "alunos": [...] (opcional, mesma ordem) }
+    Retorna: { "resultados": [...] } na mesma ordem da entrada.
+    Cada item é o resultado de /api/analisar ou { "error": "..." };
+    um item inválido não derruba o lote.
+    """
+    data = request.get_json()
+
+    if not data or not isinstance(data.get("textos"), list):
+        return jsonify({"error": "Campo 'textos' (lista) é obrigatório."}), 400
+
+    textos = data["textos"]
+    if not textos:
+        return jsonify({"error": "A lista de textos não pode estar vazia."}), 400
+
+    if len(textos) > MAX_LOTE:
+        return jsonify({"error": f"Lote muito grande. Máximo: {MAX_LOTE} textos."}), 400
+
+    perfil = data.get("perfil")
+    erro = _validar_perfil(perfil) or _validar_formato(data) or _validar_turma(data)
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    alunos = data.get("alunos")
+    if alunos is not None and (not isinstance(alunos, list) or len(alunos) != len(textos)):
+        return jsonify({"error": "Campo 'alunos' deve ser uma lista do mesmo tamanho de 'textos'."}), 400
+
+    # Distribuir os textos válidos entre os processos do pool
+    timer = metrics.new_timer()
+    pool = _get_pool()
+    resultados = [None] * len(textos)
+    futures = {}
+    for i, texto in enumerate(textos):
+        erro = _validar_texto(texto)
+        if erro:
+            resultados[i] = {"error": erro}
+        else:
+            futures[i] = pool.submit(_analisar_item, texto, perfil, _assinar(data))
+
+    # Coletar na ordem de entrada; o lote leva o tempo do texto mais lento
+    broken = False
+    for i, future in futures.items():
+        try:
+            resultados[i], etapas = future.result()
+            if etapas:
+                metrics.registry.observe_stages(etapas)
+            aluno = alunos[i] if alunos else None
+            _registrar(data, textos[i], resultados[i], str(aluno) if aluno is not None else None)
+            resultados[i] = _corpo(resultados[i], data)
+        except BrokenProcessPool:
+            broken = True
+            resultados[i] = {"error": "Falha no processo de análise. Tente novamente."}
+        except Exception as e:
+            print(f"[ERRO lote] item {i}: {e}")
+            resultados[i] = {"error": "Erro ao analisar este texto."}
+
+    if broken:
+        _reset_pool()
+
+    metrics.registry.observe("analisar_lote", timer)
+    return jsonify({"resultados": resultados})
+
+
+@app.route("/api/analisar/documento", methods=["POST"])
+def analisar_documento():
+    """
+    Documentos longos (monografias, TCCs), até CORRIGEAI_MAX_DOCUMENTO
+    caracteres. Recebe JSON: { "texto": "...", "perfil": "..." }
+    Retorna o mesmo formato de /api/analisar. O texto é dividido em
+    trechos de parágrafos inteiros, analisados em paralelo no pool de
+    processos; offsets apontam para o texto original.
+    """
+    data = request.get_json()
+
+    if not data or "texto" not in data:
+        return jsonify({"error": "Campo 'texto' é obrigatório."}), 400
+
+    erro = (_validar_texto(data["texto"], MAX_CHARS_DOCUMENTO) or _validar_perfil(data.get("perfil"))
+            or _validar_formato(data) or _validar_turma(data))
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    timer = metrics.new_timer()
+    etag = _etag(data)
+    response = _nao_modificado(etag, "analisar_documento", timer)
+    if response is not None:
+        return response
+
+    try:
+        resultado = analyze_long_cached(data["texto"], _get_pool(), timer, data.get("perfil"),
+                                        signature=_assinar(data))
+    except BrokenProcessPool:
+        _reset_pool()
+        return jsonify({"error": "Falha no processo de análise. Tente novamente."}), 500
+
+    _registrar(data, data["texto"], resultado, data.get("aluno"))
+    response = jsonify(_corpo(resultado, data))
+    if etag is not None and is_complete(resultado):
+        response.set_etag(etag, weak=True)
+    if timer is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+        metrics.registry.observe("analisar_documento", timer)
+    return response
+
+
+@app.route("/api/tarefas", methods=["POST"])
+def enviar_tarefa():
+    """
+    Análise assíncrona (fila de tarefas, processada por python jobs.py worker).
+    Recebe o JSON de /api/analisar, com textos até CORRIGEAI_MAX_DOCUMENTO
+    caracteres, mais "prioridade": "alta|normal|baixa" (opcional; "alta"
+    para edição ao vivo, "baixa" para correção em massa).
+    Responde 202: { id, status, position, url }; o resultado sai em
+    GET /api/tarefas/<id>.
+    """
+    if not job_queue.enabled:
+        return jsonify({"error": "Fila de tarefas desligada (CORRIGEAI_JOBS_DB)."}), 404
+
+    data = request.get_json()
+
+    if not data or "texto" not in data:
+        return jsonify({"error": "Campo 'texto' é obrigatório."}), 400
+
+    erro = (_validar_texto(data["texto"], MAX_CHARS_DOCUMENTO) or _validar_perfil(data.get("perfil"))
+            or _validar_formato(data) or _validar_turma(data))
+    prioridade = data.get("prioridade", "normal")
+    if not erro and prioridade not in PRIORITIES:
+        erro = f"Prioridade inválida. Use: {', '.join(PRIORITIES)}."
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    campos = ("texto", "perfil", "formato", "turma", "periodo", "aluno")
+    tarefa = job_queue.submit({campo: data[campo] for campo in campos if data.get(campo) is not None}, prioridade)
+    if tarefa is None:
+        response = jsonify({"error": "Fila de tarefas cheia. Tente novamente em instantes."})
+        response.headers["Retry-After"] = "30"
+        return response, 429
+
+    url = f"/api/tarefas/{tarefa['id']}"
+    response = jsonify({"id": tarefa["id"], "status": tarefa["status"], "position": tarefa.get("position"), "url": url})
+    response.headers["Location"] = url
+    return response, 202
+
+
+@app.route("/api/tarefas/<tarefa_id>", methods=["GET"])
+def consultar_tarefa(tarefa_id):
+    """
+    Estado de uma tarefa: { id, status (queued|running|done|failed),
+    priority, attempts, position (na fila), created, started, finished }.
+    Pronta, inclui "resultado" (no formato pedido no envio); com falha,
+    "error". 404 se não existir ou se o resultado já expirou
+    (CORRIGEAI_JOBS_RETENTION_S).
+    """
+    if not job_queue.enabled:
+        return jsonify({"error": "Fila de tarefas desligada (CORRIGEAI_JOBS_DB)."}), 404
+
+    tarefa = job_queue.get(tarefa_id)
+    if tarefa is None:
+        return jsonify({"error": "Tarefa não encontrada ou expirada."}), 404
+
+    response = jsonify(tarefa)
+    if tarefa["status"] in ("queued", "running"):
+        response.headers["Retry-After"] = "1"
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 @app.route("/api/status", methods=["GET"])
 def status():
     """Health check do servidor."""
-    from analyzer import HAS_LANGUAGE_TOOL
     return jsonify({
         "status": "online",
-        "language_tool": HAS_LANGUAGE_TOOL,
+        "language_tool": grammar_backend.available,
+        "language_tool_state": grammar_backend.state,
+        "cache": result_cache.stats(),
+        "paragraph_cache": paragraph_cache.stats(),
+        "accent_lexicon": accent_lexicon.stats(),
+        "rules": rule_store.stats(),
+        "analytics": analytics_store.stats(),
+        "similarity": similarity_index.stats(),
+        "jobs": job_queue.stats(),
         "message": "CorrigeAI API funcionando.",
     })
 
 
+@app.route("/api/catalogo", methods=["GET"])
+def catalogo():
+    """
+    Catálogo de mensagens do formato compacto. Muda só quando as regras
+    mudam: pode ficar em cache no cliente (ETag = versão do catálogo).
+    """
+    atual = catalog()
+    if request.if_none_match.contains(atual.version):
+        response = Response(status=304)
+    else:
+        response = jsonify(atual.to_dict())
+    response.set_etag(atual.version)
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+@app.route("/api/regras", methods=["GET"])
+def regras():
+    """
+    Manifesto do pacote de regras do navegador: hash e URL da versão
+    atual. Sempre revalidado (as regras podem ser recarregadas a quente).
+    """
+    atual = bundle.current()
+    if request.if_none_match.contains(atual.hash):
+        response = Response(status=304)
+    else:
+        response = jsonify(atual.manifest())
+    response.set_etag(atual.hash)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/regras/<nome>.json", methods=["GET"])
+def regras_pacote(nome):
+    """Pacote de regras pelo hash do conteúdo: nunca muda, cache de um ano."""
+    atual = bundle.current()
+    if nome != atual.hash:
+        return jsonify({"error": "Versão do pacote de regras não encontrada. Consulte /api/regras."}), 404
+    response = Response(atual.body, mimetype="application/json")
+    response.set_etag(atual.hash)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+@app.route("/api/perfis", methods=["GET"])
+def perfis():
+    """Perfis de análise disponíveis e o padrão."""
+    return jsonify({
+        "default": DEFAULT_PROFILE,
+        "profiles": {name: profile.describe() for name, profile in PROFILES.items()},
+    })
+
+
+@app.route("/api/relatorio", methods=["GET"])
+def relatorio():
+    """
+    Estatísticas de turma. Parâmetros (query string, opcionais): turma,
+    periodo e top (nº de regras mais frequentes, padrão 10). Sem filtros,
+    soma todas as turmas e períodos.
+    """
+    if not analytics_store.enabled:
+        return jsonify({"error": "Estatísticas de turma desligadas (CORRIGEAI_ANALYTICS_DB)."}), 404
+
+    try:
+        top = min(100, max(1, int(request.args.get("top", 10))))
+    except ValueError:
+        return jsonify({"error": "Parâmetro 'top' deve ser um número."}), 400
+
+    return jsonify(analytics_store.report(request.args.get("turma"), request.args.get("periodo"), top))
+
+
+@app.after_request
+def comprimir(response):
+    """Compressão gzip/brotli negociada por Accept-Encoding."""
+    return compress_response(response, request.accept_encodings)
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """
+    Métricas no formato texto do Prometheus: histogramas de duração por
+    etapa da análise e por endpoint, contadores do cache e estado do
+    LanguageTool. Valores por processo.
+    """
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Métricas desligadas (CORRIGEAI_METRICS=0)."}), 404
+
+    cache = result_cache.stats()
+    extra = (
+        metrics.gauge("corrigeai_cache_hits_total", "Acertos no cache em memória.", cache["hits"], "counter")
+        + metrics.gauge("corrigeai_cache_disk_hits_total", "Acertos no cache em disco.", cache["disk_hits"], "counter")
+        + metrics.gauge("corrigeai_cache_misses_total", "Textos fora do cache.", cache["misses"], "counter")
+        + metrics.gauge("corrigeai_cache_entries", "Entradas no cache em memória.", cache["entries"])
+        + metrics.gauge("corrigeai_language_tool_ready", "1 se o LanguageTool está pronto.", int(grammar_backend.available))
+        + metrics.gauge("corrigeai_rules_reloads_total", "Recargas dos pacotes de regras.", rule_store.reloads, "counter")
+        + metrics.collected()
+    )
+    return Response(metrics.registry.render(extra), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     print(f"""
@@ -63,4 +545,8 @@ if __name__ == "__main__":
     ║   API: http://localhost:{port}/api/analisar ║
     ╚══════════════════════════════════════════╝
     """)
+    # Aquecer o LanguageTool no boot, sem atrasar a primeira resposta
+    # (só no processo que atende; o pai do reloader apenas vigia arquivos)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        grammar_backend.start_background()
     app.run(debug=True, port=port)
@@ -0,0 +1,252 @@
+"""
+CorrigeAI - Servidor ASGI (produção)
+Serve o mesmo app Flask de app.py sobre asyncio (uvicorn), com:
+  - executor limitado para as análises (CORRIGEAI_ASYNC_WORKERS threads)
+    e outro, pequeno, para rotas leves (status, métricas, arquivos),
+    que assim nunca esperam atrás de análises;
+  - controle de admissão: no máximo workers + fila (CORRIGEAI_ASYNC_QUEUE)
+    análises admitidas; além disso, 429 com Retry-After;
+  - desligamento gracioso: ao receber SIGTERM, novas análises recebem
+    503 e as já admitidas terminam (até CORRIGEAI_DRAIN_S segundos).
+
+Uso:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+    python asgi.py
+"""
+
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from app import app as flask_app
+from analyzer import grammar_backend
+
+ASYNC_WORKERS = int(os.environ.get("CORRIGEAI_ASYNC_WORKERS", 0)) or max(2, grammar_backend.size * 2)
+ASYNC_QUEUE = int(os.environ.get("CORRIGEAI_ASYNC_QUEUE", 32))
+DRAIN_TIMEOUT = float(os.environ.get("CORRIGEAI_DRAIN_S", 30))
+
+# Rotas que fazem análise e passam pelo controle de admissão
+ANALYSIS_PATHS = {"/api/analisar", "/api/analisar/stream", "/api/analisar/lote", "/api/analisar/documento"}
+
+
+# ============================================================
+# PONTE WSGI → ASGI
+# O app Flask roda numa thread do executor; o corpo da resposta é
+# enviado pedaço a pedaço (o streaming continua funcionando).
+# ============================================================
+def _environ(scope: dict, body: bytes) -> dict:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+            key = name
+        else:
+            key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(environ: dict, send, loop):
+    """Executa o app Flask (na thread do executor) e envia a resposta ao loop."""
+    status_headers = []
+
+    def start_response(status, headers, exc_info=None):
+        status_headers[:] = [status, headers]
+
+    def emit(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    started = False
+    result = flask_app(environ, start_response)
+    try:
+        for chunk in result:
+            if not started:
+                _emit_start(emit, status_headers)
+                started = True
+            if chunk:
+                emit({"type": "http.response.body", "body": chunk, "more_body": True})
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    if not started:
+        _emit_start(emit, status_headers)
+    emit({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _emit_start(emit, status_headers):
+    status, headers = status_headers
+    emit({
+        "type": "http.response.start",
+        "status": int(status.split(" ", 1)[0]),
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    })
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send_json(send, status: int, payload: dict, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# ============================================================
+# CONTROLE DE ADMISSÃO
+# ============================================================
+class AdmissionControl:
+    """
+    App ASGI: admite até workers + queue análises simultâneas (as que
+    passam de `workers` esperam na fila do executor); acima disso
+    responde 429 com Retry-After estimado pelo tempo médio de serviço.
+    Todo o estado é mexido só na thread do event loop, sem locks.
+    """
+
+    def __init__(self, workers: int = ASYNC_WORKERS, queue: int = ASYNC_QUEUE,
+                 drain_timeout: float = DRAIN_TIMEOUT):
+        self.workers = workers
+        self.limit = workers + queue
+        self.drain_timeout = drain_timeout
+        self.admitted = 0
+        self.rejected = 0
+        self.accepting = True
+        self.service_time = 0.05            # média móvel (s) de uma análise
+        self._analysis = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analise")
+        self._light = ThreadPoolExecutor(max_workers=4, thread_name_prefix="leve")
+        self._idle = None
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.admitted - self.workers)
+
+    def retry_after(self) -> int:
+        """Segundos até a fila andar o bastante para caber mais uma análise."""
+        return max(1, math.ceil((self.queued + 1) * self.service_time / self.workers))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "limit": self.limit,
+            "in_flight": min(self.admitted, self.workers),
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "accepting": self.accepting,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        loop = asyncio.get_running_loop()
+        if scope["method"] != "POST" or scope["path"] not in ANALYSIS_PATHS:
+            body = await _read_body(receive)
+            return await loop.run_in_executor(self._light, _run_wsgi, _environ(scope, body), send, loop)
+
+        if not self.accepting:
+            return await _send_json(send, 503, {"error": "Servidor reiniciando. Tente novamente."},
+                                    [(b"retry-after", str(self.retry_after()).encode())])
+        if self.admitted >= self.limit:
+            self.rejected += 1
+            wait = self.retry_after()
+            return await _send_json(send, 429, {"error": f"Servidor ocupado. Tente novamente em {wait} s."},
+                                    [(b"retry-after", str(wait).encode())])
+
+        self.admitted += 1
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        self._idle.clear()
+        try:
+            body = await _read_body(receive)
+            start = time.perf_counter()
+            await loop.run_in_executor(self._analysis, _run_wsgi, _environ(scope, body), send, loop)
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.perf_counter() - start)
+        finally:
+            self.admitted -= 1
+            if self.admitted == 0:
+                self._idle.set()
+
+    async def drain(self):
+        """Para de admitir e espera as análises em andamento (até drain_timeout)."""
+        self.accepting = False
+        if self.admitted and self._idle is not None:
+            print(f"[INFO] Aguardando {self.admitted} análise(s) em andamento...")
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"[AVISO] {self.admitted} análise(s) interrompida(s) após {self.drain_timeout:.0f} s")
+        self._analysis.shutdown(wait=False, cancel_futures=True)
+        self._light.shutdown(wait=False, cancel_futures=True)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                grammar_backend.start_background()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.drain()
+                grammar_backend.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def prometheus(self) -> list:
+        """Linhas de /metrics com o estado da admissão."""
+        return (
+            metrics.gauge("corrigeai_admission_in_flight", "Análises em execução.", min(self.admitted, self.workers))
+            + metrics.gauge("corrigeai_admission_queued", "Análises admitidas aguardando na fila.", self.queued)
+            + metrics.gauge("corrigeai_admission_rejected_total", "Análises recusadas com 429.", self.rejected, "counter")
+        )
+
+
+app = AdmissionControl()
+metrics.register_collector(app.prometheus)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.environ.get("PORT", 8000))
+    print(f"[INFO] CorrigeAI (ASGI) em http://0.0.0.0:{port} — "
+          f"{app.workers} worker(s) de análise, fila de {app.limit - app.workers}")
+    uvicorn.run(app, host="0.0.0.0", port=port, timeout_graceful_shutdown=int(DRAIN_TIMEOUT))
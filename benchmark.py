@@ -0,0 +1,464 @@
+"""
+CorrigeAI - Benchmark do motor de análise
+Mede analyze() de ponta a ponta e por etapa sobre um corpus sintético
+e determinístico de redações (100 a 10.000 caracteres), com o
+LanguageTool simulado (stub) ou real. Os resultados são salvos em JSON
+para comparar execuções; regressões acima do limite falham a execução.
+
+Uso:
+    python benchmark.py                          # stub, salva benchmark_results.json
+    python benchmark.py --lt real                # LanguageTool de verdade (precisa de Java)
+    python benchmark.py --baseline antes.json    # compara e falha se regrediu
+    python benchmark.py --adversarial            # entradas patológicas; falha se p99 > --max-ms
+    python benchmark.py --profile all            # todos os perfis; falha se p95 > meta do perfil
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+
+import analyzer
+import rules
+from metrics import StageTimer
+from profiles import PROFILES, get_profile
+
+CORPUS_SEED = 2024
+CORPUS_SIZES = [100, 500, 1000, 2500, 5000, 10000]
+
+# Diferenças abaixo disso (ms) são ruído de medição, nunca regressão
+NOISE_FLOOR_MS = 0.05
+
+
+# ============================================================
+# CORPUS SINTÉTICO
+# Listas fixas (e não as tabelas do analyzer), para o corpus não
+# mudar quando as regras mudam e as execuções continuarem comparáveis.
+# ============================================================
+_SUBJECTS = [
+    "A educação pública", "O acesso à saúde", "A população brasileira",
+    "Os jovens das periferias", "As políticas públicas", "A tecnologia digital",
+    "O mercado de trabalho", "As escolas do interior", "A violência urbana",
+    "O sistema de transporte", "As famílias de baixa renda", "A sociedade civil",
+]
+_VERBS = [
+    "enfrenta", "exige", "revela", "depende de", "transforma", "reflete",
+    "compromete", "amplia", "reduz", "demanda",
+]
+_COMPLEMENTS = [
+    "desafios históricos de desigualdade", "investimentos contínuos do Estado",
+    "a participação ativa dos cidadãos", "mudanças estruturais profundas",
+    "a formação de professores qualificados", "o combate à evasão escolar",
+    "o acesso a informações confiáveis", "a garantia de direitos fundamentais",
+    "uma fiscalização mais rigorosa", "o planejamento de longo prazo",
+]
+_CONNECTIVES = [
+    "Além disso,", "Por outro lado,", "Entretanto,", "Nesse contexto,",
+    "Em contrapartida,", "Assim,", "Portanto,", "Ademais,",
+]
+
+# Casos piores: densos em gírias/clichês, sem acento e frases longas
+_SLANG = [
+    "vc", "pq", "tbm", "mt", "blz", "hj", "msm", "td", "dps", "pra", "pro",
+    "mano", "galera", "tipo assim", "kkk", "rs", "ne", "nos dias de hoje",
+    "alguma coisa", "muita coisa", "dessa forma", "sendo assim",
+]
+_UNACCENTED = [
+    "educacao", "populacao", "informacao", "solucao", "politicas", "publicas",
+    "tambem", "porem", "entao", "nao", "sao", "estao", "necessario", "possivel",
+    "responsavel", "ultimos", "familia", "saude", "voce", "ate", "alem",
+    "historia", "economica", "violencia", "experiencia", "crianca", "regiao",
+]
+_FILLER = [
+    "que", "de", "a", "o", "em", "para", "com", "os", "as", "um", "uma",
+    "mais", "muito", "quando", "porque", "ainda", "sempre", "também",
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    s = f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_COMPLEMENTS)}"
+    if rng.random() < 0.4:
+        s = f"{rng.choice(_CONNECTIVES)} {s[0].lower()}{s[1:]}"
+    return s + "."
+
+
+def _slang_sentence(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(8, 14)):
+        words.append(rng.choice(_SLANG) if rng.random() < 0.6 else rng.choice(_FILLER))
+    return " ".join(words).capitalize() + "."
+
+
+def _unaccented_sentence(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(8, 14)):
+        words.append(rng.choice(_UNACCENTED) if rng.random() < 0.6 else rng.choice(_FILLER))
+    return " ".join(words).capitalize() + "."
+
+
+def _long_sentence(rng: random.Random) -> str:
+    # ~70 palavras sem pontuação final no meio
+    parts = [_sentence(rng)[:-1] for _ in range(7)]
+    return ", ".join([parts[0]] + [p[0].lower() + p[1:] for p in parts[1:]]) + "."
+
+
+_KINDS = {
+    "redacao": _sentence,
+    "girias": _slang_sentence,
+    "sem_acento": _unaccented_sentence,
+    "frases_longas": _long_sentence,
+}
+
+
+def make_text(kind: str, size: int, seed: int = CORPUS_SEED) -> str:
+    """Texto determinístico do tipo pedido com ~size caracteres."""
+    rng = random.Random(f"{seed}:{kind}:{size}")
+    make = _KINDS[kind]
+    paragraphs, current, length = [], [], 0
+    while length < size:
+        s = make(rng)
+        current.append(s)
+        length += len(s) + 1
+        # Parágrafos de 3 a 5 frases
+        if len(current) >= rng.randint(3, 5):
+            paragraphs.append(" ".join(current))
+            current = []
+            length += 1
+    if current:
+        paragraphs.append(" ".join(current))
+    text = "\n\n".join(paragraphs)[:size]
+    # Cortar na última frase completa (se houver) para terminar com pontuação
+    cut = text.rfind(".")
+    return text[:cut + 1] if cut > size // 2 else text
+
+
+def build_corpus(sizes=CORPUS_SIZES) -> dict:
+    """{nome do caso: texto}, ex.: "girias/1000"."""
+    return {f"{kind}/{size}": make_text(kind, size) for kind in _KINDS for size in sizes}
+
+
+# ============================================================
+# CORPUS ADVERSÁRIO
+# Entradas feitas para explorar backtracking e casos degenerados,
+# todas no limite de tamanho da API (MAX_CHARS de app.py).
+# ============================================================
+ADVERSARIAL_CHARS = 10000
+ADVERSARIAL_MAX_MS = 250.0
+
+
+def _fill(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def build_adversarial(size: int = ADVERSARIAL_CHARS) -> dict:
+    """{nome do caso: texto} com entradas patológicas de `size` caracteres."""
+    return {
+        "frase_unica_esse_problema": _fill("esse problema ", size),
+        "os_os_os": _fill("os ", size),
+        "concordancia_sem_verbo": _fill("os alunos e as escolas ", size),
+        "kkkk": _fill("k", size),
+        "rsrsrs": _fill("rs", size),
+        "hahaha": _fill("ha", size),
+        "vc_vc": _fill("vc ", size),
+        "sem_acento": _fill("educacao populacao informacao nao entao tambem ", size),
+        "token_unico": _fill("abcdefghij", size),
+        "so_pontuacao": _fill(".,;!?-", size),
+        "frases_minimas": _fill("a. ", size),
+        "paragrafos_minimos": _fill("a\n\n", size),
+        "combinantes": _fill("a\u0301e\u0303\u0327 ", size),
+    }
+
+
+def check_linear_rules() -> list:
+    """Regras dos pacotes sem tempo linear garantido (a compilação já falharia)."""
+    ruleset = analyzer.rule_store.current()
+    checks = [(rule, pattern, rules._first_word_keys(pattern) is not None)
+              for rule, (_, pattern, _) in ruleset.lexical_rules.items()]
+    checks += [(rule, pattern, False)
+               for rule, (pattern, _, _) in zip(ruleset.concordance_ids, ruleset.concordance)]
+    problems = []
+    for rule, pattern, anchored in checks:
+        problem = rules.linear_time_problem(pattern, anchored)
+        if problem:
+            problems.append(f"{rule}: {problem}")
+    return problems
+
+
+# ============================================================
+# LANGUAGETOOL SIMULADO
+# ============================================================
+class StubGrammarBackend:
+    """
+    Substitui o GrammarBackend: sempre pronto, responde sem rede com um
+    match por ocorrência de "muito" (custo de mapear os offsets de
+    volta aos parágrafos) e uma latência fixa opcional.
+    """
+
+    _PATTERN = re.compile(r"\bmuito\b")
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.state = "ready"
+        self.size = 2
+        self.budget = 5.0
+        self.version = "stub"
+        self.available = True
+
+    def start_background(self):
+        return self
+
+    def check(self, text: str, timeout: float = None, disabled_rules=(), disabled_categories=(), level=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return [{
+            "rule_id": "STUB_RULE", "category": "GRAMMAR", "message": "Stub",
+            "replacements": ["bastante"], "offset": m.start(), "length": m.end() - m.start(),
+            "context": text[max(0, m.start() - 20):m.end() + 20],
+            "context_offset": min(20, m.start()),
+        } for m in self._PATTERN.finditer(text)]
+
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+def _timed_analyze(text: str, profile) -> dict:
+    """analyze() sem cache, com o tempo de cada etapa. Retorna {etapa: segundos}."""
+    timer = StageTimer()
+    analyzer.analyze(text, timings=timer, profile=profile)
+    return dict(timer.stages, total=timer.total())
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Percentil por posição mais próxima (valores já ordenados)."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def _summary(samples: list, chars: int) -> dict:
+    values = sorted(samples)
+    mean = sum(values) / len(values)
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 4),
+        "p95_ms": round(percentile(values, 95) * 1000, 4),
+        "p99_ms": round(percentile(values, 99) * 1000, 4),
+        "mean_ms": round(mean * 1000, 4),
+        "chars_per_s": round(chars / mean) if mean else 0,
+    }
+
+
+def run_case(text: str, repeat: int, warmup: int, profile=None) -> dict:
+    profile = get_profile(profile)
+    for _ in range(warmup):
+        _timed_analyze(text, profile)
+
+    samples = {}
+    end_to_end = []
+    for _ in range(repeat):
+        for stage, seconds in _timed_analyze(text, profile).items():
+            samples.setdefault(stage, []).append(seconds)
+        # analyze() sem cronômetro: o tempo de ponta a ponta não inclui a instrumentação
+        start = time.perf_counter()
+        analyzer.analyze(text, profile=profile)
+        end_to_end.append(time.perf_counter() - start)
+
+    return {
+        "chars": len(text),
+        "runs": repeat,
+        "profile": profile.name,
+        "target_ms": profile.target_ms,
+        "analyze": _summary(end_to_end, len(text)),
+        "stages": {stage: _summary(values, len(text)) for stage, values in samples.items()},
+    }
+
+
+def _setup_backend(mode: str, stub_latency_ms: float):
+    """Troca o backend de gramática do analyzer. Retorna (backend, motivo se indisponível)."""
+    if mode == "stub":
+        analyzer.grammar_backend = StubGrammarBackend(stub_latency_ms)
+        return analyzer.grammar_backend, None
+
+    backend = analyzer.grammar_backend
+    backend.start()
+    if not backend.available:
+        return backend, backend.error or "LanguageTool indisponível"
+    return backend, None
+
+
+def run(args) -> dict:
+    profiles = list(PROFILES) if args.profile == "all" else [args.profile]
+    corpus = build_adversarial() if args.adversarial else build_corpus(args.sizes)
+    if args.only:
+        corpus = {name: text for name, text in corpus.items() if re.search(args.only, name)}
+
+    backend, unavailable = _setup_backend(args.lt, args.stub_latency_ms)
+    if unavailable:
+        print(f"[AVISO] --lt real pedido, mas o LanguageTool não subiu: {unavailable}")
+        sys.exit(2)
+
+    corpus_hash = hashlib.sha1(json.dumps(corpus, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "lt": args.lt,
+            "grammar_version": backend.version,
+            "ruleset_version": analyzer.ruleset_version(),
+            "rule_packs": analyzer.rule_store.current().packs,
+            "corpus": "adversarial" if args.adversarial else "redacoes",
+            "corpus_seed": CORPUS_SEED,
+            "corpus_hash": corpus_hash,
+            "repeat": args.repeat,
+            "profiles": profiles,
+        },
+        "cases": {},
+    }
+
+    print(f"{'caso':<32} {'chars':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'chars/s':>11}")
+    for profile in profiles:
+        for name, text in corpus.items():
+            # Casos do perfil standard mantêm o nome antigo (comparáveis com linhas de base anteriores)
+            case = name if profile == "standard" else f"{profile}:{name}"
+            result = run_case(text, args.repeat, args.warmup, profile)
+            result["rules_aborted"] = analyzer.analyze(text, profile=get_profile(profile))["stats"]["rules_aborted"]
+            report["cases"][case] = result
+            a = result["analyze"]
+            print(f"{case:<32} {result['chars']:>6} {a['p50_ms']:>7.3f}ms {a['p95_ms']:>7.3f}ms "
+                  f"{a['p99_ms']:>7.3f}ms {a['chars_per_s']:>11,}")
+    return report
+
+
+def check_adversarial(report: dict, max_ms: float) -> list:
+    """Casos com p99 acima de max_ms ou com regra desligada pelo orçamento."""
+    failures = []
+    for name, case in report["cases"].items():
+        p99 = case["analyze"]["p99_ms"]
+        if p99 > max_ms:
+            failures.append(f"{name}: p99 {p99:.1f} ms > {max_ms:.0f} ms")
+        if case["rules_aborted"]:
+            failures.append(f"{name}: regras desligadas pelo orçamento: {', '.join(case['rules_aborted'])}")
+    return failures
+
+
+def check_targets(report: dict) -> list:
+    """Casos com p95 acima da meta de latência do perfil."""
+    failures = []
+    for name, case in report["cases"].items():
+        p95 = case["analyze"]["p95_ms"]
+        if p95 > case["target_ms"]:
+            failures.append(f"{name}: p95 {p95:.1f} ms > meta de {case['target_ms']:.0f} ms ({case['profile']})")
+    return failures
+
+
+# ============================================================
+# COMPARAÇÃO COM UMA EXECUÇÃO ANTERIOR
+# ============================================================
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Lista de regressões: casos cujo p50/p95 de analyze(), ou p50 de
+    uma etapa, ficou mais que `threshold` (fração) acima da linha de
+    base. O p95 das etapas isoladas é ruidoso demais para reprovar.
+    """
+    if report["meta"].get("corpus_hash") != baseline["meta"].get("corpus_hash"):
+        print("[AVISO] Corpus diferente da linha de base; só os casos em comum são comparados.")
+    if report["meta"].get("lt") != baseline["meta"].get("lt"):
+        print(f"[AVISO] Linha de base com --lt {baseline['meta'].get('lt')}, execução com --lt {report['meta'].get('lt')}.")
+
+    regressions = []
+    for name, case in report["cases"].items():
+        old_case = baseline["cases"].get(name)
+        if old_case is None:
+            continue
+        measured = [("analyze", case["analyze"], old_case["analyze"], ("p50_ms", "p95_ms"))]
+        measured += [(stage, case["stages"][stage], old_case["stages"].get(stage), ("p50_ms",))
+                     for stage in case["stages"]]
+        for label, new, old, metrics in measured:
+            if not old:
+                continue
+            for metric in metrics:
+                before, after = old[metric], new[metric]
+                if after - before > NOISE_FLOOR_MS and after > before * (1 + threshold):
+                    regressions.append(
+                        f"{name} [{label}] {metric}: {before:.3f} → {after:.3f} ms "
+                        f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)"
+                    )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do motor de análise do CorrigeAI")
+    parser.add_argument("--lt", choices=["stub", "real"], default="stub",
+                        help="LanguageTool simulado (padrão) ou real")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0,
+                        help="latência simulada por verificação no modo stub")
+    parser.add_argument("--repeat", type=int, default=30, help="medições por caso")
+    parser.add_argument("--warmup", type=int, default=3, help="execuções descartadas por caso")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CORPUS_SIZES,
+                        help="tamanhos (caracteres) do corpus")
+    parser.add_argument("--only", help="regex: só os casos cujo nome casar")
+    parser.add_argument("--output", default="benchmark_results.json", help="arquivo JSON de saída")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="regressão tolerada (fração, padrão 0.20)")
+    parser.add_argument("--adversarial", action="store_true",
+                        help="usa o corpus adversário e falha se algum p99 passar de --max-ms")
+    parser.add_argument("--max-ms", type=float, default=ADVERSARIAL_MAX_MS,
+                        help=f"limite de p99 no modo --adversarial (padrão {ADVERSARIAL_MAX_MS:.0f})")
+    parser.add_argument("--profile", choices=list(PROFILES) + ["all"], default="standard",
+                        help="perfil de análise medido (padrão standard; all mede todos)")
+    args = parser.parse_args(argv)
+
+    if args.adversarial:
+        problems = check_linear_rules()
+        if problems:
+            print("[ERRO] Regras sem tempo linear garantido:")
+            for line in problems:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("[OK] Todas as regras passam na verificação de tempo linear")
+
+    report = run(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[OK] Resultados salvos em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n[REGRESSÃO] {len(regressions)} medição(ões) acima de +{args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"[OK] Sem regressões acima de +{args.threshold:.0%} em relação a {args.baseline}")
+
+    if args.adversarial:
+        failures = check_adversarial(report, args.max_ms)
+        if failures:
+            print(f"\n[FALHA] {len(failures)} caso(s) adversário(s) fora do limite:")
+            for line in failures:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"[OK] Todos os casos adversários com p99 abaixo de {args.max_ms:.0f} ms")
+
+    misses = check_targets(report)
+    if misses:
+        print(f"\n[FALHA] {len(misses)} caso(s) acima da meta de latência do perfil:")
+        for line in misses:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("[OK] Todos os casos dentro da meta de latência do perfil")
+
+
+if __name__ == "__main__":
+    main()
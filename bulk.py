@@ -0,0 +1,281 @@
+"""
+CorrigeAI - Correção em massa (linha de comando)
+Reanalisa um acervo inteiro de redações (ex.: depois de mudar as
+regras) sem passar pela API: lê um diretório de .txt ou um arquivo
+JSONL, distribui as redações entre processos (um LanguageTool por
+processo) e grava os resultados em JSONL, na ordem de entrada e com
+memória limitada (só algumas redações por processo em andamento).
+
+O progresso vai para um checkpoint (<saida>.ckpt) a cada N redações;
+se a execução for interrompida, rodar o mesmo comando continua de onde
+parou. No fim, mostra a vazão (redações/s e caracteres/s).
+
+Uso:
+    python bulk.py redacoes/ resultados.jsonl
+    python bulk.py acervo.jsonl resultados.jsonl --workers 8 --profile full
+    python bulk.py acervo.jsonl resultados.jsonl --no-lt      # só regras customizadas
+
+Entrada JSONL: uma redação por linha, { "id": "...", "texto": "..." }
+(sem "id", vale o número da linha). Saída: uma linha por redação,
+{ "id": "...", "resultado": {...} } ou { "id": "...", "error": "..." }.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import analyzer
+from cache import normalize_text
+from grammar import GrammarBackend
+from profiles import PROFILES, get_profile
+
+CHECKPOINT_EVERY = 200
+# Prazo do LanguageTool por redação: fora da API não há usuário esperando
+BULK_LT_TIMEOUT = 60.0
+
+
+# ============================================================
+# ENTRADA
+# ============================================================
+def read_corpus(path: str, skip: int = 0):
+    """
+    Gera (id, texto, erro) na ordem do acervo, pulando as `skip` primeiras
+    redações sem lê-las. Diretório: todos os .txt (recursivo, em ordem
+    alfabética), com o caminho relativo como id. Arquivo: JSONL.
+    """
+    n = 0
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith(".txt"):
+                    continue
+                n += 1
+                if n <= skip:
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    with open(full, encoding="utf-8", errors="replace") as f:
+                        yield os.path.relpath(full, path), f.read(), None
+                except OSError as e:
+                    yield os.path.relpath(full, path), None, str(e)
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            n += 1
+            if n <= skip:
+                continue
+            try:
+                record = json.loads(line)
+                text = record.get("texto", record.get("text"))
+                essay_id = record.get("id", line_number)
+            except (ValueError, AttributeError):
+                yield line_number, None, "Linha JSON inválida."
+                continue
+            if not isinstance(text, str):
+                yield essay_id, None, "Campo 'texto' ausente."
+            else:
+                yield essay_id, text, None
+
+
+# ============================================================
+# WORKERS
+# ============================================================
+def _init_worker(use_lt: bool):
+    # Ctrl+C só no processo principal, que grava o checkpoint
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Um LanguageTool por processo, pronto antes da primeira redação
+    analyzer.grammar_backend = GrammarBackend(size=1)
+    if use_lt:
+        analyzer.grammar_backend.start()
+    else:
+        analyzer.grammar_backend.state = "unavailable"
+
+
+def _analyze_item(essay_id, text, error, profile_name: str, lt_timeout: float) -> tuple:
+    """Analisa uma redação. Retorna (linha JSONL, caracteres, nota ou None)."""
+    if error is None:
+        text = normalize_text(text)
+        if not text:
+            error = "Texto vazio."
+    if error is not None:
+        return _line({"id": essay_id, "error": error}), 0, None
+    try:
+        result = analyzer.analyze(text, grammar_timeout=lt_timeout, profile=get_profile(profile_name))
+    except Exception as e:
+        return _line({"id": essay_id, "error": f"Erro ao analisar: {e}"}), len(text), None
+    return _line({"id": essay_id, "resultado": result}), len(text), result["grade"]
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+# ============================================================
+# CHECKPOINT
+# ============================================================
+def _checkpoint_path(output: str) -> str:
+    return output + ".ckpt"
+
+
+def _read_checkpoint(output: str):
+    try:
+        with open(_checkpoint_path(output), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(output: str, state: dict):
+    tmp = _checkpoint_path(output) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _checkpoint_path(output))
+
+
+def _resume(args, identity: dict):
+    """Estado para continuar uma execução anterior (ou começar do zero). Sai com erro se não der."""
+    checkpoint = _read_checkpoint(args.output)
+    if args.restart or (checkpoint is None and not os.path.exists(args.output)):
+        return {**identity, "done": 0, "bytes": 0, "complete": False}
+    if checkpoint is None:
+        print(f"[AVISO] {args.output} já existe sem checkpoint. Use --restart para sobrescrever.")
+        sys.exit(2)
+    different = [k for k in ("input", "profile") if checkpoint.get(k) != identity[k]]
+    if different:
+        print(f"[AVISO] O checkpoint é de outra execução ({', '.join(different)} diferente). "
+              f"Use --restart para recomeçar.")
+        sys.exit(2)
+    if checkpoint.get("rules_version") != identity["rules_version"]:
+        print("[AVISO] As regras mudaram desde o checkpoint; o arquivo misturaria versões. "
+              "Use --restart para recomeçar.")
+        sys.exit(2)
+    return checkpoint
+
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+def run(args) -> dict:
+    profile = get_profile(args.profile)
+    use_lt = profile.grammar and not args.no_lt
+    identity = {
+        "input": os.path.abspath(args.input),
+        "profile": profile.name,
+        "rules_version": analyzer.ruleset_version(),
+    }
+    state = _resume(args, identity)
+    if state["complete"]:
+        print(f"[OK] Nada a fazer: {state['done']} redações já em {args.output} (use --restart para refazer)")
+        return {"processed": 0}
+    if state["done"]:
+        print(f"[INFO] Continuando após {state['done']} redações")
+
+    # Descarta o que foi escrito depois do último checkpoint (linha pela metade, etc.)
+    mode = "r+b" if state["bytes"] else "wb"
+    out = open(args.output, mode)
+    out.truncate(state["bytes"])
+    out.seek(state["bytes"])
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"[INFO] {workers} processo(s), perfil {profile.name}, "
+          f"LanguageTool {'ligado' if use_lt else 'desligado'}")
+
+    processed = errors = chars = 0
+    grade_sum = 0.0
+    start = time.perf_counter()
+
+    def checkpoint(complete=False):
+        out.flush()
+        os.fsync(out.fileno())
+        state.update(done=state["done"] + processed - checkpoint.saved, bytes=out.tell(), complete=complete)
+        checkpoint.saved = processed
+        _write_checkpoint(args.output, state)
+    checkpoint.saved = 0
+
+    jobs = ((essay_id, text, error, profile.name, args.lt_timeout)
+            for essay_id, text, error in read_corpus(args.input, skip=state["done"]))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(use_lt,))
+    interrupted = finished = False
+    try:
+        for line, n_chars, grade in analyzer._bounded_map(executor, _analyze_item, jobs, workers * 4):
+            out.write(line.encode("utf-8") + b"\n")
+            processed += 1
+            chars += n_chars
+            if grade is None:
+                errors += 1
+            else:
+                grade_sum += grade
+            if processed % args.checkpoint_every == 0:
+                checkpoint()
+                elapsed = time.perf_counter() - start
+                print(f"[INFO] {state['done']} redações ({processed / elapsed:.1f}/s)")
+        finished = True
+    except KeyboardInterrupt:
+        interrupted = True
+    except Exception as e:
+        # Worker morto (BrokenProcessPool), disco cheio...: o checkpoint fica
+        # incompleto para a próxima execução continuar de onde parou
+        print(f"\n[ERRO] Falha após {state['done'] + processed - checkpoint.saved} redações: {e!r}; "
+              f"rode o mesmo comando para continuar.")
+        raise
+    finally:
+        executor.shutdown(wait=finished, cancel_futures=True)
+        try:
+            checkpoint(complete=finished)
+        finally:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "processed": processed,
+        "errors": errors,
+        "total_done": state["done"],
+        "elapsed_s": round(elapsed, 2),
+        "essays_per_s": round(processed / elapsed, 2) if elapsed else 0,
+        "chars_per_s": round(chars / elapsed) if elapsed else 0,
+        "mean_grade": round(grade_sum / (processed - errors), 2) if processed > errors else None,
+        "interrupted": interrupted,
+    }
+    if interrupted:
+        print(f"\n[AVISO] Interrompido após {state['done']} redações; rode o mesmo comando para continuar.")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Correção em massa do CorrigeAI")
+    parser.add_argument("input", help="diretório de .txt ou arquivo JSONL")
+    parser.add_argument("output", help="arquivo JSONL de saída")
+    parser.add_argument("--workers", type=int, default=0, help="processos de análise (padrão: nº de CPUs)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=None,
+                        help="perfil de análise (padrão: CORRIGEAI_PROFILE)")
+    parser.add_argument("--no-lt", action="store_true", help="não sobe o LanguageTool (só regras customizadas)")
+    parser.add_argument("--lt-timeout", type=float, default=BULK_LT_TIMEOUT,
+                        help=f"prazo do LanguageTool por redação, em segundos (padrão {BULK_LT_TIMEOUT:.0f})")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help=f"redações entre checkpoints (padrão {CHECKPOINT_EVERY})")
+    parser.add_argument("--restart", action="store_true", help="ignora o checkpoint e recomeça do zero")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        print(f"[AVISO] Entrada não encontrada: {args.input}")
+        sys.exit(2)
+
+    summary = run(args)
+    if summary["processed"]:
+        print(f"\n[OK] {summary['processed']} redações em {summary['elapsed_s']:.1f} s "
+              f"({summary['essays_per_s']:.1f} redações/s, {summary['chars_per_s']:,} caracteres/s); "
+              f"{summary['errors']} com erro; nota média {summary['mean_grade']}")
+    if summary.get("interrupted"):
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Pacote de Regras do Navegador
+Gera, a partir dos pacotes de regras em uso, o pacote JSON que o
+frontend (index.html) usa para rodar as regras customizadas no próprio
+navegador: correções de acentuação, regras léxicas (internetês, clichês,
+expressões vagas), concordância, palavras ignoradas na repetição e
+mensagens fixas. Com ele, o frontend só chama a API para o que não dá
+para levar ao navegador: o LanguageTool e o léxico de acentuação
+completo (perfil "grammar").
+
+Os padrões são traduzidos da sintaxe do re do Python para RegExp com a
+flag "u" (\\b e \\w passam a valer para letras acentuadas, como no
+Python). Regras com construções sem equivalente em JavaScript vão em
+"server_only" e ficam fora do pacote.
+
+O pacote é identificado pelo hash do conteúdo: a API serve o manifesto
+(GET /api/regras, sempre revalidado) e o pacote em
+/api/regras/<hash>.json, que nunca muda e pode ficar em cache por um ano.
+
+Uso:
+    python bundle.py show              # versão, hash, tamanho e regras só do servidor
+    python bundle.py embed index.html  # atualiza o pacote embutido no frontend
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+
+import analyzer
+
+# Versão do formato do pacote: incremente ao mudar os campos (o frontend confere)
+BUNDLE_FORMAT = 1
+# Perfil que o frontend usa com o pacote: só o que fica no servidor
+GRAMMAR_PROFILE = "grammar"
+
+_EMBED_START = '<script id="regrasBundle" type="application/json">'
+_EMBED_END = "</script>"
+
+
+# ============================================================
+# TRADUÇÃO DE PADRÕES (re do Python → RegExp com flag "u")
+# ============================================================
+_W = r"[\p{L}\p{N}_]"
+_W_CLASS = r"\p{L}\p{N}_"
+_BOUNDARY = f"(?:(?<={_W})(?!{_W})|(?<!{_W})(?={_W}))"
+_NOT_BOUNDARY = f"(?:(?<={_W})(?={_W})|(?<!{_W})(?!{_W}))"
+
+# Escapes que mudam de sentido (\w só ASCII no JavaScript) ou não existem lá
+_ESCAPES = {
+    "b": _BOUNDARY, "B": _NOT_BOUNDARY,
+    "w": _W, "W": r"[^\p{L}\p{N}_]",
+    "d": r"\p{Nd}", "D": r"\P{Nd}",
+    "A": r"(?<![\s\S])", "Z": r"(?![\s\S])",
+}
+_CLASS_ESCAPES = {"w": _W_CLASS, "d": r"\p{Nd}", "D": r"\P{Nd}"}
+_KEPT_ESCAPES = set("sSntrfv")
+# Caracteres que, escapados, continuam válidos com a flag "u"
+_SYNTAX = set("^$\\.*+?()[]{}|/")
+_QUANTIFIER = re.compile(r"\{(\d*),?(\d*)\}")
+
+
+def js_pattern(pattern: str) -> str:
+    """
+    Padrão equivalente para new RegExp(padrão, "gu"). Levanta ValueError
+    se alguma construção não tiver tradução.
+    """
+    out, i, in_class = [], 0, False
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "\\":
+            if i + 1 >= n:
+                raise ValueError("barra invertida no fim do padrão")
+            e = pattern[i + 1]
+            i += 2
+            table = _CLASS_ESCAPES if in_class else _ESCAPES
+            if e in table:
+                out.append(table[e])
+            elif e in _KEPT_ESCAPES:
+                out.append("\\" + e)
+            elif e == "x" or e == "u":
+                size = 2 if e == "x" else 4
+                out.append(pattern[i - 2:i + size])
+                i += size
+            elif e.isalnum():
+                raise ValueError(f"escape \\{e} sem equivalente")
+            elif e in _SYNTAX or (in_class and e == "-"):
+                out.append("\\" + e)
+            else:
+                out.append(e)                           # \" \' \, ... viram o próprio caractere
+            continue
+
+        if in_class:
+            if c == "]":
+                in_class = False
+            elif c == "[":
+                c = "\\["
+            out.append(c)
+        elif c == "[":
+            in_class = True
+            out.append(c)
+            if pattern.startswith("^", i + 1):
+                out.append("^")
+                i += 1
+            if pattern.startswith("]", i + 1):          # ']' logo no início é literal
+                out.append("\\]")
+                i += 1
+        elif c == "(":
+            if pattern.startswith("(?P<", i):
+                out.append("(?<")
+                i += 4
+                continue
+            if pattern.startswith("(?", i) and not pattern.startswith(("(?:", "(?=", "(?!", "(?<=", "(?<!"), i):
+                raise ValueError(f"grupo {pattern[i:i + 3]} sem equivalente")
+            out.append(c)
+        elif c == "{":
+            m = _QUANTIFIER.match(pattern, i)
+            if m and (m.group(1) or m.group(2)):
+                out.append("{%s%s%s}" % (m.group(1) or "0", "," if "," in m.group() else "", m.group(2)))
+                i = m.end()
+                if pattern.startswith("+", i):
+                    raise ValueError("quantificador possessivo")
+                continue
+            out.append("\\{")                           # '{' sem quantificador é literal no Python
+        elif c == "}" or c == "]":
+            out.append("\\" + c)
+        elif c in "*+?" and pattern.startswith("+", i + 1):
+            raise ValueError("quantificador possessivo")
+        else:
+            out.append(c)
+        i += 1
+    if in_class:
+        raise ValueError("classe de caracteres sem ']'")
+    return "".join(out)
+
+
+# ============================================================
+# MONTAGEM DO PACOTE
+# ============================================================
+def build(ruleset=None) -> dict:
+    """Conteúdo do pacote (sem o hash) para o conjunto de regras `ruleset`."""
+    if ruleset is None:
+        ruleset = analyzer.rule_store.current()
+    server_only = []
+
+    def translate(rule_id, pattern):
+        try:
+            return js_pattern(pattern)
+        except ValueError as e:
+            server_only.append({"id": rule_id, "reason": str(e)})
+            return None
+
+    lexical = []
+    for rule_id, (kind, pattern, payload) in ruleset.lexical_rules.items():
+        translated = translate(rule_id, pattern)
+        if translated is None:
+            continue
+        rule = {
+            "id": rule_id,
+            "kind": kind,
+            "pattern": translated,
+            # Regras indexadas só são tentadas em inícios de palavra (scan_lexical)
+            "anchored": rule_id not in ruleset.unindexed,
+        }
+        if kind == "informal":
+            rule["term"], rule["replacement"] = payload
+        elif kind == "cliche":
+            rule["label"] = payload
+        lexical.append(rule)
+
+    concordance = []
+    for rule_id, (pattern, message, suggestion) in zip(ruleset.concordance_ids, ruleset.concordance):
+        translated = translate(rule_id, pattern)
+        if translated is not None:
+            concordance.append({"id": rule_id, "pattern": translated, "message": message, "suggestion": suggestion})
+
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": ruleset.version,
+        "rules_version": analyzer.ruleset_version(ruleset),
+        "packs": ruleset.packs,
+        "grammar_profile": GRAMMAR_PROFILE,
+        "accent_fixes": ruleset.accent_fixes,
+        "lexical": lexical,
+        "concordance": concordance,
+        "stop_words": sorted(ruleset.stop_words),
+        "messages": analyzer.MESSAGES,
+        "server_only": server_only,
+    }
+
+
+class Bundle:
+    """Pacote serializado de uma versão das regras, com o hash do conteúdo."""
+
+    __slots__ = ("rules_version", "hash", "body")
+
+    def __init__(self, content: dict):
+        self.rules_version = content["rules_version"]
+        data = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+        self.hash = hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+        self.body = json.dumps({"hash": self.hash, **content}, ensure_ascii=False,
+                               separators=(",", ":")).encode("utf-8")
+
+    @property
+    def filename(self) -> str:
+        return f"{self.hash}.json"
+
+    def manifest(self) -> dict:
+        return {
+            "hash": self.hash,
+            "rules_version": self.rules_version,
+            "url": f"/api/regras/{self.filename}",
+            "bytes": len(self.body),
+        }
+
+
+_bundles = {}
+_bundles_lock = threading.Lock()
+
+
+def current(ruleset=None) -> Bundle:
+    """Pacote do conjunto de regras (montado uma vez por versão das regras)."""
+    if ruleset is None:
+        ruleset = analyzer.rule_store.current()
+    version = analyzer.ruleset_version(ruleset)
+    with _bundles_lock:
+        found = _bundles.get(version)
+    if found is None:
+        found = Bundle(build(ruleset))
+        with _bundles_lock:
+            _bundles.clear()                            # só a versão atual é servida
+            _bundles[version] = found
+    return found
+
+
+# ============================================================
+# PACOTE EMBUTIDO NO FRONTEND
+# index.html leva uma cópia do pacote, para funcionar aberto direto
+# do disco, sem a API. Com a API no ar, o frontend troca pela versão
+# do servidor se o hash for outro.
+# ============================================================
+def embed(html_path: str, bundle: Bundle) -> bool:
+    """Grava o pacote no bloco <script id="regrasBundle"> de html_path. True se mudou."""
+    with open(html_path, encoding="utf-8") as f:
+        html = f.read()
+    start = html.find(_EMBED_START)
+    if start < 0:
+        raise ValueError(f"{html_path}: bloco {_EMBED_START} não encontrado")
+    start += len(_EMBED_START)
+    end = html.index(_EMBED_END, start)
+    # "</" não pode aparecer dentro do <script>
+    body = bundle.body.decode("utf-8").replace("</", "<\\/")
+    if html[start:end] == body:
+        return False
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(html[:start] + body + html[end:])
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pacote de regras do navegador")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="mostra versão, hash e tamanho do pacote")
+    p = sub.add_parser("embed", help="atualiza o pacote embutido no frontend")
+    p.add_argument("html", nargs="?", default="index.html", help="arquivo HTML (padrão: index.html)")
+    args = parser.parse_args(argv)
+
+    bundle = current()
+    content = json.loads(bundle.body)
+    if args.command == "embed":
+        try:
+            changed = embed(args.html, bundle)
+        except (OSError, ValueError) as e:
+            print(f"[ERRO] {e}")
+            sys.exit(1)
+        print(f"[OK] {args.html}: pacote {bundle.hash} {'gravado' if changed else 'já estava atualizado'}")
+    print(f"  hash: {bundle.hash}")
+    print(f"  rules_version: {bundle.rules_version}")
+    print(f"  bytes: {len(bundle.body):,}")
+    print(f"  regras: {len(content['lexical'])} léxicas, {len(content['concordance'])} de concordância, "
+          f"{len(content['accent_fixes'])} correções de acento")
+    for rule in content["server_only"]:
+        print(f"  [AVISO] {rule['id']} só no servidor: {rule['reason']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Cache de Resultados
+Endereçado por conteúdo: a chave é o hash do texto normalizado mais a
+impressão digital das regras e do LanguageTool. Duas camadas:
+LRU em memória (por processo) na frente de um SQLite em disco
+compartilhado por todos os workers.
+
+No modo incremental (edição ao vivo), cada parágrafo também é guardado
+por hash do conteúdo: ao reenviar o texto editado, só os parágrafos
+alterados voltam para o LanguageTool.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import analyzer
+from metrics import marker
+from profiles import get_profile
+
+CACHE_MEMORY_ENTRIES = int(os.environ.get("CORRIGEAI_CACHE_ENTRIES", 2048))
+CACHE_PARAGRAPH_ENTRIES = int(os.environ.get("CORRIGEAI_CACHE_PARAGRAPHS", 8192))
+CACHE_DB = os.environ.get(
+    "CORRIGEAI_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "corrigeai_cache.sqlite3"),
+)
+
+# Versão do formato do resultado: incremente ao mudar o que analyze() devolve
+CACHE_SCHEMA = 7
+
+
+def normalize_text(text: str) -> str:
+    """Normalização aplicada antes de analisar e de calcular a chave."""
+    text = unicodedata.normalize("NFC", text)
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+class ResultCache:
+    """
+    LRU em memória + SQLite em disco. Os valores são guardados como JSON,
+    então cada get() devolve um dicionário novo (seguro para modificar).
+    db_path vazio desliga a camada em disco.
+
+    A impressão digital tem a forma "geração|variante": a limpeza em disco
+    só apaga entradas de outra geração (regras/formato); variantes da
+    mesma geração (ex.: com e sem LanguageTool) convivem no arquivo.
+    """
+
+    def __init__(self, db_path: str = CACHE_DB, max_entries: int = CACHE_MEMORY_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._purged = set()
+
+    # --------------------------------------------------------
+    # Camada em disco
+    # --------------------------------------------------------
+    def _db(self):
+        # Uma conexão por processo (conexões SQLite não sobrevivem a fork)
+        if not self.db_path:
+            return None
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, fingerprint TEXT, value TEXT, created REAL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _disk_get(self, key: str):
+        try:
+            with self._lock:
+                db = self._db()
+                if db is None:
+                    return None
+                row = db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"[AVISO cache] leitura em disco falhou: {e}")
+            return None
+
+    def _disk_put(self, key: str, fingerprint: str, value: str):
+        try:
+            with self._lock:
+                db = self._db()
+                if db is None:
+                    return
+                # Entradas de versões antigas das regras nunca mais serão lidas.
+                # Outra versão do LanguageTool não é motivo: um worker --no-lt
+                # ou o aquecimento ("sem-lt") apagaria as entradas da API
+                generation = fingerprint.split("|", 1)[0] + "|"
+                if generation not in self._purged:
+                    db.execute("DELETE FROM results WHERE substr(fingerprint, 1, ?) != ?",
+                               (len(generation), generation))
+                    self._purged.add(generation)
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, fingerprint, value, created) VALUES (?, ?, ?, ?)",
+                    (key, fingerprint, value, time.time()),
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"[AVISO cache] gravação em disco falhou: {e}")
+
+    # --------------------------------------------------------
+    # API
+    # --------------------------------------------------------
+    @staticmethod
+    def key(text: str, fingerprint: str) -> str:
+        h = hashlib.sha256()
+        h.update(fingerprint.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if value is not None:
+            return json.loads(value)
+
+        value = self._disk_get(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, value)
+        return json.loads(value)
+
+    def put(self, key: str, fingerprint: str, result: dict):
+        value = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._remember(key, value)
+        self._disk_put(key, fingerprint, value)
+
+    def _remember(self, key: str, value: str):
+        # Chamado com o lock adquirido
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk": bool(self.db_path),
+            }
+
+
+class ParagraphCache:
+    """
+    Resultados parciais por parágrafo (modo incremental), só em memória.
+    Implementa o protocolo lookup/store esperado por analyze().
+    """
+
+    def __init__(self, max_entries: int = CACHE_PARAGRAPH_ENTRIES):
+        self._cache = ResultCache(db_path="", max_entries=max_entries)
+
+    def lookup(self, paragraph: str, ruleset, profile):
+        return self._cache.get(self._cache.key(paragraph, f"p:{fingerprint(ruleset, profile)}|{profile.signature()}"))
+
+    def store(self, paragraph: str, partial: dict, ruleset, profile):
+        fp = f"p:{fingerprint(ruleset, profile)}|{profile.signature()}"
+        self._cache.put(self._cache.key(paragraph, fp), fp, partial)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+result_cache = ResultCache()
+paragraph_cache = ParagraphCache()
+
+
+def fingerprint(ruleset=None, profile=None) -> str:
+    """
+    "geração|gramática": formato + versão das regras (pacotes + léxico),
+    e a versão do LanguageTool em uso — ou "-" se o perfil não o usa.
+    """
+    grammar = analyzer.grammar_backend.version if profile is None or profile.grammar else "-"
+    return f"v{CACHE_SCHEMA}:{analyzer.ruleset_version(ruleset)}|{grammar}"
+
+
+def _key(text: str, fp: str, profile) -> str:
+    # O perfil entra na chave, não na impressão digital: resultados de
+    # perfis diferentes convivem no disco (a limpeza é por geração das regras)
+    return result_cache.key(text, f"{fp}|{profile.signature()}")
+
+
+def is_complete(result: dict) -> bool:
+    """Resultado pode ir para o cache (nenhuma etapa foi pulada)."""
+    stats = result["stats"]
+    return not stats.get("grammar_skipped") and not stats.get("rules_aborted")
+
+
+def result_etag(text: str, profile: str = None) -> str:
+    """
+    Validador HTTP (ETag) do resultado de `text`: a própria chave do
+    cache, calculada sem analisar o texto.
+    """
+    text = normalize_text(text)
+    profile = get_profile(profile)
+    return _key(text, fingerprint(analyzer.rule_store.current(), profile), profile)[:32]
+
+
+def _public(result: dict, signature: bool) -> dict:
+    # O cache guarda a assinatura de cópias; só quem pede a recebe
+    if not signature:
+        result.pop("minhash", None)
+    return result
+
+
+def analyze_cached(text: str, timings=None, profile: str = None, signature: bool = False) -> dict:
+    """
+    analyze() com cache, no perfil `profile` (nome; None usa o padrão). Se o texto inteiro não estiver no cache, a
+    análise é incremental: parágrafos já vistos são reaproveitados.
+    Resultados em que a gramática foi pulada (prazo estourado) ou em que
+    alguma regra estourou o orçamento de tempo não são guardados, para
+    não fixar uma análise incompleta. signature: como em analyze().
+    """
+    mark = marker(timings)
+    text = normalize_text(text)
+    # O mesmo conjunto de regras na chave e na análise, mesmo se houver recarga no meio
+    ruleset = analyzer.rule_store.current()
+    profile = get_profile(profile)
+    fp = fingerprint(ruleset, profile)
+    key = _key(text, fp, profile)
+
+    cached = result_cache.get(key)
+    mark("cache")
+    if cached is not None:
+        return _public(cached, signature)
+
+    result = analyzer.analyze(text, paragraph_cache=paragraph_cache, timings=timings,
+                              ruleset=ruleset, profile=profile, signature=True)
+    if is_complete(result):
+        result_cache.put(key, fp, result)
+        mark("cache")
+    return _public(result, signature)
+
+
+def analyze_long_cached(text: str, executor=None, timings=None, profile: str = None,
+                        signature: bool = False) -> dict:
+    """
+    analyze_long() com cache (mesma chave de analyze_cached: o resultado
+    de um texto é o mesmo pelos dois caminhos).
+    """
+    mark = marker(timings)
+    text = normalize_text(text)
+    ruleset = analyzer.rule_store.current()
+    profile = get_profile(profile)
+    fp = fingerprint(ruleset, profile)
+    key = _key(text, fp, profile)
+
+    cached = result_cache.get(key)
+    mark("cache")
+    if cached is not None:
+        return _public(cached, signature)
+
+    result = analyzer.analyze_long(text, executor=executor, timings=timings,
+                                   ruleset=ruleset, profile=profile, signature=True)
+    if is_complete(result):
+        result_cache.put(key, fp, result)
+        mark("cache")
+    return _public(result, signature)
+
+
+def analyze_stream_cached(text: str, timings=None, profile: str = None, signature: bool = False):
+    """
+    analyze_stream() com cache. Se o texto inteiro já estiver no cache,
+    gera apenas o evento "final".
+    """
+    mark = marker(timings)
+    text = normalize_text(text)
+    ruleset = analyzer.rule_store.current()
+    profile = get_profile(profile)
+    fp = fingerprint(ruleset, profile)
+    key = _key(text, fp, profile)
+
+    cached = result_cache.get(key)
+    mark("cache")
+    if cached is not None:
+        yield "final", _public(cached, signature)
+        return
+
+    for event, data in analyzer.analyze_stream(text, paragraph_cache=paragraph_cache, timings=timings,
+                                               ruleset=ruleset, profile=profile, signature=True):
+        if event == "final":
+            if is_complete(data):
+                result_cache.put(key, fp, data)
+                mark("cache")
+            data = _public(data, signature)
+        yield event, data
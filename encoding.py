@@ -0,0 +1,173 @@
+"""
+Codificação das Respostas
+Tamanho e custo das respostas da API para clientes em redes lentas:
+
+  - serialização JSON com orjson, se instalado (senão, o json da
+    biblioteca padrão, sem escapar acentos);
+  - formato compacto opcional ("formato": "compacto"): os textos fixos
+    dos achados viram índices de um catálogo de mensagens, servido à
+    parte (GET /api/catalogo) e guardado pelo cliente;
+  - compressão negociada por Accept-Encoding: brotli (se instalado) ou
+    gzip, só para respostas JSON/texto acima de COMPRESS_MIN_BYTES.
+
+A validação por ETag (304) fica em app.py, sobre a chave do cache.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from flask.json.provider import DefaultJSONProvider
+
+import analyzer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("CORRIGEAI_COMPRESS_MIN_BYTES", 512))
+GZIP_LEVEL = int(os.environ.get("CORRIGEAI_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("CORRIGEAI_BROTLI_QUALITY", 5))
+
+_COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/")
+
+
+# ============================================================
+# JSON
+# ============================================================
+def dumps(obj) -> str:
+    """JSON compacto em str (UTF-8 sem escapes)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() com orjson quando disponível; bytes direto na resposta, sem passar por str."""
+
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is not None and not kwargs:
+            return dumps(obj)
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            body = orjson.dumps(obj)
+        else:
+            body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# ============================================================
+# CATÁLOGO DE MENSAGENS E FORMATO COMPACTO
+# ============================================================
+class Catalog:
+    """
+    Textos fixos numerados: as mensagens de analyzer.MESSAGES e as
+    mensagens/sugestões de concordância dos pacotes de regras. A versão
+    é o hash dos textos, então muda sempre que algum índice muda.
+    """
+
+    __slots__ = ("version", "messages", "index")
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.index = {text: i for i, text in enumerate(messages)}
+        self.version = hashlib.sha1("\n".join(messages).encode("utf-8")).hexdigest()[:12]
+
+    def ref(self, text: str):
+        """Índice de `text` no catálogo, ou o próprio texto se não for fixo."""
+        return self.index.get(text, text)
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "messages": self.messages}
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def catalog(ruleset=None) -> Catalog:
+    """Catálogo do conjunto de regras (um por versão das regras)."""
+    if ruleset is None:
+        ruleset = analyzer.rule_store.current()
+    with _catalogs_lock:
+        found = _catalogs.get(ruleset.version)
+        if found is None:
+            messages = list(dict.fromkeys(
+                list(analyzer.MESSAGES.values())
+                + [text for _, message, suggestion in ruleset.concordance for text in (message, suggestion)]
+            ))
+            found = _catalogs[ruleset.version] = Catalog(messages)
+        return found
+
+
+def compact(result: dict, catalog: Catalog) -> dict:
+    """
+    Resultado no formato compacto. Cada achado vira
+    [tipo, origem, texto, sugestão, spans], com texto e sugestão como
+    índice do catálogo quando são fixos; spans vazio para achados sem
+    posição (offset/length são o primeiro span).
+    """
+    encoded = {
+        "formato": "compacto",
+        "catalogo": catalog.version,
+        "grade": result["grade"],
+        "grade_class": result["grade_class"],
+        "grade_label": catalog.ref(result["grade_label"]),
+        "errors": [
+            [e["type"], e["source"], catalog.ref(e["text"]), catalog.ref(e["suggestion"]),
+             e.get("spans") or ([[e["offset"], e["length"]]] if "offset" in e else [])]
+            for e in result["errors"]
+        ],
+        "stats": result["stats"],
+    }
+    for key in ("submission_id", "similar_submissions"):
+        if key in result:
+            encoded[key] = result[key]
+    return encoded
+
+
+# ============================================================
+# COMPRESSÃO
+# ============================================================
+def compress_response(response, accept_encodings):
+    """
+    Comprime a resposta (after_request) com o melhor algoritmo aceito
+    pelo cliente. Streaming, arquivos e respostas pequenas passam direto.
+    """
+    if (response.direct_passthrough or response.is_streamed or not 200 <= response.status_code < 300
+            or response.status_code == 204 or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(_COMPRESSIBLE)):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    encoding = accept_encodings.best_match(offered)
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
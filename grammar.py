@@ -0,0 +1,231 @@
+"""
+Camada de Gramática (LanguageTool)
+Gerencia um pool de servidores LanguageTool locais, com conexões
+keep-alive, despacho para o servidor menos ocupado e prazo por
+requisição. Se o prazo estourar, a verificação é pulada e a análise
+segue só com as regras customizadas.
+
+Os servidores sobem em segundo plano (start_background), sem bloquear
+o import nem a primeira resposta. Estados: idle → warming → ready ou
+unavailable.
+
+Com CORRIGEAI_LT_URL, nenhuma JVM sobe: o pool usa um servidor
+LanguageTool já em execução (outra máquina, contêiner ou o substituto
+do teste de carga, python loadtest.py lt-stub).
+"""
+
+import os
+import threading
+import time
+
+# Importado já no carregamento do módulo: um fork durante o aquecimento
+# (pool de processos da API) não pode herdar o módulo pela metade
+try:
+    import language_tool_python
+except ImportError:
+    language_tool_python = None
+
+# Quantidade de servidores (JVMs) e prazo padrão por verificação
+LT_SERVERS = int(os.environ.get("CORRIGEAI_LT_SERVERS", 2))
+LT_BUDGET = float(os.environ.get("CORRIGEAI_LT_BUDGET_MS", 5000)) / 1000
+LT_LANGUAGE = "pt-BR"
+# Servidor LanguageTool externo (ex.: http://localhost:8081/v2); vazio sobe JVMs locais
+LT_URL = os.environ.get("CORRIGEAI_LT_URL", "")
+
+
+# ============================================================
+# UM SERVIDOR LANGUAGETOOL
+# ============================================================
+class _Server:
+    """Um servidor LanguageTool (local ou externo, sem `tool`) com sessão HTTP keep-alive."""
+
+    def __init__(self, tool, url: str = None):
+        self.tool = tool
+        self.url = (url or tool._url).rstrip("/") + "/check"
+        self.remote_version = None
+        self.in_flight = 0
+        self._session = None
+        self._pid = None
+
+    @property
+    def session(self):
+        # Sessões não sobrevivem a fork: cada processo abre as suas
+        if self._session is None or self._pid != os.getpid():
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+            self._pid = os.getpid()
+        return self._session
+
+    def check(self, text: str, timeout: float, disabled_rules=(), disabled_categories=(),
+              level: str = None) -> list:
+        data = {"language": LT_LANGUAGE, "text": text}
+        # Regras desligadas na própria requisição: o LanguageTool nem as executa
+        if disabled_rules:
+            data["disabledRules"] = ",".join(disabled_rules)
+        if disabled_categories:
+            data["disabledCategories"] = ",".join(disabled_categories)
+        if level:
+            data["level"] = level
+        resp = self.session.post(self.url, data=data, timeout=(min(1.0, timeout), timeout))
+        resp.raise_for_status()
+        return [_normalize(m) for m in resp.json().get("matches", [])]
+
+    def probe(self, timeout: float = 10.0) -> str:
+        """Versão de um servidor externo (levanta exceção se não responder)."""
+        resp = self.session.post(self.url, data={"language": LT_LANGUAGE, "text": "Teste."}, timeout=timeout)
+        resp.raise_for_status()
+        self.remote_version = (resp.json().get("software") or {}).get("version") or "?"
+        return self.remote_version
+
+    def close(self):
+        if self.tool is None:
+            return
+        try:
+            self.tool.close()
+        except Exception:
+            pass
+
+
+def _normalize(m: dict) -> dict:
+    """Converte um match da API HTTP do LanguageTool para o formato interno."""
+    rule = m.get("rule") or {}
+    ctx = m.get("context") or {}
+    return {
+        "rule_id": rule.get("id") or "",
+        "category": (rule.get("category") or {}).get("id") or "",
+        "message": m.get("message") or "",
+        "replacements": [r.get("value", "") for r in m.get("replacements") or []],
+        "offset": m.get("offset", 0),
+        "length": m.get("length", 0),
+        "context": ctx.get("text") or "",
+        "context_offset": ctx.get("offset") or 0,
+    }
+
+
+# ============================================================
+# POOL DE SERVIDORES
+# ============================================================
+class GrammarBackend:
+    """
+    Pool de N servidores LanguageTool.
+    check() devolve a lista de matches normalizados, ou None quando a
+    verificação foi pulada (prazo estourado, erro ou backend não pronto).
+    Regras/categorias desligadas e o nível ("picky") vão na requisição.
+    """
+
+    def __init__(self, size: int = LT_SERVERS, budget: float = LT_BUDGET):
+        self.size = max(1, size)
+        self.budget = budget
+        self.state = "idle"
+        self.error = None
+        self._servers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._owner_pid = None
+
+    @property
+    def available(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def version(self) -> str:
+        """Identifica o LanguageTool em uso (entra na chave de cache)."""
+        if not self.available:
+            return "sem-lt"
+        server = self._servers[0]
+        if server.tool is None:
+            return f"{LT_LANGUAGE}/lt-remoto-{server.remote_version}"
+        return f"{LT_LANGUAGE}/lt-{getattr(server.tool, 'language_tool_download_version', '?')}"
+
+    def start(self):
+        """Sobe os servidores (bloqueante). Falhas deixam o backend indisponível."""
+        with self._lock:
+            self.state = "warming"
+            self._owner_pid = os.getpid()
+        try:
+            if LT_URL:
+                # Um _Server por vaga do pool, todos no mesmo endereço (sessões keep-alive separadas)
+                servers = [_Server(None, LT_URL) for _ in range(self.size)]
+                version = servers[0].probe()
+                for server in servers:
+                    server.remote_version = version
+            else:
+                if language_tool_python is None:
+                    raise ImportError("módulo language_tool_python não instalado")
+                servers = []
+                for _ in range(self.size):
+                    servers.append(_Server(language_tool_python.LanguageTool(LT_LANGUAGE)))
+            with self._lock:
+                self._servers = servers
+                self.state = "ready"
+            where = f"em {LT_URL}" if LT_URL else f"{len(servers)} servidor(es)"
+            print(f"[OK] LanguageTool carregado com sucesso ({LT_LANGUAGE}, {where})")
+        except Exception as e:
+            with self._lock:
+                self.error = str(e)
+                self.state = "unavailable"
+            print(f"[AVISO] LanguageTool não disponível: {e}")
+            print("[INFO] Usando apenas regras customizadas.")
+        return self
+
+    def start_background(self):
+        """
+        Sobe os servidores numa thread daemon, sem bloquear. Idempotente:
+        só age se o backend ainda não foi iniciado neste processo (um
+        aquecimento interrompido por fork é refeito no processo filho).
+        """
+        with self._lock:
+            orphan = self.state == "warming" and self._owner_pid != os.getpid()
+            if self.state != "idle" and not orphan:
+                return self
+            self.state = "warming"
+            self._owner_pid = os.getpid()
+            self._thread = threading.Thread(target=self.start, name="lt-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: float = None) -> bool:
+        """Espera o aquecimento terminar. Retorna True se ficou pronto."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.available
+
+    def _acquire(self) -> _Server:
+        # Despacho para o servidor com menos verificações em andamento
+        with self._lock:
+            server = min(self._servers, key=lambda s: s.in_flight)
+            server.in_flight += 1
+            return server
+
+    def _release(self, server: _Server):
+        with self._lock:
+            server.in_flight -= 1
+
+    def check(self, text: str, timeout: float = None, disabled_rules=(), disabled_categories=(),
+              level: str = None):
+        if not self.available:
+            return None
+
+        timeout = self.budget if timeout is None else timeout
+        if timeout <= 0:
+            return None
+
+        server = self._acquire()
+        start = time.perf_counter()
+        try:
+            return server.check(text, timeout, disabled_rules, disabled_categories, level)
+        except Exception as e:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"[AVISO LanguageTool] verificação pulada após {elapsed:.0f} ms: {e}")
+            return None
+        finally:
+            self._release(server)
+
+    def close(self):
+        with self._lock:
+            servers, self._servers = self._servers, []
+            self.state = "idle"
+        for server in servers:
+            server.close()
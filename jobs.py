@@ -0,0 +1,487 @@
+"""
+Fila de Tarefas
+Análises assíncronas: o cliente envia o texto (POST /api/tarefas),
+recebe um id na hora e consulta o resultado depois
+(GET /api/tarefas/<id>). A fila fica num SQLite em disco, então
+reinícios da API ou dos workers não perdem nada do que foi aceito, e
+picos (prazo de entrega de uma escola inteira) viram fila em vez de
+erro.
+
+Prioridades: "alta" (edição ao vivo) sai sempre antes de "normal", que
+sai antes de "baixa" (correção em massa); dentro da mesma prioridade,
+por ordem de chegada.
+
+Os workers rodam à parte (python jobs.py worker), em processos com um
+LanguageTool cada. Cada tarefa pega é "alugada" por JOBS_LEASE_S
+segundos, renovados enquanto a análise roda. Se o worker morre, o
+supervisor devolve a tarefa à fila na hora; se a máquina inteira cai,
+ela volta quando o aluguel vence. Depois de JOBS_MAX_ATTEMPTS
+tentativas, a tarefa falha. Resultados (e falhas) ficam guardados por
+JOBS_RETENTION_S segundos.
+
+Uso:
+    python jobs.py worker                 # um worker por CPU
+    python jobs.py worker --workers 4 --no-lt
+    python jobs.py stats
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+
+JOBS_DB = os.environ.get(
+    "CORRIGEAI_JOBS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "corrigeai_tarefas.sqlite3"),
+)
+JOBS_MAX_QUEUED = int(os.environ.get("CORRIGEAI_JOBS_MAX_QUEUED", 100000))
+JOBS_LEASE_S = float(os.environ.get("CORRIGEAI_JOBS_LEASE_S", 30))
+JOBS_MAX_ATTEMPTS = int(os.environ.get("CORRIGEAI_JOBS_MAX_ATTEMPTS", 3))
+JOBS_RETENTION_S = float(os.environ.get("CORRIGEAI_JOBS_RETENTION_S", 86400))
+JOBS_POLL_S = float(os.environ.get("CORRIGEAI_JOBS_POLL_MS", 200)) / 1000
+# Tempo para os workers terminarem a tarefa em andamento ao desligar
+JOBS_DRAIN_S = float(os.environ.get("CORRIGEAI_JOBS_DRAIN_S", 30))
+
+PRIORITIES = {"alta": 0, "normal": 5, "baixa": 9}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+# Espera antes de tentar de novo uma tarefa que deu erro (não em queda de worker)
+RETRY_DELAY_S = 5.0
+# Intervalo mínimo entre varreduras de aluguéis vencidos e de tarefas expiradas
+_MAINTENANCE_S = 5.0
+
+
+# ============================================================
+# FILA (SQLite)
+# ============================================================
+class JobQueue:
+    """
+    Tarefas e workers num SQLite compartilhado pela API e pelos workers.
+    Estados: queued → running → done ou failed (running volta para
+    queued se o worker cair). db_path vazio desliga a fila.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB, lease: float = JOBS_LEASE_S,
+                 max_attempts: int = JOBS_MAX_ATTEMPTS, retention: float = JOBS_RETENTION_S):
+        self.db_path = db_path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.submitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._next_maintenance = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.db_path)
+
+    def _db(self):
+        # Chamado com o lock adquirido; uma conexão por processo
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, status TEXT, priority INTEGER,"
+                " payload TEXT, result TEXT, error TEXT, attempts INTEGER DEFAULT 0, worker TEXT,"
+                " lease_until REAL, available REAL, created REAL, started REAL, finished REAL, expires REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, seq)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_until)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, pid INTEGER, seen REAL)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _transaction(self, fn):
+        """Executa fn(db) numa transação de escrita (BEGIN IMMEDIATE)."""
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn(db)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return value
+
+    # --------------------------------------------------------
+    # API (envio e consulta)
+    # --------------------------------------------------------
+    def submit(self, payload: dict, priority: str = "normal") -> dict:
+        """
+        Enfileira uma tarefa. Retorna a tarefa (como em get()), ou None se
+        a fila estiver cheia (JOBS_MAX_QUEUED tarefas esperando).
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        def insert(db):
+            queued = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= JOBS_MAX_QUEUED:
+                return False
+            db.execute(
+                "INSERT INTO jobs (id, status, priority, payload, available, created)"
+                " VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, PRIORITIES[priority], json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            return True
+
+        if not self._transaction(insert):
+            self.rejected += 1
+            return None
+        self.submitted += 1
+        return self.get(job_id)
+
+    def get(self, job_id: str, with_result: bool = True) -> dict:
+        """Estado da tarefa (e resultado, se pronta), ou None se não existir ou já expirou."""
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT seq, status, priority, attempts, created, started, finished, expires, error,"
+                f" {'result' if with_result else 'NULL'} FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            seq, status, priority, attempts, created, started, finished, expires, error, result = row
+            if expires is not None and expires < time.time():
+                return None
+            job = {
+                "id": job_id,
+                "status": status,
+                "priority": PRIORITY_NAMES.get(priority, str(priority)),
+                "attempts": attempts,
+                "created": created,
+                "started": started,
+                "finished": finished,
+            }
+            if status == "queued":
+                # Tarefas que saem antes desta (prioridade maior ou mesma prioridade, mais antigas)
+                job["position"] = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+                    " AND (priority < ? OR (priority = ? AND seq < ?))",
+                    (priority, priority, seq),
+                ).fetchone()[0]
+        if status == "done" and result is not None:
+            job["resultado"] = json.loads(result)
+        elif status == "failed":
+            job["error"] = error
+        return job
+
+    # --------------------------------------------------------
+    # Workers
+    # --------------------------------------------------------
+    def claim(self, worker: str):
+        """
+        Pega a próxima tarefa (maior prioridade, mais antiga) para
+        `worker`. Retorna {"id", "payload", "attempts"} ou None.
+        """
+        now = time.time()
+        if now >= self._next_maintenance:
+            self._next_maintenance = now + _MAINTENANCE_S
+            self.maintenance(now)
+
+        def take(db):
+            row = db.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE status = 'queued' AND available <= ?"
+                " ORDER BY priority, seq LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,"
+                " started = ?, lease_until = ? WHERE id = ?",
+                (worker, now, now + self.lease, row[0]),
+            )
+            return {"id": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1}
+
+        return self._transaction(take)
+
+    def heartbeat(self, worker: str, job_id: str = None):
+        """Renova o aluguel da tarefa em andamento e marca o worker como vivo."""
+        now = time.time()
+
+        def beat(db):
+            db.execute("INSERT OR REPLACE INTO workers (id, pid, seen) VALUES (?, ?, ?)", (worker, os.getpid(), now))
+            if job_id is not None:
+                db.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                           (now + self.lease, job_id, worker))
+
+        self._transaction(beat)
+
+    def complete(self, worker: str, job_id: str, result: dict) -> bool:
+        """Grava o resultado. False se a tarefa já não era do worker (aluguel vencido e retomada)."""
+        now = time.time()
+        value = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+        return self._transaction(lambda db: db.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished = ?, expires = ?, lease_until = NULL"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (value, now, now + self.retention, job_id, worker),
+        ).rowcount == 1)
+
+    def fail(self, worker: str, job_id: str, error: str):
+        """Erro na análise: volta para a fila (após RETRY_DELAY_S) ou falha de vez na última tentativa."""
+        now = time.time()
+        self._transaction(lambda db: db.execute(
+            "UPDATE jobs SET"
+            " status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,"
+            " available = ?, error = ?, worker = NULL, lease_until = NULL,"
+            " finished = CASE WHEN attempts < ? THEN NULL ELSE ? END,"
+            " expires = CASE WHEN attempts < ? THEN NULL ELSE ? END"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, now + RETRY_DELAY_S, error, self.max_attempts, now,
+             self.max_attempts, now + self.retention, job_id, worker),
+        ))
+
+    def abandon(self, worker: str, count_attempt: bool = True) -> int:
+        """
+        Devolve à fila as tarefas de um worker que morreu. count_attempt
+        False (desligamento pedido) não gasta uma tentativa. Retorna
+        quantas tarefas voltaram.
+        """
+        def release(db):
+            if not count_attempt:
+                db.execute("UPDATE jobs SET attempts = attempts - 1 WHERE worker = ? AND status = 'running'", (worker,))
+            n = self._requeue(db, "worker = ? AND status = 'running'", (worker,), time.time())
+            db.execute("DELETE FROM workers WHERE id = ?", (worker,))
+            return n
+
+        return self._transaction(release)
+
+    def _requeue(self, db, where: str, params: tuple, now: float) -> int:
+        # Tarefas que já gastaram todas as tentativas falham (evita um texto que derruba workers em loop)
+        db.execute(
+            f"UPDATE jobs SET status = 'failed', error = 'Worker interrompido {self.max_attempts} vez(es) "
+            f"durante a análise.', worker = NULL, lease_until = NULL, finished = ?, expires = ?"
+            f" WHERE {where} AND attempts >= ?",
+            (now, now + self.retention, *params, self.max_attempts),
+        )
+        return db.execute(
+            f"UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, available = ? WHERE {where}",
+            (now, *params),
+        ).rowcount
+
+    def maintenance(self, now: float = None):
+        """Retoma tarefas com aluguel vencido (worker sumiu) e apaga as expiradas."""
+        now = time.time() if now is None else now
+
+        def sweep(db):
+            recovered = self._requeue(db, "status = 'running' AND lease_until < ?", (now,), now)
+            if recovered:
+                print(f"[AVISO tarefas] {recovered} tarefa(s) com aluguel vencido voltaram para a fila")
+            db.execute("DELETE FROM jobs WHERE expires < ?", (now,))
+            db.execute("DELETE FROM workers WHERE seen < ?", (now - 3 * self.lease,))
+
+        try:
+            self._transaction(sweep)
+        except sqlite3.Error as e:
+            print(f"[AVISO tarefas] manutenção da fila falhou: {e}")
+
+    # --------------------------------------------------------
+    # Estatísticas
+    # --------------------------------------------------------
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        try:
+            with self._lock:
+                db = self._db()
+                counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+                workers = db.execute("SELECT COUNT(*) FROM workers WHERE seen >= ?",
+                                     (time.time() - 3 * self.lease,)).fetchone()[0]
+        except sqlite3.Error as e:
+            return {"enabled": True, "error": str(e)}
+        return {
+            "enabled": True,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "workers": workers,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+        }
+
+    def prometheus(self) -> list:
+        """Linhas de /metrics da fila de tarefas."""
+        stats = self.stats()
+        if "queued" not in stats:
+            return []
+        return (
+            metrics.gauge("corrigeai_jobs_queued", "Tarefas aguardando um worker.", stats["queued"])
+            + metrics.gauge("corrigeai_jobs_running", "Tarefas em análise.", stats["running"])
+            + metrics.gauge("corrigeai_jobs_workers", "Workers de tarefas ativos.", stats["workers"])
+            + metrics.gauge("corrigeai_jobs_rejected_total", "Tarefas recusadas com a fila cheia.",
+                            self.rejected, "counter")
+        )
+
+
+job_queue = JobQueue()
+metrics.register_collector(job_queue.prometheus)
+
+
+# ============================================================
+# WORKER (um processo)
+# ============================================================
+def _worker_main(worker_id: str, db_path: str, use_lt: bool):
+    # Ctrl+C só no supervisor; SIGTERM termina a tarefa em andamento e sai
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    import analyzer
+    from grammar import GrammarBackend
+    # Um LanguageTool por processo, pronto antes da primeira tarefa
+    analyzer.grammar_backend = GrammarBackend(size=1)
+    if use_lt:
+        analyzer.grammar_backend.start()
+    else:
+        analyzer.grammar_backend.state = "unavailable"
+    # Depois de trocar o backend: app usa o mesmo, e _registrar faz
+    # o registro de turma e de cópias como nas rotas síncronas
+    import app as api
+    from analytics import analytics_store
+    from cache import analyze_cached, analyze_long_cached
+
+    queue = JobQueue(db_path)
+    current = [None]
+    # Evento próprio do heartbeat: durante a drenagem (SIGTERM), a tarefa
+    # em andamento continua com o aluguel renovado até o laço terminar
+    finished = threading.Event()
+
+    def beat():
+        while not finished.wait(queue.lease / 3):
+            try:
+                queue.heartbeat(worker_id, current[0])
+            except sqlite3.Error as e:
+                print(f"[AVISO tarefas] {worker_id}: heartbeat falhou: {e}")
+
+    queue.heartbeat(worker_id)
+    threading.Thread(target=beat, name="jobs-heartbeat", daemon=True).start()
+
+    while not stop.is_set():
+        try:
+            job = queue.claim(worker_id)
+        except sqlite3.Error as e:
+            print(f"[AVISO tarefas] {worker_id}: fila indisponível: {e}")
+            stop.wait(1.0)
+            continue
+        if job is None:
+            stop.wait(JOBS_POLL_S)
+            continue
+
+        current[0] = job["id"]
+        data = job["payload"]
+        texto = data["texto"]
+        try:
+            if len(texto) > api.MAX_CHARS:
+                resultado = analyze_long_cached(texto, profile=data.get("perfil"), signature=api._assinar(data))
+            else:
+                resultado = analyze_cached(texto, profile=data.get("perfil"), signature=api._assinar(data))
+            api._registrar(data, texto, resultado, data.get("aluno"))
+            # Guardado já no formato pedido no envio
+            resultado = api._corpo(resultado, data)
+        except Exception as e:
+            print(f"[ERRO tarefas] {job['id']} (tentativa {job['attempts']}): {e}")
+            queue.fail(worker_id, job["id"], "Erro ao analisar o texto.")
+        else:
+            if not queue.complete(worker_id, job["id"], resultado):
+                print(f"[AVISO tarefas] {job['id']}: aluguel vencido, resultado descartado")
+        current[0] = None
+
+    finished.set()
+    analytics_store.flush()
+    analyzer.grammar_backend.close()
+
+
+# ============================================================
+# SUPERVISOR
+# ============================================================
+def run_workers(workers: int, db_path: str = JOBS_DB, use_lt: bool = True):
+    """
+    Mantém `workers` processos consumindo a fila. Um worker que morre
+    tem a tarefa devolvida à fila e é substituído. SIGINT/SIGTERM:
+    os workers terminam a tarefa em andamento (até JOBS_DRAIN_S) e saem.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = JobQueue(db_path)
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    generation = 0
+    running = {}                                    # id do worker → processo
+    stopping = threading.Event()
+
+    def spawn():
+        nonlocal generation
+        generation += 1
+        worker_id = f"{prefix}-{generation}"
+        process = ctx.Process(target=_worker_main, args=(worker_id, db_path, use_lt), name=worker_id)
+        process.start()
+        running[worker_id] = process
+
+    for _ in range(workers):
+        spawn()
+    print(f"[OK] {workers} worker(s) de tarefas, LanguageTool {'ligado' if use_lt else 'desligado'} ({db_path})")
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    try:
+        while not stopping.wait(1.0):
+            for worker_id, process in list(running.items()):
+                if process.is_alive():
+                    continue
+                del running[worker_id]
+                returned = queue.abandon(worker_id)
+                print(f"[AVISO tarefas] {worker_id} terminou (código {process.exitcode}); "
+                      f"{returned} tarefa(s) de volta à fila. Subindo outro worker.")
+                spawn()
+    except KeyboardInterrupt:
+        pass
+
+    print(f"[INFO] Desligando: aguardando as tarefas em andamento (até {JOBS_DRAIN_S:.0f} s)")
+    for process in running.values():
+        process.terminate()
+    deadline = time.monotonic() + JOBS_DRAIN_S
+    for worker_id, process in running.items():
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.kill()
+            process.join()
+        queue.abandon(worker_id, count_attempt=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fila de tarefas do CorrigeAI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_worker = sub.add_parser("worker", help="processa as tarefas da fila")
+    p_worker.add_argument("--workers", type=int, default=0, help="processos de análise (padrão: nº de CPUs)")
+    p_worker.add_argument("--no-lt", action="store_true", help="não sobe o LanguageTool (só regras customizadas)")
+    p_stats = sub.add_parser("stats", help="tarefas por estado e workers ativos")
+    for p in (p_worker, p_stats):
+        p.add_argument("--db", default=JOBS_DB, help="arquivo SQLite (padrão: CORRIGEAI_JOBS_DB)")
+
+    args = parser.parse_args(argv)
+    if not args.db:
+        print("[AVISO] Informe --db ou CORRIGEAI_JOBS_DB")
+        raise SystemExit(1)
+    if args.command == "worker":
+        run_workers(args.workers or os.cpu_count() or 1, args.db, use_lt=not args.no_lt)
+    else:
+        print(json.dumps(JobQueue(args.db).stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Léxico de Acentuação
+Índice compacto em disco (tabela ordenada de strings) que mapeia a
+forma sem acentos de uma palavra para a forma acentuada correta, ex.:
+"educacao" → "educação". O arquivo é aberto com mmap somente leitura:
+carrega em milissegundos e as páginas são compartilhadas pelo sistema
+operacional entre todos os workers, em vez de cada processo ter seu
+próprio dicionário.
+
+O índice é gerado a partir de uma lista de formas de palavras do
+português (uma por linha):
+
+    python lexicon.py build palavras.txt [--output lexico_acentos.idx]
+
+Formato do arquivo:
+    MAGIC (8 bytes) | nº de entradas (uint32) | sha1 do conteúdo (20 bytes)
+    offsets dos registros (uint32 × N, relativos ao início dos dados)
+    registros "chave\\0forma acentuada\\n" em UTF-8, ordenados pela chave
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from functools import lru_cache
+
+LEXICON_PATH = os.environ.get(
+    "CORRIGEAI_LEXICON",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexico_acentos.idx"),
+)
+LEXICON_CACHE_ENTRIES = int(os.environ.get("CORRIGEAI_LEXICON_CACHE", 65536))
+
+MAGIC = b"CAIACC1\n"
+_HEADER = struct.Struct("<8sI20s")
+_OFFSET = struct.Struct("<I")
+
+
+def strip_accents(word: str) -> str:
+    """Forma sem acentos nem cedilha (chave do índice)."""
+    decomposed = unicodedata.normalize("NFD", word)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# ============================================================
+# LEITURA (mmap)
+# ============================================================
+class AccentLexicon:
+    """
+    Consulta ao índice de acentuação. Abre o arquivo sob demanda; se ele
+    não existir, fica vazio (lookup devolve None) e o analyzer usa só
+    as correções escritas à mão.
+    """
+
+    def __init__(self, path: str = LEXICON_PATH, cache_entries: int = LEXICON_CACHE_ENTRIES):
+        self.path = path
+        self.error = None
+        self._mm = None
+        self._count = 0
+        self._digest = b""
+        self._data = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        # Redações repetem muito as mesmas palavras: a normalização e a
+        # busca binária no mmap só rodam uma vez por palavra distinta
+        self.restore = lru_cache(maxsize=cache_entries)(self._restore)
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.path or not os.path.exists(self.path):
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, count, digest = _HEADER.unpack_from(mm, 0)
+                if magic != MAGIC:
+                    raise ValueError("formato desconhecido")
+                self._mm, self._count, self._digest = mm, count, digest
+                self._data = _HEADER.size + count * _OFFSET.size
+                print(f"[OK] Léxico de acentuação carregado ({count} entradas)")
+            except (OSError, ValueError, struct.error) as e:
+                self.error = str(e)
+                print(f"[AVISO] Léxico de acentuação ignorado ({self.path}): {e}")
+
+    @property
+    def size(self) -> int:
+        self._load()
+        return self._count
+
+    @property
+    def version(self) -> str:
+        """Identifica o conteúdo do índice (entra na versão das regras)."""
+        self._load()
+        return self._digest.hex()[:12] if self._mm is not None else "sem-lexico"
+
+    def _record(self, i: int) -> tuple:
+        mm = self._mm
+        start = self._data + _OFFSET.unpack_from(mm, _HEADER.size + i * _OFFSET.size)[0]
+        sep = mm.find(b"\0", start)
+        return start, sep
+
+    def lookup(self, key: str):
+        """Forma acentuada de `key` (já sem acentos), ou None."""
+        self._load()
+        mm = self._mm
+        if mm is None:
+            return None
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, sep = self._record(mid)
+            probe = mm[start:sep]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                end = mm.find(b"\n", sep)
+                return mm[sep + 1:end].decode("utf-8")
+        return None
+
+    def _restore(self, word: str):
+        """
+        Forma acentuada de `word` se ela estiver sem acento (ou com acento
+        incompleto, ex.: "açao"); None se a palavra já estiver correta ou
+        não constar do índice. Use restore() (com cache).
+        """
+        if not word.isalpha():
+            return None
+        correct = self.lookup(strip_accents(word))
+        return correct if correct is not None and correct != word else None
+
+    def stats(self) -> dict:
+        info = self.restore.cache_info()
+        return {
+            "loaded": self._mm is not None,
+            "entries": self.size,
+            "version": self.version,
+            "lookup_hits": info.hits,
+            "lookup_misses": info.misses,
+        }
+
+
+# ============================================================
+# GERAÇÃO DO ÍNDICE
+# ============================================================
+def _read_words(path: str):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            # Aceita listas simples e .dic do Hunspell já expandidos ("palavra/FLAGS")
+            word = line.split("/", 1)[0].strip()
+            if not word or word.startswith("#") or word.isdigit():
+                continue
+            yield unicodedata.normalize("NFC", word.lower())
+
+
+def build(source: str, output: str = LEXICON_PATH) -> dict:
+    """
+    Gera o índice a partir de uma lista de formas de palavras. Só entram
+    chaves sem ambiguidade: a forma sem acento não pode ser ela mesma uma
+    palavra ("esta"/"está", "publico"/"público") e tem de corresponder a
+    uma única forma acentuada.
+    """
+    words = set(_read_words(source))
+    groups = {}
+    for word in words:
+        key = strip_accents(word)
+        if key != word and key.isalpha():
+            groups.setdefault(key, set()).add(word)
+
+    entries = []
+    skipped_valid = skipped_ambiguous = 0
+    for key, forms in groups.items():
+        if key in words:
+            skipped_valid += 1
+        elif len(forms) > 1:
+            skipped_ambiguous += 1
+        else:
+            entries.append((key.encode("utf-8"), next(iter(forms)).encode("utf-8")))
+    entries.sort()
+
+    offsets = bytearray()
+    data = bytearray()
+    for key, value in entries:
+        offsets += _OFFSET.pack(len(data))
+        data += key + b"\0" + value + b"\n"
+    digest = hashlib.sha1(bytes(data)).digest()
+
+    tmp = output + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(entries), digest))
+        f.write(offsets)
+        f.write(data)
+    os.replace(tmp, output)
+
+    return {
+        "words": len(words),
+        "entries": len(entries),
+        "skipped_valid": skipped_valid,
+        "skipped_ambiguous": skipped_ambiguous,
+        "bytes": os.path.getsize(output),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Léxico de acentuação do CorrigeAI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="gera o índice a partir de uma lista de palavras")
+    p_build.add_argument("source", help="arquivo com uma forma de palavra por linha (UTF-8)")
+    p_build.add_argument("--output", default=LEXICON_PATH)
+
+    p_lookup = sub.add_parser("lookup", help="consulta palavras no índice")
+    p_lookup.add_argument("words", nargs="+")
+    p_lookup.add_argument("--index", default=LEXICON_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        stats = build(args.source, args.output)
+        print(f"[OK] {stats['entries']} entradas gravadas em {args.output} ({stats['bytes']} bytes)")
+        print(f"     {stats['words']} palavras lidas; ignoradas: {stats['skipped_valid']} "
+              f"(forma sem acento também é palavra), {stats['skipped_ambiguous']} (ambíguas)")
+    else:
+        lexicon = AccentLexicon(args.index)
+        if not lexicon.size:
+            print(f"[AVISO] Índice vazio ou ausente: {args.index}")
+            sys.exit(1)
+        for word in args.words:
+            print(f"{word} → {lexicon.restore(word.lower()) or '(sem correção)'}")
+
+
+if __name__ == "__main__":
+    main()
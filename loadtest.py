@@ -0,0 +1,538 @@
+"""
+CorrigeAI - Teste de carga
+Reproduz o pico de uma turma (ou escola) inteira enviando redações no
+mesmo minuto contra um servidor em execução, em vez de medir analyze()
+isolado como o benchmark.
+
+Cada aluno simulado digita (algumas análises de edição ao vivo, textos
+curtos e crescentes, no perfil "grammar" que o frontend usa), entrega a
+redação completa perto do limite de 10.000 caracteres, com envios
+concentrados perto do prazo, e às vezes reenvia o mesmo texto. A carga
+é de malha aberta: cada requisição sai no horário planejado, esteja o
+servidor atrasado ou não, e a latência conta a partir desse horário.
+
+O relatório traz vazão, percentis de latência por tipo de requisição,
+taxas de erro e de 429 e a memória do servidor ao longo do tempo.
+
+O LanguageTool pode ser o real ou um substituto local (lt-stub) que
+responde a API HTTP do LanguageTool com latência configurável.
+
+Uso:
+    python loadtest.py run --serve                        # sobe servidor + substituto do LanguageTool
+    python loadtest.py run --serve --students 500 --duration 60 --lt-latency-ms 300
+    python loadtest.py run --serve --lt real              # LanguageTool de verdade (precisa de Java)
+    python loadtest.py run --url http://localhost:8000 --pid 1234
+    python loadtest.py lt-stub --port 8081                # só o substituto (CORRIGEAI_LT_URL=http://localhost:8081/v2)
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmark import make_text, percentile
+
+LOADTEST_SEED = 2026
+# Tipos de requisição do cenário, na ordem do relatório
+KINDS = ("edicao", "redacao", "reenvio")
+ESSAY_KINDS = ["redacao"] * 6 + ["girias", "sem_acento", "frases_longas"]
+
+
+# ============================================================
+# SUBSTITUTO DO LANGUAGETOOL
+# Responde POST /v2/check como o servidor do LanguageTool, com um
+# achado por "muito" e latência fixa + proporcional ao tamanho do texto.
+# No máximo `capacity` verificações simultâneas, como as threads de
+# verificação de um servidor real (maxCheckThreads, 10 por padrão).
+# ============================================================
+_MUITO = re.compile(r"\bmuito\b")
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v2/check":
+            self._send(404, {"error": "use POST /v2/check"})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        text = urllib.parse.parse_qs(body).get("text", [""])[0]
+        server = self.server
+        with server.slots:
+            delay = server.latency + server.per_kchar * len(text) / 1000
+            if server.jitter:
+                delay += random.uniform(-server.jitter, server.jitter)
+            if delay > 0:
+                time.sleep(delay)
+        server.checks += 1
+        matches = [{
+            "message": "Substituto do LanguageTool",
+            "replacements": [{"value": "bastante"}],
+            "offset": m.start(), "length": m.end() - m.start(),
+            "context": {"text": text[max(0, m.start() - 20):m.end() + 20],
+                        "offset": min(20, m.start()), "length": m.end() - m.start()},
+            "rule": {"id": "STUB_RULE", "category": {"id": "GRAMMAR"}},
+        } for m in _MUITO.finditer(text)]
+        self._send(200, {"software": {"name": "LanguageTool", "version": "substituto"}, "matches": matches})
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_lt_stub(port: int = 0, latency_ms: float = 150.0, per_kchar_ms: float = 20.0,
+                  jitter_ms: float = 0.0, capacity: int = 10) -> ThreadingHTTPServer:
+    """Sobe o substituto numa thread daemon. A porta escolhida fica em server.server_port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.per_kchar = per_kchar_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.slots = threading.BoundedSemaphore(capacity)
+    server.checks = 0
+    threading.Thread(target=server.serve_forever, name="lt-stub", daemon=True).start()
+    return server
+
+
+# ============================================================
+# CENÁRIO
+# ============================================================
+def _prefix(text: str, size: int) -> str:
+    """Começo do texto com ~size caracteres, cortado numa palavra inteira."""
+    if size >= len(text):
+        return text
+    cut = text.rfind(" ", 0, size)
+    return text[:cut if cut > 0 else size]
+
+
+def build_plan(args) -> list:
+    """
+    Requisições do cenário, em ordem de horário:
+    [(segundos desde o início, tipo, caminho, corpo JSON)]. Determinístico
+    para a mesma semente e os mesmos parâmetros.
+    """
+    rng = random.Random(f"{args.seed}:{args.students}:{args.duration}")
+    plan = []
+    for student in range(args.students):
+        size = rng.randint(args.essay_min, args.essay_max)
+        essay = make_text(rng.choice(ESSAY_KINDS), size, seed=f"{args.seed}:{student}")
+        # Entregas concentradas perto do prazo (densidade crescente até o fim da janela)
+        submit_at = args.duration * rng.random() ** 0.5
+        submission = {"texto": essay}
+        if args.turma_size:
+            submission.update(turma=f"turma-{student // args.turma_size + 1}", aluno=f"aluno-{student + 1}")
+
+        # Edição ao vivo: trechos crescentes do começo da redação, antes da entrega
+        times = sorted(rng.uniform(0, submit_at) for _ in range(args.edits))
+        sizes = sorted(rng.randint(args.edit_min, args.edit_max) for _ in range(args.edits))
+        for at, chars in zip(times, sizes):
+            plan.append((at, "edicao", "/api/analisar", {"texto": _prefix(essay, chars), "perfil": "grammar"}))
+
+        plan.append((submit_at, "redacao", "/api/analisar", submission))
+        # Reenvio do mesmo texto (clique duplo, conexão que caiu, "enviar de novo")
+        if rng.random() < args.repeat_rate:
+            plan.append((submit_at + rng.uniform(1, 10), "reenvio", "/api/analisar", submission))
+    plan.sort(key=lambda item: item[0])
+    return plan
+
+
+# ============================================================
+# MEMÓRIA DO SERVIDOR (/proc, Linux)
+# ============================================================
+def process_tree_rss(pid: int):
+    """RSS (MB) do processo e de todos os descendentes (workers), ou None sem /proc."""
+    children = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="ascii", errors="replace") as f:
+                # O nome do processo vem entre parênteses e pode ter espaços
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status", encoding="ascii", errors="replace") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            if current == pid:
+                return None
+            continue
+        stack.extend(children.get(current, ()))
+    return round(total / 1024, 1)
+
+
+# ============================================================
+# SERVIDOR LOCAL (--serve)
+# ============================================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, workdir: str, lt_url: str = None):
+    """
+    Sobe python asgi.py numa porta livre, com caches e bancos vazios em
+    `workdir` (execuções comparáveis, sem resultados de testes
+    anteriores). Retorna (processo, url) quando o LanguageTool terminou
+    de aquecer.
+    """
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port),
+               CORRIGEAI_CACHE_DB=os.path.join(workdir, "cache.sqlite3"),
+               CORRIGEAI_SIMILARITY_DB=os.path.join(workdir, "similares.sqlite3"),
+               CORRIGEAI_JOBS_DB=os.path.join(workdir, "tarefas.sqlite3"))
+    if lt_url:
+        env["CORRIGEAI_LT_URL"] = lt_url
+    log = open(os.path.join(workdir, "servidor.log"), "w", encoding="utf-8")
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable, "asgi.py"], cwd=here, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"servidor terminou ao subir (código {process.returncode}); veja {log.name}")
+        try:
+            state = requests.get(f"{url}/api/status", timeout=2).json().get("language_tool_state")
+            if state in ("ready", "unavailable"):
+                if state == "unavailable":
+                    print("[AVISO] LanguageTool indisponível no servidor; só regras customizadas")
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f"servidor não ficou pronto em {args.startup_timeout:.0f} s; veja {log.name}")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+def run_load(url: str, plan: list, args, pid: int = None) -> dict:
+    """
+    Dispara o plano contra `url` e devolve as amostras:
+    {"requests": [(tipo, planejado, início, fim, status, erro)], "memory": [(t, MB)], "elapsed": s}.
+    Status 0 = falha de conexão/timeout.
+    """
+    local = threading.local()
+    samples = []
+    memory = []
+    samples_lock = threading.Lock()
+    finished = threading.Event()
+    started = time.monotonic()
+
+    def send(kind, scheduled, path, body):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        begin = time.monotonic() - started
+        status, error = 0, None
+        try:
+            resp = session.post(url + path, json=body, timeout=args.timeout)
+            status = resp.status_code
+        except requests.RequestException as e:
+            error = type(e).__name__
+        end = time.monotonic() - started
+        with samples_lock:
+            samples.append((kind, scheduled, begin, end, status, error))
+
+    def sample_memory():
+        while not finished.is_set():
+            rss = process_tree_rss(pid) if pid else None
+            if rss is not None:
+                memory.append((round(time.monotonic() - started, 1), rss))
+            finished.wait(args.sample_s)
+
+    sampler = threading.Thread(target=sample_memory, name="loadtest-memory", daemon=True)
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="loadtest") as pool:
+        for scheduled, kind, path, body in plan:
+            delay = scheduled - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, kind, scheduled, path, body)
+    elapsed = time.monotonic() - started
+    finished.set()
+    sampler.join()
+    return {"requests": samples, "memory": memory, "elapsed": elapsed}
+
+
+# ============================================================
+# RELATÓRIO
+# ============================================================
+def _latencies(rows: list) -> dict:
+    # Do horário planejado ao fim: atraso do próprio gerador também conta
+    values = sorted(end - scheduled for _, scheduled, _, end, _, _ in rows)
+    if not values:
+        return {}
+    latency = {f"p{q}_ms": round(percentile(values, q) * 1000, 1) for q in (50, 90, 95, 99)}
+    latency["max_ms"] = round(values[-1] * 1000, 1)
+    return latency
+
+
+def _counts(rows: list, elapsed: float) -> dict:
+    ok = [r for r in rows if r[4] in (200, 304)]
+    limited = sum(1 for r in rows if r[4] == 429)
+    errors = len(rows) - len(ok) - limited
+    return {
+        "requests": len(rows),
+        "ok": len(ok),
+        "rate_limited": limited,
+        "errors": errors,
+        "rate_limited_rate": round(limited / len(rows), 4) if rows else 0.0,
+        "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency": _latencies(ok),
+    }
+
+
+def summarize(result: dict, interval: float) -> dict:
+    rows, elapsed = result["requests"], result["elapsed"]
+    statuses = {}
+    for row in rows:
+        key = row[5] or str(row[4])
+        statuses[key] = statuses.get(key, 0) + 1
+
+    # Série temporal por janela de `interval` segundos (pela hora de término)
+    timeline = []
+    end_time = max([r[3] for r in rows] + [elapsed])
+    for i in range(int(end_time // interval) + 1):
+        lo, hi = i * interval, (i + 1) * interval
+        window = [r for r in rows if lo <= r[3] < hi]
+        rss = [mb for t, mb in result["memory"] if lo <= t < hi]
+        ok = [r for r in window if r[4] in (200, 304)]
+        timeline.append({
+            "t": round(lo, 1),
+            "sent": sum(1 for r in rows if lo <= r[1] < hi),
+            "done": len(ok),
+            "rps": round(len(ok) / interval, 1),
+            "p95_ms": _latencies(ok).get("p95_ms"),
+            "rate_limited": sum(1 for r in window if r[4] == 429),
+            "errors": sum(1 for r in window if r[4] not in (200, 304, 429)),
+            "rss_mb": max(rss) if rss else None,
+        })
+
+    memory = [mb for _, mb in result["memory"]]
+    lag = max((begin - scheduled for _, scheduled, begin, _, _, _ in rows), default=0.0)
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "total": _counts(rows, elapsed),
+        "kinds": {kind: _counts([r for r in rows if r[0] == kind], elapsed)
+                  for kind in KINDS if any(r[0] == kind for r in rows)},
+        "statuses": statuses,
+        "client_lag_ms": round(lag * 1000, 1),
+        "memory_mb": {"start": memory[0], "peak": max(memory), "end": memory[-1]} if memory else None,
+        "timeline": timeline,
+    }
+
+
+def print_report(summary: dict):
+    print(f"\n{'tipo':<10} {'req':>6} {'ok':>6} {'429':>5} {'erros':>5} {'req/s':>7} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}")
+    for name, c in list(summary["kinds"].items()) + [("total", summary["total"])]:
+        lat = c["latency"]
+        print(f"{name:<10} {c['requests']:>6} {c['ok']:>6} {c['rate_limited']:>5} {c['errors']:>5} "
+              f"{c['throughput_rps']:>7.1f} " + " ".join(f"{lat.get(k, 0):>6.0f}ms" for k in
+                                                         ("p50_ms", "p95_ms", "p99_ms", "max_ms")))
+
+    print(f"\n{'t (s)':>6} {'envios':>7} {'ok':>5} {'req/s':>7} {'p95':>9} {'429':>5} {'erros':>5} {'RSS':>9}")
+    for w in summary["timeline"]:
+        p95 = f"{w['p95_ms']:.0f}ms" if w["p95_ms"] is not None else "-"
+        rss = f"{w['rss_mb']:.0f}MB" if w["rss_mb"] is not None else "-"
+        print(f"{w['t']:>6.0f} {w['sent']:>7} {w['done']:>5} {w['rps']:>7.1f} {p95:>9} "
+              f"{w['rate_limited']:>5} {w['errors']:>5} {rss:>9}")
+
+    memory = summary["memory_mb"]
+    if memory:
+        print(f"\nMemória do servidor: {memory['start']:.0f} MB no início, pico de {memory['peak']:.0f} MB, "
+              f"{memory['end']:.0f} MB no fim")
+    print(f"Status: {', '.join(f'{k}: {v}' for k, v in sorted(summary['statuses'].items()))}")
+
+
+def check_limits(summary: dict, args) -> list:
+    """Violações de --max-p95-ms e --max-error-rate (erros + 429)."""
+    failures = []
+    total = summary["total"]
+    p95 = total["latency"].get("p95_ms")
+    if args.max_p95_ms is not None and p95 is not None and p95 > args.max_p95_ms:
+        failures.append(f"p95 {p95:.0f} ms > {args.max_p95_ms:.0f} ms")
+    rejected = total["error_rate"] + total["rate_limited_rate"]
+    if args.max_error_rate is not None and rejected > args.max_error_rate:
+        failures.append(f"erros + 429 em {rejected:.1%} das requisições > {args.max_error_rate:.1%}")
+    return failures
+
+
+def run(args) -> dict:
+    plan = build_plan(args)
+    counts = {kind: sum(1 for item in plan if item[1] == kind) for kind in KINDS}
+    chars = sum(len(item[3]["texto"]) for item in plan)
+    print(f"[INFO] {args.students} aluno(s), {len(plan)} requisições em {args.duration:.0f} s "
+          f"({', '.join(f'{k}: {v}' for k, v in counts.items())}; {chars:,} caracteres)")
+
+    stub = process = workdir = None
+    url, pid = args.url, args.pid
+    try:
+        if args.serve:
+            lt_url = None
+            if args.lt == "stub":
+                stub = start_lt_stub(latency_ms=args.lt_latency_ms, per_kchar_ms=args.lt_ms_per_kchar,
+                                     jitter_ms=args.lt_jitter_ms, capacity=args.lt_capacity)
+                lt_url = f"http://127.0.0.1:{stub.server_port}/v2"
+            workdir = tempfile.mkdtemp(prefix="corrigeai-carga-")
+            process, url = start_server(args, workdir, lt_url)
+            pid = process.pid
+            print(f"[OK] Servidor em {url} (pid {pid}), LanguageTool {args.lt}")
+
+        result = run_load(url, plan, args, pid)
+        try:
+            server_status = requests.get(f"{url}/api/status", timeout=5).json()
+        except (requests.RequestException, ValueError):
+            server_status = {}
+    finally:
+        if process is not None:
+            stop_server(process)
+        if stub is not None:
+            stub.shutdown()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarize(result, args.interval)
+    if summary["client_lag_ms"] > 1000:
+        print(f"[AVISO] O gerador atrasou até {summary['client_lag_ms']:.0f} ms para disparar "
+              f"requisições (aumente --concurrency); o atraso entra na latência medida")
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "url": url,
+            "served": args.serve,
+            "lt": args.lt if args.serve else server_status.get("language_tool_state"),
+            "lt_latency_ms": args.lt_latency_ms if args.serve and args.lt == "stub" else None,
+            "seed": args.seed,
+            "students": args.students,
+            "duration_s": args.duration,
+            "requests": len(plan),
+            "chars": chars,
+        },
+        "summary": summary,
+        "server": {key: server_status.get(key) for key in ("language_tool_state", "cache", "paragraph_cache")},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do CorrigeAI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="dispara o cenário de turma contra o servidor")
+    p.add_argument("--url", default="http://localhost:8000", help="servidor alvo (ignorado com --serve)")
+    p.add_argument("--pid", type=int, help="pid do servidor alvo, para medir a memória (Linux)")
+    p.add_argument("--serve", action="store_true", help="sobe um servidor (asgi.py) só para o teste")
+    p.add_argument("--lt", choices=["stub", "real"], default="stub",
+                   help="com --serve: substituto local (padrão) ou LanguageTool real")
+    p.add_argument("--students", type=int, default=500, help="alunos simulados (padrão 500)")
+    p.add_argument("--duration", type=float, default=60.0, help="janela de envio em segundos (padrão 60)")
+    p.add_argument("--edits", type=int, default=4, help="análises de edição ao vivo por aluno (padrão 4)")
+    p.add_argument("--edit-min", type=int, default=150, help="menor texto de edição ao vivo (caracteres)")
+    p.add_argument("--edit-max", type=int, default=1500, help="maior texto de edição ao vivo (caracteres)")
+    p.add_argument("--essay-min", type=int, default=7000, help="menor redação (caracteres)")
+    p.add_argument("--essay-max", type=int, default=10000, help="maior redação (caracteres, limite da API)")
+    p.add_argument("--repeat-rate", type=float, default=0.2, help="fração de alunos que reenviam (padrão 0.2)")
+    p.add_argument("--turma-size", type=int, default=35,
+                   help="alunos por turma nas entregas (estatísticas e cópias); 0 não informa turma")
+    p.add_argument("--concurrency", type=int, default=256, help="requisições simultâneas no máximo (gerador)")
+    p.add_argument("--timeout", type=float, default=60.0, help="prazo por requisição (s)")
+    p.add_argument("--lt-latency-ms", type=float, default=150.0, help="substituto: latência fixa por verificação")
+    p.add_argument("--lt-ms-per-kchar", type=float, default=20.0, help="substituto: latência por 1.000 caracteres")
+    p.add_argument("--lt-jitter-ms", type=float, default=50.0, help="substituto: variação aleatória (±)")
+    p.add_argument("--lt-capacity", type=int, default=10, help="substituto: verificações simultâneas")
+    p.add_argument("--startup-timeout", type=float, default=180.0, help="espera pelo servidor com --serve (s)")
+    p.add_argument("--interval", type=float, default=5.0, help="janela da série temporal (s)")
+    p.add_argument("--sample-s", type=float, default=1.0, help="intervalo entre medições de memória (s)")
+    p.add_argument("--seed", type=int, default=LOADTEST_SEED, help="semente do cenário")
+    p.add_argument("--output", default="loadtest_results.json", help="arquivo JSON de saída")
+    p.add_argument("--max-p95-ms", type=float, help="falha se o p95 geral passar disso")
+    p.add_argument("--max-error-rate", type=float, help="falha se erros + 429 passarem dessa fração")
+
+    s = sub.add_parser("lt-stub", help="só o substituto do LanguageTool (para um servidor já em execução)")
+    s.add_argument("--port", type=int, default=8081)
+    s.add_argument("--latency-ms", type=float, default=150.0, help="latência fixa por verificação")
+    s.add_argument("--ms-per-kchar", type=float, default=20.0, help="latência por 1.000 caracteres")
+    s.add_argument("--jitter-ms", type=float, default=50.0, help="variação aleatória (±)")
+    s.add_argument("--capacity", type=int, default=10, help="verificações simultâneas")
+    args = parser.parse_args(argv)
+
+    if args.command == "lt-stub":
+        server = start_lt_stub(args.port, args.latency_ms, args.ms_per_kchar, args.jitter_ms, args.capacity)
+        print(f"[OK] Substituto do LanguageTool em http://127.0.0.1:{server.server_port}/v2 "
+              f"(CORRIGEAI_LT_URL); Ctrl+C para sair")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    try:
+        report = run(args)
+    except RuntimeError as e:
+        print(f"[ERRO] {e}")
+        sys.exit(2)
+
+    print_report(report["summary"])
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[OK] Resultados salvos em {args.output}")
+
+    failures = check_limits(report["summary"], args)
+    if failures:
+        print("\n[FALHA] Capacidade abaixo do pedido:")
+        for line in failures:
+            print(f"  - {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Métricas de Desempenho
+Cronômetro por etapa da análise (StageTimer) e histogramas agregados,
+exportados em /metrics no formato texto do Prometheus.
+
+O cronômetro é por requisição e não trava nada: cada etapa custa uma
+chamada a perf_counter. Os histogramas só são atualizados uma vez por
+requisição (observe), com um único lock para todas as etapas.
+Desligue com CORRIGEAI_METRICS=0.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("CORRIGEAI_METRICS", "1") != "0"
+
+# Limites superiores dos buckets (segundos)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ============================================================
+# CRONÔMETRO POR REQUISIÇÃO
+# ============================================================
+class StageTimer:
+    """
+    Acumula o tempo de cada etapa. mark(etapa) atribui à etapa o tempo
+    desde o último mark (ou desde a criação / restart).
+    """
+
+    __slots__ = ("stages", "started", "_last")
+
+    def __init__(self):
+        self.stages = {}
+        self.started = self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def restart(self):
+        """Descarta o tempo corrido desde o último mark (ex.: pausa de um gerador)."""
+        self._last = time.perf_counter()
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Valor do cabeçalho Server-Timing (durações em ms)."""
+        parts = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.3f}")
+        return ", ".join(parts)
+
+
+def new_timer():
+    """StageTimer novo, ou None se as métricas estiverem desligadas."""
+    return StageTimer() if METRICS_ENABLED else None
+
+
+def _no_mark(stage: str):
+    pass
+
+
+def marker(timer):
+    """Função mark do cronômetro (ou uma que não faz nada, se timer for None)."""
+    return timer.mark if timer is not None else _no_mark
+
+
+# ============================================================
+# HISTOGRAMAS
+# ============================================================
+class Histogram:
+    """Histograma cumulativo no estilo Prometheus, por valor de rótulo."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}          # rótulo → [contagens por bucket..., +Inf], soma
+
+    def _observe(self, label_value: str, seconds: float):
+        # Chamado com o lock do registro adquirido
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total) in sorted(self._series.items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Histogramas do processo: etapas da análise e duração das requisições."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = Histogram(
+            "corrigeai_stage_duration_seconds",
+            "Tempo gasto em cada etapa da análise.", "stage")
+        self.requests = Histogram(
+            "corrigeai_request_duration_seconds",
+            "Duração das requisições da API.", "endpoint")
+
+    def observe(self, endpoint: str, timer: StageTimer):
+        """Registra as etapas e o total de uma requisição."""
+        if timer is None:
+            return
+        total = timer.total()
+        with self._lock:
+            for stage, seconds in timer.stages.items():
+                self.stages._observe(stage, seconds)
+            self.requests._observe(endpoint, total)
+
+    def observe_stages(self, stages: dict):
+        """Registra etapas medidas fora desta requisição (ex.: item de um lote)."""
+        with self._lock:
+            for stage, seconds in stages.items():
+                self.stages._observe(stage, seconds)
+
+    def render(self, extra: list = ()) -> str:
+        """Texto de exposição do Prometheus (extra: linhas já formatadas)."""
+        with self._lock:
+            lines = self.stages.render() + self.requests.render()
+        lines.extend(extra)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Funções que devolvem linhas extras para /metrics (ex.: admissão do servidor ASGI)
+_collectors = []
+
+
+def register_collector(collector):
+    _collectors.append(collector)
+
+
+def collected() -> list:
+    lines = []
+    for collector in _collectors:
+        lines.extend(collector())
+    return lines
+
+
+def gauge(name: str, help_text: str, value, kind: str = "gauge") -> list:
+    """Linhas de uma métrica simples (gauge ou counter) sem rótulos."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
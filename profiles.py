@@ -0,0 +1,129 @@
+"""
+Perfis de Análise
+Cada perfil decide quais etapas da análise rodam, como o LanguageTool
+é chamado (regras e categorias desligadas já na requisição, nível de
+exigência, prazo) e quantos achados dele entram no resultado. Também
+define a meta de latência (p95) que o benchmark confere.
+
+    quick     digitação ao vivo: só regras customizadas baratas, sem
+              LanguageTool nem assinatura para detecção de cópias
+    standard  padrão da API: todas as etapas, LanguageTool com o prazo do backend
+    full      correção final (estilo ENEM): LanguageTool no nível "picky",
+              prazo maior e sem limite baixo de achados
+    grammar   para o frontend com o pacote de regras do navegador
+              (bundle.py): só o que fica no servidor, LanguageTool e
+              acentuação com o léxico completo
+
+O perfil vai em "perfil" no corpo da requisição; sem ele, vale
+CORRIGEAI_PROFILE (padrão: standard).
+"""
+
+import os
+
+# Etapas opcionais (mesmos nomes das etapas de /metrics; "similaridade"
+# é a assinatura MinHash usada na detecção de cópias)
+STAGES = ("languagetool", "acentuacao", "concordancia", "informal", "cliches", "vagas", "repeticao",
+          "similaridade")
+
+# Tipo de regra léxica de cada etapa
+LEXICAL_KINDS = {"informal": "informal", "cliches": "cliche", "vagas": "vague"}
+
+# Regras genéricas demais (ou com falsos positivos comuns) desligadas
+# no próprio LanguageTool em todos os perfis
+BASE_DISABLED_RULES = ("WHITESPACE_RULE", "COMMA_PARENTHESIS_WHITESPACE", "UNPAIRED_BRACKETS")
+
+
+class Profile:
+    """Configuração de um perfil. Serializável (vai para os workers do modo documento)."""
+
+    __slots__ = ("name", "description", "stages", "lexical_kinds", "grammar_timeout",
+                 "disabled_rules", "disabled_categories", "level", "max_grammar_errors", "target_ms")
+
+    def __init__(self, name: str, description: str, stages, target_ms: float,
+                 grammar_timeout: float = None, disabled_rules=(), disabled_categories=(),
+                 level: str = None, max_grammar_errors: int = 20):
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Perfil {name}: etapas desconhecidas: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.description = description
+        self.stages = frozenset(stages)
+        self.lexical_kinds = frozenset(kind for stage, kind in LEXICAL_KINDS.items() if stage in self.stages)
+        self.grammar_timeout = grammar_timeout
+        self.disabled_rules = tuple(BASE_DISABLED_RULES) + tuple(disabled_rules)
+        self.disabled_categories = tuple(disabled_categories)
+        self.level = level
+        self.max_grammar_errors = max_grammar_errors
+        self.target_ms = target_ms
+
+    @property
+    def grammar(self) -> bool:
+        return "languagetool" in self.stages
+
+    def grammar_options(self) -> dict:
+        """Parâmetros extras da requisição ao LanguageTool."""
+        return {
+            "disabled_rules": self.disabled_rules,
+            "disabled_categories": self.disabled_categories,
+            "level": self.level,
+        }
+
+    def signature(self) -> str:
+        """Identifica a configuração (entra na chave de cache)."""
+        return "|".join([
+            self.name,
+            ",".join(sorted(self.stages)),
+            ",".join(self.disabled_rules),
+            ",".join(self.disabled_categories),
+            self.level or "",
+            str(self.max_grammar_errors),
+        ])
+
+    def describe(self) -> dict:
+        return {
+            "description": self.description,
+            "stages": sorted(self.stages),
+            "grammar_timeout_s": self.grammar_timeout,
+            "disabled_rules": list(self.disabled_rules),
+            "disabled_categories": list(self.disabled_categories),
+            "level": self.level or "default",
+            "max_grammar_errors": self.max_grammar_errors,
+            "target_ms": self.target_ms,
+        }
+
+
+PROFILES = {
+    "quick": Profile(
+        "quick", "Digitação ao vivo: acentuação, concordância e internetês, sem LanguageTool.",
+        stages=("acentuacao", "concordancia", "informal"),
+        target_ms=50,
+    ),
+    "standard": Profile(
+        "standard", "Padrão: todas as etapas, LanguageTool com o prazo do backend.",
+        stages=STAGES,
+        target_ms=2000,
+    ),
+    "full": Profile(
+        "full", "Correção final: LanguageTool no nível picky, prazo maior, até 100 achados.",
+        stages=STAGES,
+        grammar_timeout=10.0,
+        level="picky",
+        max_grammar_errors=100,
+        target_ms=10000,
+    ),
+    "grammar": Profile(
+        "grammar", "Só LanguageTool e acentuação; as demais regras rodam no navegador (GET /api/regras).",
+        stages=("languagetool", "acentuacao"),
+        target_ms=2000,
+    ),
+}
+
+DEFAULT_PROFILE = os.environ.get("CORRIGEAI_PROFILE", "standard")
+
+
+def get_profile(name: str = None) -> Profile:
+    """Perfil pelo nome (None: o padrão). Levanta ValueError se não existir."""
+    profile = PROFILES.get(name or DEFAULT_PROFILE)
+    if profile is None:
+        raise ValueError(f"Perfil desconhecido: {name}. Use {', '.join(PROFILES)}.")
+    return profile
@@ -0,0 +1,526 @@
+"""
+Pacotes de Regras
+As regras customizadas (acentuação, internetês, clichês, expressões
+vagas, concordância e palavras ignoradas na repetição) ficam em
+arquivos JSON versionados no diretório regras/ (CORRIGEAI_RULES_DIR).
+Todos os *.json do diretório são combinados, em ordem de nome.
+
+Os pacotes são validados e compilados (ids das regras, verificação de
+tempo linear, índice por prefixo) num artefato serializado
+(CORRIGEAI_RULES_ARTIFACT), reaproveitado entre reinícios enquanto o
+conteúdo dos pacotes não mudar.
+
+Cada processo confere a cada CORRIGEAI_RULES_CHECK_S segundos se os
+arquivos mudaram e, se mudaram, troca o conjunto de regras inteiro numa
+única atribuição: análises em andamento terminam com o conjunto antigo.
+Pacotes inválidos são recusados com [AVISO] e o conjunto anterior
+continua valendo.
+
+Uso:
+    python rules.py compile      # valida os pacotes e grava o artefato
+    python rules.py show         # pacotes em uso, versão e nº de regras
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+RULES_DIR = os.environ.get("CORRIGEAI_RULES_DIR", os.path.join(_HERE, "regras"))
+RULES_ARTIFACT = os.environ.get("CORRIGEAI_RULES_ARTIFACT", os.path.join(_HERE, "regras_compiladas.pickle"))
+RULES_CHECK_INTERVAL = float(os.environ.get("CORRIGEAI_RULES_CHECK_S", 2))
+
+# Versão do artefato: incremente ao mudar RuleSet ou o formato dos pacotes
+ARTIFACT_FORMAT = 3
+
+
+# ============================================================
+# GARANTIA DE TEMPO LINEAR
+# O re do Python faz backtracking: um padrão mal escrito pode levar
+# tempo quadrático (ou pior) no tamanho do texto. Toda regra é
+# verificada ao compilar os pacotes e rejeitada se tiver:
+#   - referência a grupo (\1);
+#   - quantificador dentro de outro quantificador;
+#   - repetição limitada maior que RULE_MAX_WINDOW;
+#   - repetição ilimitada, exceto de uma única letra/classe de letras
+#     em regras ancoradas no início de palavra (ex.: r"\bkk+\b"), que
+#     não passam do fim da palavra;
+#   - repetição ilimitada dentro de lookahead/lookbehind.
+# Com isso, cada tentativa custa no máximo uma constante (ou o tamanho
+# da palavra), e as regras rodam dentro de cada frase.
+# ============================================================
+try:
+    import re._parser as _sre_parse
+    import re._constants as _sre
+except ImportError:                                     # Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre
+
+RULE_MAX_WINDOW = 200
+
+_SINGLE_CHAR_OPS = {_sre.LITERAL, _sre.NOT_LITERAL, _sre.IN, _sre.ANY}
+_REPEAT_OPS = {_sre.MAX_REPEAT, _sre.MIN_REPEAT} | (
+    {_sre.POSSESSIVE_REPEAT} if hasattr(_sre, "POSSESSIVE_REPEAT") else set())
+
+
+def _is_word_char_item(item) -> bool:
+    """Um único literal ou classe só de letras/dígitos (não atravessa palavras)."""
+    op, av = item
+    if op == _sre.LITERAL:
+        return chr(av).isalnum()
+    if op == _sre.IN:
+        for sub_op, sub_av in av:
+            if sub_op == _sre.LITERAL and chr(sub_av).isalnum():
+                continue
+            if sub_op == _sre.RANGE and all(chr(c).isalnum() for c in sub_av):
+                continue
+            return False
+        return True
+    return False
+
+
+def linear_time_problem(pattern: str, anchored: bool = False):
+    """
+    Motivo pelo qual `pattern` não tem casamento em tempo linear
+    garantido, ou None se ele passa. anchored: a regra só é tentada
+    em inícios de palavra (índice léxico), não com search().
+    """
+    try:
+        tree = _sre_parse.parse(pattern)
+    except re.error as e:
+        return f"padrão inválido: {e}"
+
+    def walk(items, in_repeat, in_assert):
+        for op, av in items:
+            problem = None
+            if op in (_sre.GROUPREF, _sre.GROUPREF_EXISTS):
+                return "referência a grupo"
+            if op in _REPEAT_OPS:
+                low, high, body = av
+                if in_repeat:
+                    return "quantificador aninhado"
+                if high == _sre.MAXREPEAT:
+                    if in_assert:
+                        return "repetição ilimitada dentro de lookaround"
+                    if not (anchored and len(body) == 1 and _is_word_char_item(body[0])):
+                        return "repetição ilimitada"
+                elif high > RULE_MAX_WINDOW:
+                    return f"repetição maior que {RULE_MAX_WINDOW}"
+                problem = walk(body, True, in_assert)
+            elif op == _sre.SUBPATTERN:
+                problem = walk(av[-1], in_repeat, in_assert)
+            elif op in (_sre.ASSERT, _sre.ASSERT_NOT):
+                problem = walk(av[1], in_repeat, True)
+            elif op == _sre.BRANCH:
+                for branch in av[1]:
+                    problem = problem or walk(branch, in_repeat, in_assert)
+            elif op == getattr(_sre, "ATOMIC_GROUP", None):
+                problem = walk(av, in_repeat, in_assert)
+            if problem:
+                return problem
+        return None
+
+    return walk(tree, False, False)
+
+
+def _require_linear(rule_id: str, pattern: str, anchored: bool = False):
+    problem = linear_time_problem(pattern, anchored)
+    if problem:
+        raise ValueError(f"Regra {rule_id} sem tempo linear garantido ({problem}): {pattern}")
+
+
+# ============================================================
+# ÍNDICE LÉXICO
+# As regras de gírias, clichês e expressões vagas são indexadas pelo
+# prefixo (até 2 letras) da primeira palavra; as que não começam com
+# letras fixas varrem o texto uma a uma.
+# ============================================================
+def _rule_id(prefix: str, label: str) -> str:
+    """Gera um id estável (A-Z, 0-9, _) a partir do rótulo da regra."""
+    label = re.sub(r"\\b|\(\?!.*$", "", label)       # \b e lookaheads
+    label = re.sub(r"\[(.)[^\]]*\]", r"\1", label)     # [oó] → o
+    label = unicodedata.normalize("NFKD", label)
+    label = "".join(c for c in label if not unicodedata.combining(c))
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_").upper()
+    return f"{prefix}_{slug}"
+
+
+def _build_lexical_rules(informal: list, cliches: list, vague: list) -> dict:
+    """Monta {rule_id: (tipo, padrão, dados)} preservando a ordem dos pacotes."""
+    entries = []
+    for pattern, (term, replacement) in informal:
+        entries.append(("INFORMAL", term, "informal", pattern, (term, replacement)))
+    for pattern, label in cliches:
+        entries.append(("CLICHE", label, "cliche", pattern, label))
+    for pattern in vague:
+        entries.append(("VAGUE", pattern, "vague", pattern, None))
+
+    rules = {}
+    for prefix, label, kind, pattern, payload in entries:
+        rule_id = _rule_id(prefix, label)
+        n = 2
+        while rule_id in rules:
+            rule_id = f"{_rule_id(prefix, label)}_{n}"
+            n += 1
+        rules[rule_id] = (kind, pattern, payload)
+    return rules
+
+
+def _top_level_alternatives(pattern: str) -> list:
+    """Divide um padrão nos '|' que estão fora de grupos e classes."""
+    parts, start, depth, in_class, i = [], 0, 0, False, 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    parts.append(pattern[start:])
+    return parts
+
+
+def _first_word_keys(pattern: str):
+    """
+    Prefixos (até 2 letras) possíveis para a primeira palavra do padrão,
+    ou None se ele não começar com letras fixas.
+    Ex.: r"\\bv[aá]rias coisas\\b" → {"va", "vá"}; r"[eé] sabido" → {"e", "é"}.
+    """
+    keys = set()
+    for alt in _top_level_alternatives(pattern):
+        if alt.startswith(r"\b"):
+            alt = alt[2:]
+        options, i = [""], 0
+        while len(options[0]) < 2:
+            if i >= len(alt) or alt[i] in " -,;:" or alt[i:i + 2] in (r"\b", r"\s"):
+                break                                   # fim da primeira palavra
+            if alt[i] == "[":
+                end = alt.find("]", i)
+                chars = alt[i + 1:end]
+                if end < 0 or not chars or any(c in chars for c in "-^\\"):
+                    return None
+                i = end + 1
+            elif alt[i].isalpha():
+                chars = alt[i]
+                i += 1
+            else:
+                return None                             # grupo, '.', '\w', ...
+            if i < len(alt) and alt[i] in "?*{":
+                return None                             # letra opcional
+            options = [o + c for o in options for c in chars]
+        if not options[0]:
+            return None
+        keys.update(options)
+    return keys
+
+
+# ============================================================
+# PACOTES (JSON)
+# ============================================================
+# Campo → (tipo, chaves obrigatórias de cada item)
+_PACK_FIELDS = {
+    "accent_fixes": (dict, None),
+    "informal": (list, ("pattern", "term", "replacement")),
+    "cliches": (list, ("pattern", "label")),
+    "vague": (list, None),
+    "concordance": (list, ("pattern", "message", "suggestion")),
+    "stop_words": (list, None),
+}
+
+
+def _pack_files(directory: str) -> list:
+    """Arquivos *.json do diretório, em ordem de nome."""
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+
+def _signature(files: list) -> tuple:
+    """Muda quando algum pacote é criado, removido ou alterado."""
+    signature = []
+    for path in files:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _read_sources(directory: str) -> tuple:
+    """([(arquivo, bytes), ...], sha1 do conteúdo de todos os pacotes)."""
+    sources = []
+    h = hashlib.sha1()
+    for path in _pack_files(directory):
+        with open(path, "rb") as f:
+            raw = f.read()
+        h.update(os.path.basename(path).encode("utf-8") + b"\0" + raw + b"\0")
+        sources.append((path, raw))
+    if not sources:
+        raise ValueError(f"nenhum pacote de regras em {directory}")
+    return sources, h.hexdigest()
+
+
+def parse_pack(path: str, raw: bytes) -> dict:
+    """Lê e valida um pacote. Levanta ValueError com o arquivo e o motivo."""
+    name = os.path.basename(path)
+    try:
+        pack = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"{name}: JSON inválido ({e})")
+    if not isinstance(pack, dict):
+        raise ValueError(f"{name}: o pacote deve ser um objeto JSON")
+    for field in ("name", "version"):
+        if not isinstance(pack.get(field), str) or not pack[field]:
+            raise ValueError(f"{name}: campo obrigatório \"{field}\" ausente")
+    for field, (kind, keys) in _PACK_FIELDS.items():
+        value = pack.setdefault(field, kind())
+        if not isinstance(value, kind):
+            raise ValueError(f"{name}: \"{field}\" deve ser {'objeto' if kind is dict else 'lista'}")
+        if keys:
+            for n, item in enumerate(value):
+                if not isinstance(item, dict) or any(not isinstance(item.get(k), str) for k in keys):
+                    raise ValueError(f"{name}: {field}[{n}] precisa de {', '.join(keys)}")
+    return pack
+
+
+# ============================================================
+# CONJUNTO DE REGRAS COMPILADO
+# ============================================================
+class RuleSet:
+    """
+    Regras compiladas de um conjunto de pacotes. Não muda depois de
+    criado: cada análise usa um só RuleSet do começo ao fim.
+    """
+
+    def __init__(self, packs: list, digest: str):
+        self.digest = digest
+        self.version = digest[:12]
+        self.packs = [f"{pack['name']}@{pack['version']}" for pack in packs]
+
+        self.accent_fixes = {}
+        informal, cliches, vague, concordance, stop_words = [], [], [], [], set()
+        for pack in packs:
+            self.accent_fixes.update(pack["accent_fixes"])
+            informal += [(r["pattern"], (r["term"], r["replacement"])) for r in pack["informal"]]
+            cliches += [(r["pattern"], r["label"]) for r in pack["cliches"]]
+            vague += pack["vague"]
+            concordance += [(r["pattern"], r["message"], r["suggestion"]) for r in pack["concordance"]]
+            stop_words.update(pack["stop_words"])
+        self.stop_words = frozenset(stop_words)
+
+        # Concordância: (padrão, mensagem, sugestão), na ordem dos pacotes
+        self.concordance = concordance
+        self.concordance_ids = [f"CONCORDANCE_{i + 1}" for i in range(len(concordance))]
+        for rule_id, (pattern, _, _) in zip(self.concordance_ids, concordance):
+            _require_linear(rule_id, pattern)
+        self.concordance_regexes = [re.compile(pattern) for pattern, _, _ in concordance]
+
+        # Motor léxico: índice pelo prefixo da primeira palavra
+        self.lexical_rules = _build_lexical_rules(informal, cliches, vague)
+        self.lexical_index = {}          # prefixo → [(rule_id, regex), ...]
+        self.unindexed = []
+        for rule_id, (_, pattern, _) in self.lexical_rules.items():
+            keys = _first_word_keys(pattern)
+            _require_linear(rule_id, pattern, anchored=keys is not None)
+            if keys is None:
+                self.unindexed.append(rule_id)
+                continue
+            regex = re.compile(pattern)
+            for key in keys:
+                self.lexical_index.setdefault(key, []).append((rule_id, regex))
+        # Regras sem prefixo fixo: cada uma varre o texto sozinha (uma
+        # alternação perderia a segunda regra que casa no mesmo ponto)
+        self.unindexed_rules = [(rule_id, re.compile(self.lexical_rules[rule_id][1])) for rule_id in self.unindexed]
+        self._subsets = {}
+
+    def lexical_matchers(self, kinds: frozenset) -> tuple:
+        """
+        (índice, regras sem índice) só com as regras léxicas dos tipos pedidos
+        ("informal", "cliche", "vague"). Montado uma vez por combinação.
+        """
+        matchers = self._subsets.get(kinds)
+        if matchers is None:
+            index = {}
+            for key, entries in self.lexical_index.items():
+                kept = [(rule_id, regex) for rule_id, regex in entries if self.lexical_rules[rule_id][0] in kinds]
+                if kept:
+                    index[key] = kept
+            unindexed = [(rule_id, regex) for rule_id, regex in self.unindexed_rules
+                         if self.lexical_rules[rule_id][0] in kinds]
+            matchers = self._subsets[kinds] = (index, unindexed)
+        return matchers
+
+    def stats(self) -> dict:
+        return {
+            "packs": self.packs,
+            "version": self.version,
+            "lexical_rules": len(self.lexical_rules),
+            "concordance_rules": len(self.concordance),
+            "accent_fixes": len(self.accent_fixes),
+        }
+
+
+# ============================================================
+# ARTEFATO COMPILADO
+# Guarda o RuleSet pronto (ids, verificações e índice) junto do
+# sha1 dos pacotes; vale enquanto os pacotes não mudarem.
+# ============================================================
+def _load_artifact(path: str, digest: str):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:                  # arquivo truncado, versão antiga do Python...
+        print(f"[AVISO] Artefato de regras ignorado ({path}): {e}")
+        return None
+    if (not isinstance(data, dict) or data.get("format") != ARTIFACT_FORMAT
+            or data.get("python") != sys.version_info[:2] or data.get("digest") != digest):
+        return None
+    return data["ruleset"]
+
+
+def _save_artifact(path: str, ruleset: RuleSet):
+    # Arquivo temporário por processo + os.replace: workers podem gravar juntos
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({
+                "format": ARTIFACT_FORMAT,
+                "python": sys.version_info[:2],
+                "digest": ruleset.digest,
+                "ruleset": ruleset,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[AVISO] Não foi possível gravar o artefato de regras ({path}): {e}")
+
+
+def load(directory: str = RULES_DIR, artifact: str = RULES_ARTIFACT) -> RuleSet:
+    """
+    RuleSet dos pacotes de `directory`: do artefato, se ele corresponder
+    ao conteúdo atual; senão compila e grava um artefato novo.
+    Levanta ValueError se algum pacote for inválido.
+    """
+    sources, digest = _read_sources(directory)
+    ruleset = _load_artifact(artifact, digest) if artifact else None
+    if ruleset is None:
+        ruleset = RuleSet([parse_pack(path, raw) for path, raw in sources], digest)
+        if artifact:
+            _save_artifact(artifact, ruleset)
+    return ruleset
+
+
+# ============================================================
+# RECARGA A QUENTE
+# ============================================================
+class RuleStore:
+    """
+    Conjunto de regras ativo do processo. current() devolve o RuleSet em
+    uso e, no máximo a cada check_interval segundos, confere se os
+    pacotes mudaram (um stat por arquivo). check_interval 0 desliga a
+    recarga.
+    """
+
+    def __init__(self, directory: str = RULES_DIR, artifact: str = RULES_ARTIFACT,
+                 check_interval: float = RULES_CHECK_INTERVAL):
+        self.directory = directory
+        self.artifact = artifact
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.error = None
+        self._ruleset = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> RuleSet:
+        if self._ruleset is None or (self.check_interval > 0 and time.monotonic() >= self._next_check):
+            self._refresh()
+        return self._ruleset
+
+    def _refresh(self):
+        # Só uma thread confere/recompila; as outras seguem com o conjunto atual
+        if not self._lock.acquire(blocking=self._ruleset is None):
+            return
+        try:
+            now = time.monotonic()
+            if self._ruleset is not None and now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            signature = _signature(_pack_files(self.directory))
+            if signature == self._signature:
+                return
+            try:
+                ruleset = load(self.directory, self.artifact)
+            except (OSError, ValueError) as e:
+                self.error = str(e)
+                if self._ruleset is None:
+                    raise
+                print(f"[AVISO] Pacotes de regras recusados, mantendo a versão {self._ruleset.version}: {e}")
+                self._signature = signature             # só tenta de novo quando mudarem outra vez
+                return
+            self.error = None
+            self._signature = signature
+            if self._ruleset is not None and ruleset.digest != self._ruleset.digest:
+                self.reloads += 1
+                print(f"[OK] Regras recarregadas: {', '.join(ruleset.packs)} (versão {ruleset.version})")
+            self._ruleset = ruleset                     # troca atômica
+        finally:
+            self._lock.release()
+
+    def stats(self) -> dict:
+        return dict(self.current().stats(), reloads=self.reloads, error=self.error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pacotes de regras do CorrigeAI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("compile", "valida os pacotes e grava o artefato compilado"),
+                               ("show", "mostra os pacotes em uso")):
+        p = sub.add_parser(command, help=help_text)
+        p.add_argument("--dir", default=RULES_DIR, help="diretório dos pacotes")
+        p.add_argument("--artifact", default=RULES_ARTIFACT, help="arquivo do artefato compilado")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "compile":
+            start = time.perf_counter()
+            sources, digest = _read_sources(args.dir)
+            ruleset = RuleSet([parse_pack(path, raw) for path, raw in sources], digest)
+            _save_artifact(args.artifact, ruleset)
+            print(f"[OK] {len(ruleset.lexical_rules) + len(ruleset.concordance)} regras compiladas "
+                  f"em {(time.perf_counter() - start) * 1000:.1f} ms → {args.artifact}")
+        else:
+            ruleset = load(args.dir, args.artifact)
+    except ValueError as e:
+        print(f"[ERRO] {e}")
+        sys.exit(1)
+    for field, value in ruleset.stats().items():
+        print(f"  {field}: {', '.join(value) if isinstance(value, list) else value}")
+
+
+if __name__ == "__main__":
+    # Pelo módulo importado: o artefato tem de referenciar rules.RuleSet, não __main__.RuleSet
+    import rules
+    rules.main()
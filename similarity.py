@@ -0,0 +1,227 @@
+"""
+Detecção de Cópias
+Assinatura MinHash de cada redação e índice LSH (locality-sensitive
+hashing) em SQLite para achar redações quase iguais numa turma sem
+comparar com todas as anteriores.
+
+A assinatura usa "one permutation hashing": cada shingle (sequência de
+SHINGLE_WORDS palavras) é espalhado uma única vez e cai num de
+SIGNATURE_BINS compartimentos, que guardam o menor valor visto. O
+mínimo é associativo, então a assinatura de cada parágrafo é calculada
+na análise (e vai para o cache de parágrafos) e a do texto é o mínimo
+elemento a elemento das assinaturas dos parágrafos. Compartimentos
+vazios (textos curtos) são preenchidos pelo vizinho ("densificação"),
+para que a fração de compartimentos iguais estime a similaridade de
+Jaccard entre os conjuntos de shingles.
+
+O índice divide a assinatura em LSH_BANDS faixas de LSH_ROWS linhas.
+Duas redações viram candidatas se alguma faixa for idêntica; só as
+candidatas têm a similaridade calculada. Com 32 × 4, pares com
+similaridade 0,6 viram candidatos com ~98% de chance, e pares com 0,2
+com ~5%.
+"""
+
+import base64
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+
+SHINGLE_WORDS = 3          # paragraph_signature combina 3 hashes por shingle
+SIGNATURE_BINS = 128
+LSH_BANDS = 32
+LSH_ROWS = SIGNATURE_BINS // LSH_BANDS
+
+SIMILARITY_DB = os.environ.get(
+    "CORRIGEAI_SIMILARITY_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "corrigeai_similares.sqlite3"),
+)
+SIMILARITY_THRESHOLD = float(os.environ.get("CORRIGEAI_SIMILARITY_THRESHOLD", 0.5))
+SIMILARITY_MAX_MATCHES = 10
+# Candidatas lidas por faixa: um balde enorme (texto padrão repetido
+# por muitos alunos) não transforma a consulta numa varredura
+BUCKET_LIMIT = 200
+
+EMPTY = 0xFFFFFFFF
+_MASK = 0xFFFFFFFFFFFFFFFF
+_BIN_MASK = SIGNATURE_BINS - 1
+
+
+# ============================================================
+# ASSINATURA
+# ============================================================
+def paragraph_signature(words: list) -> str:
+    """
+    Mínimos por compartimento dos shingles de `words` (palavras já
+    normalizadas), em base64. None se não houver shingle.
+    """
+    hashes = [zlib.crc32(word.encode("utf-8")) for word in words if word]
+    if len(hashes) < SHINGLE_WORDS:
+        return None
+    mins = [EMPTY] * SIGNATURE_BINS
+    for i in range(len(hashes) - 2):
+        h = ((hashes[i] * 0x9E3779B97F4A7C15 ^ hashes[i + 1]) * 0xBF58476D1CE4E5B9 ^ hashes[i + 2]) \
+            * 0x94D049BB133111EB & _MASK
+        h ^= h >> 31
+        b = h & _BIN_MASK
+        v = h >> 32
+        if v < mins[b]:
+            mins[b] = v
+    return _encode(mins)
+
+
+def combine(signatures) -> str:
+    """Assinatura do texto a partir das dos parágrafos (None se nenhum tiver shingles)."""
+    mins = None
+    for signature in signatures:
+        if signature is None:
+            continue
+        values = _decode(signature)
+        if mins is None:
+            mins = values
+        else:
+            for i, v in enumerate(values):
+                if v < mins[i]:
+                    mins[i] = v
+    if mins is None:
+        return None
+    return _encode(_densify(mins))
+
+
+def _densify(mins) -> array:
+    # Compartimento vazio copia o próximo não vazio (circular), somando a
+    # distância, para dois vazios só coincidirem quando o vizinho coincide
+    if EMPTY not in mins:
+        return mins
+    out = array("I", mins)
+    for i in range(SIGNATURE_BINS):
+        if mins[i] == EMPTY:
+            step = 1
+            while mins[(i + step) % SIGNATURE_BINS] == EMPTY:
+                step += 1
+            out[i] = (mins[(i + step) % SIGNATURE_BINS] + step * 0x9E3779B1) % EMPTY
+    return out
+
+
+def _encode(values) -> str:
+    return base64.b64encode(array("I", values).tobytes()).decode("ascii")
+
+
+def _decode(signature: str) -> array:
+    return array("I", base64.b64decode(signature))
+
+
+def similarity(a, b) -> float:
+    """Similaridade de Jaccard estimada entre duas assinaturas (arrays)."""
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_BINS
+
+
+def _band_keys(values) -> list:
+    """Chave (inteiro de 63 bits, cabe no INTEGER do SQLite) de cada faixa da assinatura."""
+    raw = values.tobytes()
+    size = LSH_ROWS * values.itemsize
+    chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+    return [zlib.crc32(chunk, band) << 31 ^ zlib.crc32(chunk) for band, chunk in enumerate(chunks)]
+
+
+# ============================================================
+# ÍNDICE LSH (SQLite)
+# ============================================================
+class SimilarityIndex:
+    """
+    Assinaturas e baldes LSH por escopo (turma). check() consulta as
+    redações parecidas e registra a nova numa única transação.
+    db_path vazio desliga o índice.
+    """
+
+    def __init__(self, db_path: str = SIMILARITY_DB, threshold: float = SIMILARITY_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.checks = 0
+        self.matches = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.db_path)
+
+    def _db(self):
+        # Chamado com o lock adquirido; uma conexão por processo
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                " scope TEXT, id TEXT, signature BLOB, created REAL, PRIMARY KEY (scope, id))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (scope TEXT, band INTEGER, key INTEGER, id TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_key ON buckets (scope, band, key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_id ON buckets (scope, id)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def check(self, signature: str, scope: str, submission: str, limit: int = SIMILARITY_MAX_MATCHES) -> list:
+        """
+        Redações do escopo parecidas com `signature` (similaridade >=
+        threshold), da mais para a menos parecida:
+        [{"id": ..., "similarity": 0.93}, ...]. Em seguida registra a
+        redação como `submission` (substituindo um registro anterior
+        com o mesmo id).
+        """
+        values = _decode(signature)
+        keys = _band_keys(values)
+        try:
+            with self._lock:
+                db = self._db()
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    candidates = set()
+                    for band, key in enumerate(keys):
+                        candidates.update(row[0] for row in db.execute(
+                            "SELECT id FROM buckets WHERE scope = ? AND band = ? AND key = ? LIMIT ?",
+                            (scope, band, key, BUCKET_LIMIT)))
+                    candidates.discard(submission)
+
+                    found = []
+                    for other in candidates:
+                        row = db.execute("SELECT signature FROM signatures WHERE scope = ? AND id = ?",
+                                         (scope, other)).fetchone()
+                        if row is None:
+                            continue
+                        score = similarity(values, array("I", row[0]))
+                        if score >= self.threshold:
+                            found.append({"id": other, "similarity": round(score, 3)})
+
+                    db.execute("DELETE FROM buckets WHERE scope = ? AND id = ?", (scope, submission))
+                    db.execute("INSERT OR REPLACE INTO signatures (scope, id, signature, created) VALUES (?, ?, ?, ?)",
+                               (scope, submission, values.tobytes(), time.time()))
+                    db.executemany("INSERT INTO buckets (scope, band, key, id) VALUES (?, ?, ?, ?)",
+                                   [(scope, band, key, submission) for band, key in enumerate(keys)])
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            print(f"[AVISO cópias] índice indisponível: {e}")
+            return []
+
+        found.sort(key=lambda match: (-match["similarity"], match["id"]))
+        self.checks += 1
+        self.matches += bool(found)
+        return found[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "checks": self.checks,
+            "with_matches": self.matches,
+        }
+
+
+similarity_index = SimilarityIndex()